@@ -0,0 +1,437 @@
+"""
+Command line entry point, used to push configuration without excel, i.e.
+
+    python -m acixl push tenants vrfs --workbook runsheet.xlsm
+
+"""
+import argparse
+import os
+import sys
+
+# the modules of this package import each other by name, i.e. 'import excel'
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import aci
+import benchmark
+import export
+import headless
+import journal
+import rollback
+import tracing
+import worker
+
+
+def push(args):
+    """
+    Push one or more launcher.json commands from the workbook to the APIC,
+    using the headless backend. The status of every row is written to the
+    results file.
+    """
+    headless.open_workbook(args.workbook, results_file=args.results)
+    aci.excel.VERBOSE_CONSOLE = args.verbose
+    try:
+        user = args.user or headless.USER
+        pword = args.password or headless.PWORD
+        if args.fabrics:
+            fabrics = aci.login_to_fabrics(aci.read_fabrics(args.fabrics),
+                                           user=user, pword=pword,
+                                           backend=headless)
+            if not fabrics:
+                return 1
+            handler = list(fabrics.values())[0]
+        else:
+            handler = aci.AciHandler(apic=args.apic or headless.APIC,
+                                     user=user, pword=pword,
+                                     backend=headless)
+        if not handler.launcher.data:
+            return 1
+        if args.all:
+            args.cmd = list(handler.launcher.data)
+        unknown = [cmd for cmd in args.cmd if cmd not in handler.launcher.data]
+        if unknown:
+            headless.update_console('Unknown command(s): {}'.format(
+                ', '.join(unknown)))
+            return 1
+        if args.fabrics:
+            if handler.push_to_fabrics(args.cmd, fabrics,
+                                       rollback=args.rollback) is None:
+                return 1
+            if args.rollback:
+                for name, fabric in fabrics.items():
+                    headless.update_console('Rollback set of {}: {}'.format(
+                        name, rollback.get_latest_rollback_set(
+                            controllers=fabric.cluster.addresses)))
+            return 0
+        handler.login()
+        if not handler.cookies:
+            return 1
+        if len(args.cmd) == 1:
+            handler.push_to_apic(args.cmd[0], incremental=args.incremental,
+                                 rollback=args.rollback)
+        else:
+            handler.push_commands(args.cmd, incremental=args.incremental,
+                                  rollback=args.rollback)
+        if args.rollback:
+            headless.update_console('Rollback set: {}'.format(
+                rollback.get_latest_rollback_set(
+                    controllers=handler.cluster.addresses)))
+    finally:
+        headless.close_workbook()
+    return 0
+
+
+def resume(args):
+    """
+    Push the rows of a journaled push run that are not done, using the
+    headless backend
+    """
+    headless.open_workbook(args.workbook, results_file=args.results)
+    try:
+        handler = aci.AciHandler(apic=args.apic or headless.APIC,
+                                 user=args.user or headless.USER,
+                                 pword=args.password or headless.PWORD,
+                                 backend=headless)
+        if not handler.launcher.data:
+            return 1
+        # the last run against this APIC, i.e. one of the fabrics of a push
+        # to several fabrics
+        fname = args.journal or journal.get_latest_journal(
+            controllers=handler.cluster.addresses)
+        if not fname:
+            headless.update_console('There is no push to resume')
+            return 1
+        handler.login()
+        if not handler.cookies:
+            return 1
+        headless.update_console('Resuming: {}'.format(fname))
+        handler.resume_push(fname, failed_only=args.failed_only)
+    finally:
+        headless.close_workbook()
+    return 0
+
+
+def rollback_push(args):
+    """
+    Undo the last push run that captured a rollback set, or the run of
+    the given rollback set, using the headless backend
+    """
+    headless.open_workbook(args.workbook, results_file=args.results)
+    try:
+        handler = aci.AciHandler(apic=args.apic or headless.APIC,
+                                 user=args.user or headless.USER,
+                                 pword=args.password or headless.PWORD,
+                                 backend=headless)
+        fname = args.rollback_set or rollback.get_latest_rollback_set(
+            controllers=handler.cluster.addresses)
+        if not fname:
+            headless.update_console('There is no push to roll back')
+            return 1
+        handler.login()
+        if not handler.cookies:
+            return 1
+        if handler.rollback_push(fname,
+                                 max_in_flight=args.max_in_flight) is None:
+            return 1
+    finally:
+        headless.close_workbook()
+    return 0
+
+
+def export_tables(args):
+    """
+    Read the current config of launcher.json command(s) from the APIC and
+    write it to one csv file per table, using the headless backend
+    """
+    headless.open_workbook(args.workbook, results_file=args.results)
+    try:
+        handler = aci.AciHandler(apic=args.apic or headless.APIC,
+                                 user=args.user or headless.USER,
+                                 pword=args.password or headless.PWORD,
+                                 backend=headless)
+        if not handler.launcher.data:
+            return 1
+        if args.all:
+            args.cmd = list(handler.launcher.data)
+        unknown = [cmd for cmd in args.cmd if cmd not in handler.launcher.data]
+        if unknown:
+            headless.update_console('Unknown command(s): {}'.format(
+                ', '.join(unknown)))
+            return 1
+        handler.login()
+        if not handler.cookies:
+            return 1
+        if handler.export_tables(args.cmd, page_size=args.page_size,
+                                 max_in_flight=args.max_in_flight) is None:
+            return 1
+    finally:
+        headless.close_workbook()
+    return 0
+
+
+def compile_plan(args):
+    """
+    Render launcher.json command(s) from the workbook into a push plan,
+    nothing is sent to the APIC
+    """
+    headless.open_workbook(args.workbook, results_file=args.results)
+    try:
+        handler = aci.AciHandler(backend=headless)
+        if not handler.launcher.data:
+            return 1
+        if args.all:
+            args.cmd = list(handler.launcher.data)
+        unknown = [cmd for cmd in args.cmd if cmd not in handler.launcher.data]
+        if unknown:
+            headless.update_console('Unknown command(s): {}'.format(
+                ', '.join(unknown)))
+            return 1
+        if handler.compile_plan(args.cmd, fname=args.plan) is None:
+            return 1
+    finally:
+        headless.close_workbook()
+    return 0
+
+
+def replay(args):
+    """
+    Push a push plan to the APIC, using the headless backend. The status
+    of every row is written to the results file and to the journal.
+    """
+    headless.open_workbook(args.workbook, results_file=args.results)
+    try:
+        handler = aci.AciHandler(apic=args.apic or headless.APIC,
+                                 user=args.user or headless.USER,
+                                 pword=args.password or headless.PWORD,
+                                 backend=headless)
+        handler.login()
+        if not handler.cookies:
+            return 1
+        if handler.replay_plan(args.plan) is None:
+            return 1
+        fname = journal.get_latest_journal(
+            controllers=handler.cluster.addresses)
+        if fname:
+            headless.update_console('Journal: {}'.format(fname))
+    finally:
+        headless.close_workbook()
+    return 0
+
+
+def add_workbook_arguments(parser):
+    parser.add_argument('--workbook',
+                        default=os.path.join(HERE, aci.excel.WORKBOOK_NAME),
+                        help='path to the runsheet workbook')
+    parser.add_argument('--results',
+                        help='results file, defaults to '
+                             '<workbook>' + headless.RESULTS_SUFFIX)
+    parser.add_argument('--apic', help='overrides the workbook APIC')
+    parser.add_argument('--user', help='overrides the workbook user')
+    parser.add_argument('--password',
+                        default=os.environ.get('ACIXL_PASSWORD'),
+                        help='overrides the workbook password, can '
+                             'also be set with ACIXL_PASSWORD')
+
+
+def run_benchmark(args):
+    """
+    Benchmark the push of launcher.json commands against a local mock APIC,
+    see benchmark.py
+    """
+    results = benchmark.run_benchmark(cmds=args.cmd, rows=args.rows,
+                                      latency=args.latency,
+                                      error_rate=args.error_rate,
+                                      error_status=args.error_status,
+                                      max_in_flight=args.max_in_flight,
+                                      batch_size=args.batch_size,
+                                      adaptive=args.adaptive,
+                                      certfile=args.cert, keyfile=args.key,
+                                      label=args.label,
+                                      results_file=args.results)
+    print(benchmark.format_results(results))
+    if args.results:
+        print('\nResults appended to: {}'.format(args.results))
+    return 0
+
+
+def run_worker(args):
+    """
+    Run the resident worker of the runsheet macros in the foreground, or
+    show the status of the running worker or stop it, see worker.py
+    """
+    if args.status:
+        status = worker.get_status()
+        if not status:
+            print('The worker is not running')
+            return 1
+        print('Worker pid {pid}: started in {startup:.2f}s, {calls} calls '
+              'served'.format(**status))
+        for step, seconds in status['timings'].items():
+            print('  -- {}: {:.3f}s'.format(step, seconds))
+        return 0
+    if args.stop:
+        if not worker.stop():
+            print('The worker is not running')
+            return 1
+        return 0
+    worker.serve(idle_timeout=args.idle_timeout)
+    return 0
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog='acixl')
+    parser.add_argument('--launcher',
+                        default=os.path.join(HERE, 'launcher.json'),
+                        help='path to launcher.json')
+    parser.add_argument('--json-root',
+                        default=os.path.join(HERE, 'jsondata', ''),
+                        help='folder holding the jsondata payloads')
+    parser.add_argument('--trace',
+                        help='write a trace of every row to this file, a '
+                             'Chrome trace if it ends with .json, else '
+                             'json lines')
+    subparsers = parser.add_subparsers(dest='action')
+    subparsers.required = True
+
+    parser_push = subparsers.add_parser(
+        'push', help='push launcher.json command(s) without excel')
+    parser_push.add_argument('cmd', nargs='*',
+                             help='command name(s) from launcher.json, '
+                                  'pushed in dependency order')
+    parser_push.add_argument('--all', action='store_true',
+                             help='push every command in launcher.json')
+    add_workbook_arguments(parser_push)
+    parser_push.add_argument('--incremental', action='store_true',
+                             default=None,
+                             help='skip the rows that already match the APIC')
+    parser_push.add_argument('--verbose', action='store_true',
+                             help='print the payload of every row')
+    parser_push.add_argument('--fabrics',
+                             help='fabrics.json, push to every fabric in '
+                                  'it at the same time')
+    parser_push.add_argument('--rollback', action='store_true', default=None,
+                             help='capture the state of every DN before it '
+                                  'is pushed, so the push can be rolled back')
+    parser_push.set_defaults(func=push)
+
+    parser_resume = subparsers.add_parser(
+        'resume', help='push the rows of an interrupted push that are not '
+                       'done')
+    parser_resume.add_argument('--journal',
+                               help='journal of the push, defaults to the '
+                                    'last push')
+    parser_resume.add_argument('--failed-only', action='store_true',
+                               help='only push the rows that failed')
+    add_workbook_arguments(parser_resume)
+    parser_resume.set_defaults(func=resume)
+
+    parser_rollback = subparsers.add_parser(
+        'rollback', help='undo the last push that captured a rollback set')
+    parser_rollback.add_argument('--rollback-set',
+                                 help='rollback set of the push, defaults to '
+                                      'the last push')
+    parser_rollback.add_argument('--max-in-flight', type=int,
+                                 default=rollback.MAX_IN_FLIGHT,
+                                 help='objects posted in parallel')
+    add_workbook_arguments(parser_rollback)
+    parser_rollback.set_defaults(func=rollback_push)
+
+    parser_export = subparsers.add_parser(
+        'export', help='export the APIC config of launcher.json command(s) '
+                       'to csv files')
+    parser_export.add_argument('cmd', nargs='*',
+                               help='command name(s) from launcher.json')
+    parser_export.add_argument('--all', action='store_true',
+                               help='export every command in launcher.json')
+    add_workbook_arguments(parser_export)
+    parser_export.add_argument('--page-size', type=int,
+                               default=export.PAGE_SIZE,
+                               help='MOs fetched by each page of a class '
+                                    'query')
+    parser_export.add_argument('--max-in-flight', type=int,
+                               default=export.MAX_IN_FLIGHT,
+                               help='pages fetched in parallel')
+    parser_export.set_defaults(func=export_tables)
+
+    parser_compile = subparsers.add_parser(
+        'compile', help='render launcher.json command(s) into a push plan, '
+                        'to be replayed later')
+    parser_compile.add_argument('cmd', nargs='*',
+                                help='command name(s) from launcher.json')
+    parser_compile.add_argument('--all', action='store_true',
+                                help='compile every command in launcher.json')
+    parser_compile.add_argument('--plan', required=True,
+                                help='push plan file, compressed if it ends '
+                                     'with .gz')
+    add_workbook_arguments(parser_compile)
+    parser_compile.set_defaults(func=compile_plan)
+
+    parser_replay = subparsers.add_parser(
+        'replay', help='push a push plan to the APIC')
+    parser_replay.add_argument('--plan', required=True,
+                               help='push plan file')
+    add_workbook_arguments(parser_replay)
+    parser_replay.set_defaults(func=replay)
+
+    parser_bench = subparsers.add_parser(
+        'benchmark', help='benchmark pushes against a local mock APIC')
+    parser_bench.add_argument('cmd', nargs='*',
+                              help='command name(s) from launcher.json, '
+                                   'defaults to every command')
+    parser_bench.add_argument('--rows', type=int, default=benchmark.ROWS,
+                              help='rows generated for each table')
+    parser_bench.add_argument('--latency', type=float,
+                              default=benchmark.LATENCY,
+                              help='seconds the mock APIC takes to answer')
+    parser_bench.add_argument('--error-rate', type=float,
+                              default=benchmark.ERROR_RATE,
+                              help='share of the posts that fail, 0 to 1')
+    parser_bench.add_argument('--error-status', type=int,
+                              default=benchmark.ERROR_STATUS,
+                              help='status code of the failed posts')
+    parser_bench.add_argument('--max-in-flight', type=int,
+                              help='overrides launcher.json max_in_flight')
+    parser_bench.add_argument('--batch-size', type=int,
+                              help='overrides launcher.json batch_size')
+    parser_bench.add_argument('--adaptive', action='store_true', default=None,
+                              help='lower the posts in flight when the '
+                                   'mock APIC throttles')
+    parser_bench.add_argument('--cert',
+                              help='certificate file, to serve the mock '
+                                   'APIC over https')
+    parser_bench.add_argument('--key', help='private key of the certificate')
+    parser_bench.add_argument('--label', help='stored with the results')
+    parser_bench.add_argument('--results', default=benchmark.RESULTS_FILE,
+                              help='json lines file the results are '
+                                   'appended to')
+    parser_bench.set_defaults(func=run_benchmark)
+
+    parser_worker = subparsers.add_parser(
+        'worker', help='run the resident worker of the runsheet macros')
+    parser_worker.add_argument('--status', action='store_true',
+                               help='show the startup timings of the running '
+                                    'worker')
+    parser_worker.add_argument('--stop', action='store_true',
+                               help='stop the running worker')
+    parser_worker.add_argument('--idle-timeout', type=float,
+                               default=worker.IDLE_TIMEOUT,
+                               help='seconds without a call before the '
+                                    'worker stops')
+    parser_worker.set_defaults(func=run_worker)
+    return parser
+
+
+def main(argv=None):
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    if args.action in ('push', 'export', 'compile') and not args.cmd and not args.all:
+        parser.error('{} needs at least one command, or --all'.format(
+            args.action))
+    aci.LAUNCHER_FILE = args.launcher
+    aci.JSON_ROOT_FOLDER = args.json_root
+    tracing.TRACE_FILE = args.trace
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,28 +1,151 @@
 import requests
 import json
 import excel
+import itertools
 import jinja2
+import os
+import queue
+import threading
+import time
+import cluster
+import coalesce
+import diff
+import expand
+import export
+import fanout
+import journal
+import plan
+import references
+import retry
+import rollback
+import scheduler
+import templates
+import tokens
+import tracing
+import validate
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
 
 JSON_ROOT_FOLDER = 'C:\\acixl\\jsondata\\'
 LAUNCHER_FILE = 'C:\\acixl\\launcher.json'
+FABRICS_FILE = 'C:\\acixl\\fabrics.json'
+PLAN_FILE = 'C:\\acixl\\push_plan.jsonl.gz'
 APIC_URI = 'https://{apic}/api/node/{payload_uri}.json'
+APIC_LOGIN_URI = 'https://{apic}/api/mo/aaaLogin.json'
+APIC_REFRESH_URI = 'https://{apic}/api/aaaRefresh.json'
+APIC_CLASS_URI = 'https://{apic}/api/node/class/{cls}.json'
+
+# HTTP session settings, a single pooled session is shared by all posts
+POOL_SIZE = 10
+KEEP_ALIVE = True
+
+# Seconds to wait for the APIC to answer, unless 'timeout' is set for the
+# command
+TIMEOUT = 5
+
+# Lower the number of posts in flight when the APIC throttles or slows
+# down, unless 'adaptive' is set for the command, see retry.py
+ADAPTIVE = False
+
+# Rows posted in parallel unless 'max_in_flight' is set for the command
+MAX_IN_FLIGHT = 1
+
+# Rows coalesced into one post unless 'batch_size' is set for the command
+BATCH_SIZE = 1
+
+# Rows already matching the APIC are skipped if 'incremental' is set
+INCREMENTAL = False
+
+# The whole table is read before it is pushed, unless 'chunk_size' is set
+# for the command, then it is read and pushed that many rows at a time
+CHUNK_SIZE = None
+
+# Status recorded for rows skipped by an incremental push
+STATUS_UNCHANGED = 304
+
+# Status recorded for rows not posted because a parent object failed
+STATUS_CANCELLED = 424
+
+# Status recorded for rows whose ranges can not be expanded
+STATUS_INVALID_RANGE = 422
+
+# Status recorded for rows that refer to an object that does not exist, see
+# 'references' in launcher.json
+STATUS_MISSING_REFERENCE = 412
+
+# The ranges of the 'expand_columns' of a row are paired in order, unless
+# 'expand_product' is set for the command, then every combination is pushed
+EXPAND_PRODUCT = False
+
+# Capture the state of every DN before it is pushed, so that the push can be
+# rolled back with rollback_push(), unless 'rollback' is set for the command
+ROLLBACK = False
+
+# Check that the columns used by the templates and json_uri of the commands
+# are in their tables before anything is posted, see validate.py
+VALIDATE = True
+
+# Seconds between two checks of the fabrics that are still being pushed,
+# while their status updates are written, see push_to_fabrics()
+FABRIC_POLL_INTERVAL = 0.1
 
 # Disable urllib3 warnings
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
+# launcher.json files that have been read, by file name: (mtime, data, index)
+_launchers = {}
+
+# AciHandlers of the button clicks, by APIC and user, kept for the lifetime
+# of the process so that a resident worker (see worker.py) re-uses their
+# session, connections and login
+_handlers = {}
+
+
 class LaunchFileHandler(object):
-    def __init__(self):
-        self.data = self.read_data_from_file()
+    """
+    The commands from launcher.json. The file is parsed once and shared by
+    every handler, it is only parsed again when its mtime changes.
+    """
+    def __init__(self, backend=excel):
+        self.excel = backend
+        self.data, self.index = self.read_data_from_file()
 
     def read_data_from_file(self):
         try:
+            mtime = os.path.getmtime(LAUNCHER_FILE)
+            cached = _launchers.get(LAUNCHER_FILE)
+            if cached and cached[0] == mtime:
+                return cached[1], cached[2]
             with open(LAUNCHER_FILE, 'r') as f:
-                return json.load(f)
+                data = json.load(f)
+            index = self.build_index(data)
+            _launchers[LAUNCHER_FILE] = (mtime, data, index)
+            return data, index
         except Exception as e:
-            excel.show_console_launcher_error(launcher_fname=LAUNCHER_FILE)
-            return {}
+            self.excel.show_console_launcher_error(launcher_fname=LAUNCHER_FILE)
+            return {}, OrderedDict()
+
+    @staticmethod
+    def build_index(data):
+        """
+        Build the index of the commands: the template, table and worksheet
+        of each command
+
+        Returns:
+            index(OrderedDict): k,v, k=command and v=dict with 'template',
+            'table_name' and 'worksheet_name'
+
+        """
+        index = OrderedDict()
+        for cmd in data:
+            index[cmd] = {'template': '{}/{}'.format(
+                              data[cmd].get('json_folder'),
+                              data[cmd].get('json_file')),
+                          'table_name': data[cmd].get('table_name'),
+                          'worksheet_name': data[cmd].get('worksheet_name')}
+        return index
 
     @property
     def command_list(self):
@@ -30,24 +153,156 @@ class LaunchFileHandler(object):
 
     @property
     def table_list(self):
-        worksheets = []
-        tables = []
-        for cmd in self.data:
-            worksheets.append(self.data[cmd].get('worksheet_name'))
-            tables.append(self.data[cmd].get('table_name'))
+        worksheets = [self.index[cmd]['worksheet_name'] for cmd in self.index]
+        tables = [self.index[cmd]['table_name'] for cmd in self.index]
         combined_list = [worksheets]+[tables]
         return combined_list
 
 
 class AciHandler(object):
-    def __init__(self, apic='', user='', pword=''):
-        self.apic = apic
+    def __init__(self, apic='', user='', pword='', pool_size=POOL_SIZE,
+                 keep_alive=KEEP_ALIVE, backend=excel):
+        # backend is the excel module, or the headless module to run
+        # without excel
+        self.excel = backend
+        # the APIC cell may list every controller of the cluster, the posts
+        # are spread across them, see cluster.py
+        self.cluster = cluster.Cluster(cluster.parse_controllers(apic))
+        self.apic = self.cluster.addresses[0]
+        # name of the fabric in fabrics.json, see login_to_fabrics()
+        self.fabric = None
         self.user = user
         self.pword = pword
         self.cookies = None
-        self.launcher = LaunchFileHandler()
+        self.tokens = tokens.get_cache()
+        self.token_expires = 0
+        self.verified_token = None
+        self.auth_lock = threading.Lock()
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.session = self.create_session(pool_size=pool_size,
+                                           keep_alive=keep_alive)
+        self.launcher = LaunchFileHandler(backend=backend)
+        self.templates = templates.get_registry(JSON_ROOT_FOLDER)
+        self.templates.precompile(self.launcher.data)
+        self.tracer = tracing.Tracer(keep_spans=bool(tracing.TRACE_FILE))
+        # retry settings of each command being pushed, see prepare_push()
+        self.retry_policies = {}
+        self.limiter = retry.AdaptiveLimiter(max_limit=pool_size)
+        # journal of the push run in progress, see start_journal()
+        self.journal = None
+        # pre-images of the push run in progress, see start_rollback_set()
+        self.rollback_set = None
+        # objects the rows of the run may refer to, see
+        # build_reference_index()
+        self.references = None
+
+    def reset_run(self):
+        """
+        Clear what is left of the last run, so that a handler that is kept
+        between button clicks starts each one afresh. The session and its
+        login are kept, launcher.json is read again if it has changed.
+        """
+        self.launcher = LaunchFileHandler(backend=self.excel)
+        self.templates.precompile(self.launcher.data)
+        self.tracer = tracing.Tracer(keep_spans=bool(tracing.TRACE_FILE))
+        self.retry_policies = {}
+        self.limiter = retry.AdaptiveLimiter(max_limit=self.pool_size)
+        self.journal = None
+        self.rollback_set = None
+        self.references = None
+        self.cluster = cluster.Cluster(self.cluster.addresses)
+
+    def create_session(self, pool_size=POOL_SIZE, keep_alive=KEEP_ALIVE):
+        """
+        Build the long-lived session used for the login and every post.
+        The login cookie is stored in the session cookie jar, so all the
+        posts that follow re-use it along with the pooled connections.
+
+        Args:
+            pool_size(int): max number of connections kept open to the APIC
+            keep_alive(bool): set to False to close connections after a post
+
+        Returns:
+            session(requests.Session): session with a pooled https adapter
+
+        """
+        s = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=pool_size, pool_block=True)
+        s.mount('https://', adapter)
+        if not keep_alive:
+            s.headers['Connection'] = 'close'
+        return s
+
+    def resize_pool(self, pool_size):
+        """
+        Grow the connection pool so that it can serve pool_size posts in
+        parallel. The cookie jar is kept, only the https adapter is replaced.
+        """
+        if pool_size <= self.pool_size:
+            return
+        self.pool_size = pool_size
+        adapter = HTTPAdapter(pool_maxsize=pool_size, pool_block=True)
+        self.session.mount('https://', adapter)
+        self.limiter.set_max_limit(pool_size)
+
+    @property
+    def connection_stats(self):
+        """
+        Number of connections opened vs. re-used by the session so far
+        """
+        opened = 0
+        sent = 0
+        for adapter in self.session.adapters.values():
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                opened += pool.num_connections
+                sent += pool.num_requests
+        stats = {'opened': opened,
+                 'reused': max(sent - opened, 0),
+                 'requests': sent}
+        if len(self.cluster) > 1:
+            stats['controllers'] = self.cluster.get_stats()
+        return stats
 
     def login(self):
+        """
+        Log in to the APIC, re-using the cached token of a previous login
+        if it has not expired, otherwise with a full aaaLogin.
+        """
+        self.excel.show_cp_authentication_attempt_msg()
+        status = self.resume_session()
+        if status != 200:
+            status = self.authenticate()
+        if status == 200 and (len(self.cluster) > 1 or cluster.DISCOVER):
+            self.check_controllers()
+        self.excel.update_cp_authentication_response(status)
+        return status
+
+    def check_controllers(self):
+        """
+        Check that every controller of the cluster takes the login token,
+        APIC tokens are valid on every controller of a cluster. With
+        cluster.DISCOVER the controllers are first read from topSystem.
+        The controllers that do not answer, or refuse the token, are left
+        out until they are tried again.
+        """
+        uri = APIC_CLASS_URI.format(apic=self.apic, cls='topSystem')
+        params = {'query-target-filter': cluster.TOP_SYSTEM_FILTER}
+        if cluster.DISCOVER:
+            status, data = self.get(uri, params=params)
+            if status == 200:
+                self.cluster.add(cluster.parse_top_system(data))
+        jobs = ((controller, (cluster.retarget(uri, controller.address),
+                              params))
+                for controller in self.cluster.controllers)
+        for controller, (status, data) in run_jobs(
+                jobs, worker=self.get_once,
+                max_in_flight=len(self.cluster)):
+            self.cluster.set_up(controller, status == 200)
+
+    def authenticate(self):
         payload = '''
         {{
             "aaaUser": {{
@@ -59,26 +314,422 @@ class AciHandler(object):
         }}
         '''.format(user=self.user, pword=self.pword)
         payload = json.loads(payload, object_pairs_hook=OrderedDict)
-        s = requests.Session()
-        excel.show_cp_authentication_attempt_msg()
+        # the first controller that answers logs in for the whole cluster
+        for controller in self.cluster.get_order():
+            try:
+                uri = APIC_LOGIN_URI.format(apic=controller.address)
+                r = self.session.post(uri,data=json.dumps(payload),
+                                      verify=False, timeout=TIMEOUT)
+                status = r.status_code
+                self.cookies = r.cookies
+                if status == 200:
+                    self.save_token(r.json())
+                    self.verified_token = self.get_token()
+            except Exception as e:
+                status = 999
+            self.cluster.set_up(controller, status != 999)
+            if status != 999:
+                break
+        return status
+
+    def save_token(self, data):
+        """
+        Cache the token from an aaaLogin or aaaRefresh response
+        """
+        token, timeout = tokens.parse_login_response(data)
+        if not token:
+            return
+        entry = self.tokens.set(self.apic, self.user, token, timeout)
+        self.set_token(entry['token'], entry['expires'])
+
+    def set_token(self, token, expires):
+        # replaces the cookie set by the APIC, which is bound to its domain
+        self.session.cookies.clear()
+        self.session.cookies.set('APIC-cookie', token)
+        self.cookies = self.session.cookies
+        self.token_expires = expires
+
+    def get_token(self):
+        return self.session.cookies.get('APIC-cookie')
+
+    def resume_session(self):
+        """
+        Use the cached token for the APIC and user, if there is one. It is
+        renewed with aaaRefresh if it is about to expire.
+
+        Returns:
+            status(int): 200 if the cached token can be used, else None
+
+        """
+        entry = self.tokens.get(self.apic, self.user)
+        if not entry:
+            return None
+        self.set_token(entry['token'], entry['expires'])
+        if entry['expires'] - time.time() < tokens.REFRESH_MARGIN:
+            if self.refresh() != 200:
+                self.tokens.clear(self.apic, self.user)
+                return None
+        return 200
+
+    def refresh(self):
+        uri = APIC_REFRESH_URI.format(apic=self.apic)
+        status, data = self.cluster.call(uri, self.get_once,
+                                         get_status=lambda result: result[0])
+        if status == 200:
+            self.save_token(data)
+        return status
+
+    def keep_token_alive(self):
+        """
+        Renew the token before it expires, so that a long push does not
+        fail half way through
+        """
+        if not self.token_expires or \
+                self.token_expires - time.time() > tokens.REFRESH_MARGIN:
+            return
+        with self.auth_lock:
+            if self.token_expires - time.time() > tokens.REFRESH_MARGIN:
+                return
+            if self.refresh() != 200:
+                self.authenticate()
+
+    def reauthenticate(self, failed_token):
+        """
+        Called when a request is refused with a 401/403. The cached token is
+        cleared and a full login is done, unless another thread has already
+        done it, or the token came from a full login (the request is refused
+        for another reason).
+
+        Returns:
+            bool: True if the request should be sent again
+
+        """
+        with self.auth_lock:
+            if self.get_token() != failed_token:
+                return True
+            if failed_token == self.verified_token:
+                return False
+            self.tokens.clear(self.apic, self.user)
+            return self.authenticate() == 200
+
+    def post(self, uri, payload, cmd=None):
+        """
+        Post a payload, it is posted again with a jittered exponential
+        backoff if the APIC throttles it, fails with a 5xx or does not
+        answer, as set by the retry policy of the command
+
+        Returns:
+            status(int): status of the last attempt
+
+        """
+        policy = self.retry_policies.get(cmd) or \
+            retry.RetryPolicy(timeout=TIMEOUT)
+        attempt = 0
+        while True:
+            status = self.post_once(uri, payload, policy, cmd)
+            if not policy.should_retry(status, attempt):
+                return status
+            self.tracer.count('retries', cmd)
+            time.sleep(policy.get_delay(attempt))
+            attempt += 1
+
+    def post_once(self, uri, payload, policy, cmd=None):
+        self.keep_token_alive()
+        if policy.adaptive:
+            self.limiter.acquire()
+        start = time.time()
+        token = self.get_token()
+        status = self.send_post(uri, payload, timeout=policy.timeout)
+        if status in (401, 403) and self.reauthenticate(token):
+            self.tracer.count('retries', cmd)
+            status = self.send_post(uri, payload, timeout=policy.timeout)
+        if status in retry.THROTTLE_STATUS_CODES:
+            self.tracer.count('throttled', cmd)
+        if policy.adaptive and self.limiter.release(status,
+                                                    time.time() - start):
+            self.tracer.count('concurrency_lowered', cmd)
+        return status
+
+    def trace_post(self, cmd, rows, uri, payload):
+        """
+        Post a payload and record the time it took and its size
+        """
+        self.tracer.count('bytes_sent', cmd, len(payload.encode()))
+        with self.tracer.span('post', cmd, rows=rows, uri=uri):
+            return self.post(uri, payload, cmd=cmd)
+
+    def send_post(self, uri, payload, timeout=TIMEOUT):
+        """
+        Post a payload to the controller of the cluster with the fewest
+        requests outstanding, or to the next one if it does not answer
+        """
+        return self.cluster.call(
+            uri, lambda target: self.post_once_to(target, payload, timeout))
+
+    def post_once_to(self, uri, payload, timeout=TIMEOUT):
         try:
-            uri = 'https://{}/api/mo/aaaLogin.json'.format(self.apic)
-            r = s.post(uri,data=json.dumps(payload), verify=False, timeout=5)
+            r = self.session.post(uri, data=payload, verify=False,
+                                  timeout=timeout)
             status = r.status_code
-            self.cookies = r.cookies
         except Exception as e:
             status = 999
-        excel.update_cp_authentication_response(status)
         return status
 
-    def post(self, uri, payload):
-        s = requests.Session()
+    def get(self, uri, params=None, timeout=TIMEOUT):
+        self.keep_token_alive()
+        return self.cluster.call(
+            uri, lambda target: self.get_once(target, params, timeout),
+            get_status=lambda result: result[0])
+
+    def get_once(self, uri, params=None, timeout=TIMEOUT):
         try:
-            r = s.post(uri, data=payload, cookies=self.cookies, verify=False, timeout=5)
-            status = r.status_code
+            r = self.session.get(uri, params=params, verify=False,
+                                 timeout=timeout)
         except Exception as e:
-            status = 'Unknown Error'
-        return status
+            return 999, {}
+        try:
+            return r.status_code, r.json()
+        except ValueError:
+            return r.status_code, {}
+
+    def get_class(self, cls, dns):
+        """
+        Fetch the current config of a list of MOs of the same class,
+        including their children, with a single class query
+
+        Returns:
+            (status, mos): mos is a list of MO bodies, as returned by the APIC
+
+        """
+        uri = APIC_CLASS_URI.format(apic=self.apic, cls=cls)
+        params = {'query-target-filter': diff.get_query_filter(cls, dns),
+                  'rsp-subtree': 'full',
+                  'rsp-prop-include': 'config-only'}
+        status, data = self.get(uri, params=params)
+        mos = [mo[cls] for mo in data.get('imdata', []) if cls in mo]
+        return status, mos
+
+    def get_page(self, cls, params):
+        """
+        Fetch one page of a class query
+
+        Returns:
+            (status, total, mos): total is the number of MOs of the whole
+            query, mos is the list of MO bodies of the page
+
+        """
+        uri = APIC_CLASS_URI.format(apic=self.apic, cls=cls)
+        with self.tracer.span('query', cls, page=params.get('page')):
+            status, data = self.get(uri, params=params,
+                                    timeout=export.TIMEOUT)
+        mos = [mo[cls] for mo in data.get('imdata', []) if cls in mo]
+        try:
+            total = int(data.get('totalCount', len(mos)))
+        except ValueError:
+            total = len(mos)
+        return status, total, mos
+
+    def query_classes(self, queries, page_size=export.PAGE_SIZE,
+                      max_in_flight=export.MAX_IN_FLIGHT):
+        """
+        Fetch every MO of a list of classes with paginated class queries.
+        The first page of every query is fetched, then all the other pages
+        at once, in parallel up to max_in_flight.
+
+        Args:
+            queries(dict): k,v, k=(cls, query_file) and v=compiled query
+            template, see export.get_query_params()
+            page_size(int): MOs per page
+            max_in_flight(int): max number of pages fetched in parallel
+
+        Returns:
+            (results, failed): results k,v, k=(cls, query_file) and v=list
+            of MOs, failed holds the status of the queries that failed
+
+        """
+        pages = dict((query, {}) for query in queries)
+        failed = {}
+
+        def get_jobs(page_numbers):
+            for query, page in page_numbers:
+                params = export.get_query_params(queries[query], query[0],
+                                                 page, page_size)
+                yield (query, page), (query[0], params)
+
+        more = []
+        for (query, page), (status, total, mos) in run_jobs(
+                get_jobs((query, 0) for query in queries),
+                worker=self.get_page, max_in_flight=max_in_flight):
+            if status != 200:
+                failed[query] = status
+                continue
+            pages[query][page] = mos
+            more += [(query, page) for page in
+                     range(1, (total + page_size - 1) // page_size)]
+
+        for (query, page), (status, total, mos) in run_jobs(
+                get_jobs(more), worker=self.get_page,
+                max_in_flight=max_in_flight):
+            if status != 200:
+                failed[query] = status
+                continue
+            pages[query][page] = mos
+
+        results = {}
+        for query in queries:
+            if query not in failed:
+                results[query] = list(itertools.chain.from_iterable(
+                    pages[query][page] for page in sorted(pages[query])))
+        return results, failed
+
+    def export_tables(self, cmds, page_size=export.PAGE_SIZE,
+                      max_in_flight=export.MAX_IN_FLIGHT):
+        """
+        Read the current config of the commands from the APIC and add it to
+        their tables. The MOs are fetched with paginated class queries, one
+        query per class even if several commands use it, and mapped back to
+        the columns of the tables with the payload templates, see export.py
+
+        Args:
+            cmds(list): command names from launcher.json
+            page_size(int): MOs per page of the class queries
+            max_in_flight(int): max number of pages fetched in parallel
+
+        Returns:
+            exported (dict): k,v, k=command and v=number of rows added, or
+            None if the commands can not be exported
+
+        """
+        problems = []
+        mappings = OrderedDict()
+        queries = {}
+        for cmd in cmds:
+            cmd_data = self.launcher.data[cmd]
+            header = self.excel.get_table_header(cmd_data['table_name'])
+            if header is None:
+                problems.append('{}: table {} not found'.format(
+                    cmd, cmd_data['table_name']))
+                continue
+            try:
+                source = self.templates.env.loader.get_source(
+                    self.templates.env, self.launcher.index[cmd][
+                        'template'])[0]
+                cls, node = export.compile_mapping(source,
+                                                   cmd_data['json_uri'])
+                query_file = cmd_data.get('query_file', export.QUERY_FILE)
+                queries[(cls, query_file)] = self.templates.get_template(
+                    export.QUERY_FOLDER, query_file)
+            except (OSError, ValueError, jinja2.TemplateError) as e:
+                problems.append('{}: {} can not be exported ({})'.format(
+                    cmd, cmd_data['json_file'], e))
+                continue
+            mappings[cmd] = ((cls, query_file), node, header)
+        if problems:
+            self.excel.update_console(msg='Nothing was exported, the '
+                                          'following problems were found:' +
+                                      ''.join('\n -- {}'.format(problem)
+                                              for problem in problems))
+            return None
+
+        self.excel.update_console(msg='Querying {} class(es) from {}'.format(
+            len(queries), self.apic))
+        results, failed = self.query_classes(queries, page_size=page_size,
+                                             max_in_flight=max_in_flight)
+        exported = OrderedDict()
+        console_msg = 'Export from {}:'.format(self.apic)
+        for cmd, (query, node, header) in mappings.items():
+            cmd_data = self.launcher.data[cmd]
+            if query in failed:
+                console_msg += '\n  -- {}: query of {} failed ({})'.format(
+                    cmd, query[0], failed[query])
+                continue
+            with self.tracer.span('write_back', cmd):
+                rows, skipped = export.get_rows(
+                    cmd, node, results[query], header,
+                    mandatory_keys=cmd_data.get('mandatory_keys'))
+                self.excel.write_table_rows(cmd_data['table_name'], header,
+                                            rows)
+            exported[cmd] = len(rows)
+            console_msg += '\n  -- {}: {} rows added to {}'.format(
+                cmd, len(rows), cmd_data['table_name'])
+            if skipped:
+                console_msg += ', {} left out (missing mandatory ' \
+                               'keys)'.format(skipped)
+        self.excel.update_console(msg=console_msg)
+        if tracing.TRACE_FILE:
+            self.tracer.export(tracing.TRACE_FILE)
+        return exported
+
+    def get_current_state(self, rows, max_in_flight=MAX_IN_FLIGHT):
+        """
+        Fetch the current state of the DNs of the rendered rows, with their
+        subtree, using batched class queries run in parallel
+
+        Args:
+            rows(list): rendered rows, i.e. (row, full_uri, payload)
+            max_in_flight(int): max number of queries run in parallel
+
+        Returns:
+            (state, known_dns): see diff.find_unchanged()
+
+        """
+        queries = diff.build_queries(rows)
+        jobs = ((dns, (cls, dns)) for cls, dns in queries)
+        state = {}
+        known_dns = set()
+        for dns, (status, mos) in run_jobs(jobs, worker=self.get_class,
+                                           max_in_flight=max_in_flight):
+            if status != 200:
+                continue
+            known_dns.update(dns)
+            for mo in mos:
+                state[mo['attributes']['dn']] = mo
+        return state, known_dns
+
+    def find_unchanged_rows(self, rows, max_in_flight=MAX_IN_FLIGHT):
+        """
+        Find the rendered rows that would not change the current state of
+        their DNs on the APIC
+
+        Returns:
+            unchanged (set): the rows which can be skipped
+
+        """
+        state, known_dns = self.get_current_state(rows, max_in_flight)
+        return diff.find_unchanged(rows, state, known_dns)
+
+    def post_batch(self, parent_dn, batch, cmd=None):
+        """
+        Post a batch of rows as a single payload to their parent DN. If the
+        APIC rejects the batch it is split in half and each half is posted
+        again, until the rows that fail are isolated and posted on their own.
+
+        Args:
+            parent_dn(str): DN the batch is posted to, None for a single row
+            batch(list): (row, full_uri, payload, child) tuples
+            cmd(str, optional): command the rows belong to, for tracing
+
+        Returns:
+            results (list): (row, status) for each row in the batch
+
+        """
+        if not parent_dn or len(batch) == 1:
+            return [(row, self.trace_post(cmd, [row], uri, payload))
+                    for row, uri, payload, child in batch]
+
+        full_uri = APIC_URI.format(apic=self.apic,
+                                   payload_uri='mo/' + parent_dn)
+        payload = coalesce.build_payload(parent_dn,
+                                         [item[3] for item in batch])
+        status = self.trace_post(cmd, [item[0] for item in batch], full_uri,
+                                 payload)
+        if status != 400:
+            return [(item[0], status) for item in batch]
+
+        half = len(batch) // 2
+        self.tracer.count('splits', cmd)
+        return (self.post_batch(parent_dn, batch[:half], cmd=cmd) +
+                self.post_batch(parent_dn, batch[half:], cmd=cmd))
 
 
     def format_bd_scope(self, row_data):
@@ -92,60 +743,1274 @@ class AciHandler(object):
         return scope
 
 
-    def push_to_apic(self, cmd):
-        # unpack command values from the dictionary
-        json_folder = self.launcher.data[cmd]['json_folder']
-        json_file = self.launcher.data[cmd]['json_file']
-        json_uri = self.launcher.data[cmd]['json_uri']
-        action_msg = self.launcher.data[cmd]['action_msg']
-        table_name = self.launcher.data[cmd]['table_name']
-        mandatory_keys = self.launcher.data[cmd]['mandatory_keys']
-        default_values = self.launcher.data[cmd]['default_values']
-
-        # get data from the table in excel (i.e. TABLE_TENANT)
-        table = excel.get_table(table_name=table_name,
-                                mandatory_keys=mandatory_keys,
-                                default_values=default_values)
-
-        #load up the jinja2 crap
-        template_loader = jinja2.FileSystemLoader(searchpath=(JSON_ROOT_FOLDER+
-                                                              json_folder))
-        template_env = jinja2.Environment(loader=template_loader)
-        template = template_env.get_template(json_file)
-
-        for row in table:
-            # convert scope for bd_subnet
-            if 'bd_subnet' in cmd:
-                scope = self.format_bd_scope(table[row])
-                table[row]['scope'] = scope
-
-            # update the payload & uri values
-            row_payload = template.render(**table[row])
-            row_uri = str(json_uri.format(**table[row]))
-
-            # generate the full URI to post the payload
-            full_uri = APIC_URI.format(apic=self.apic, payload_uri=row_uri)
+    def render_row(self, cmd, template, json_uri, row_data):
+        # convert scope for bd_subnet
+        if 'bd_subnet' in cmd:
+            scope = self.format_bd_scope(row_data)
+            row_data['scope'] = scope
+
+        # update the payload & uri values
+        row_payload = template.render(**row_data)
+        row_uri = str(json_uri.format(**row_data))
+
+        # generate the full URI to post the payload
+        full_uri = APIC_URI.format(apic=self.apic, payload_uri=row_uri)
+        return full_uri, row_payload
+
+    def render_table(self, cmd, template, json_uri, rows, table_name,
+                     progress=None):
+        """
+        Generator that renders each (row, row_data) of a table and yields
+        it as (row, full_uri, payload)
+        """
+        show_payload = (progress.show_payload if progress
+                        else self.excel.show_console_payload)
+        for row, row_data in rows:
+            with self.tracer.span('render', cmd, row=row):
+                full_uri, row_payload = self.render_row(cmd, template,
+                                                        json_uri, row_data)
 
             # update the console cell in excel to show the output
-            excel.show_console_payload(row=int(row),table_name=table_name,
-                                         uri=full_uri,payload=row_payload)
+            show_payload(row=int(row), table_name=table_name,
+                         uri=full_uri, payload=row_payload)
+            yield row, full_uri, row_payload
+
+    def prepare_push(self, cmd, incremental=None, resume=None,
+                     rollback=None):
+        """
+        Read the table of a command and get it ready to be pushed
+
+        Args:
+            cmd(str): command name from launcher.json
+            incremental(bool, optional): overrides 'incremental' from
+            launcher.json for the command
+            resume(ResumeState, optional): only push the rows that are not
+            done in a journaled run
+            rollback(bool, optional): overrides 'rollback' from
+            launcher.json for the command
+
+        Returns:
+            push(CommandPush): the state of the command push
+
+        """
+        push = CommandPush(cmd, self.launcher.data[cmd])
+        push.resume = resume
+
+        # get data from the table in excel (i.e. TABLE_TENANT), a table
+        # with a chunk_size is read while it is being pushed
+        if push.chunk_size:
+            table = self.excel.iter_table(table_name=push.table_name,
+                                          mandatory_keys=push.mandatory_keys,
+                                          default_values=push.default_values,
+                                          chunk_size=push.chunk_size)
+            total = self.excel.get_table_size(push.table_name)
+        else:
+            table = self.excel.get_table(table_name=push.table_name,
+                                         mandatory_keys=push.mandatory_keys,
+                                         default_values=push.default_values)
+            total = len(table)
+            table = table.items()
+        push.rows = self.read_rows(push, table)
+
+        # rows that refer to objects that do not exist are not posted
+        if self.references and push.cmd in self.references.references:
+            push.rows = self.skip_dangling_rows(push, push.rows)
+
+        # compiled once and shared by all commands, see templates.py
+        push.template = self.templates.get_template(push.json_folder,
+                                                    push.json_file)
+        if incremental is not None:
+            push.incremental = incremental
+        if rollback is not None:
+            push.rollback = rollback
+        self.start_push(push, total)
+        return push
+
+    def start_push(self, push, total):
+        self.resize_pool(push.max_in_flight)
+        self.retry_policies[push.cmd] = push.retry_policy
+
+        # status updates are buffered and written to excel in bulk
+        push.writer = self.excel.StatusWriter(table_name=push.table_name)
+
+        # the console shows a rolling summary rather than every payload
+        push.progress = self.excel.ConsoleProgress(push.table_name,
+                                                   total=total)
+
+    def read_rows(self, push, table):
+        """
+        Generator that yields the (row, row_data) of a command push. The
+        status cell and DN of each row are kept until its status is
+        recorded, see CommandPush.add_status().
+
+        If the command has expand_columns, the ranges in those columns are
+        expanded as the rows are read, one (key, row_data) per object. The
+        objects of a row share its status cell, the row gets its status
+        once every object has been pushed.
+        """
+        for row, row_data in table:
+            if not push.expand_columns:
+                push.cells[row] = row_data['status_cell']
+                push.dns[row] = push.get_dn(row_data)
+                yield row, row_data
+                continue
+
+            try:
+                count, objects = expand.expand_row(
+                    row_data, push.expand_columns,
+                    product=push.expand_product)
+            except ValueError as e:
+                # a single object, so that the status maps back to the row
+                key = next(push.keys)
+                push.sources[key] = row
+                push.pending[row] = [1, OrderedDict()]
+                push.cells[key] = row_data['status_cell']
+                push.dns[key] = push.get_dn(row_data)
+                self.record_status(push, key, STATUS_INVALID_RANGE)
+                continue
+            push.pending[row] = [count, OrderedDict()]
+            for object_data in objects:
+                key = next(push.keys)
+                push.sources[key] = row
+                push.cells[key] = row_data['status_cell']
+                push.dns[key] = push.get_dn(object_data)
+                yield key, object_data
+
+    def skip_dangling_rows(self, push, rows):
+        """
+        Generator that yields the (row, row_data) whose references can all
+        be resolved, see build_reference_index(). The others are recorded
+        as missing a reference without being rendered or posted, and the
+        rows of later commands can no longer refer to their objects.
+        """
+        for row, row_data in rows:
+            if self.references.find_missing(push.cmd, row_data):
+                self.tracer.count('missing_references', push.cmd)
+                self.references.remove(push.dns[row])
+                self.record_status(push, row, STATUS_MISSING_REFERENCE)
+            else:
+                yield row, row_data
+
+    def get_jobs(self, push, failed_dns=None):
+        """
+        Generator that renders the rows of a command push and yields the
+        jobs to post them for run_jobs(), i.e.
+        (push, (parent_dn, batch, cmd))
+
+        Args:
+            push(CommandPush): as returned by prepare_push()
+            failed_dns(set, optional): DNs that failed to post, rows for
+            these DNs or their children are cancelled instead of posted
+
+        """
+        rows = self.render_table(push.cmd, push.template, push.json_uri,
+                                 push.rows, push.table_name,
+                                 progress=push.progress)
+        return self.get_post_jobs(push, rows, failed_dns)
+
+    def get_post_jobs(self, push, rows, failed_dns=None):
+        """
+        Generator that yields the jobs to post the rendered rows of a
+        command push, (row, full_uri, payload) tuples, see get_jobs()
+        """
+        # the payload hash of each row is journaled with its status
+        if self.journal or push.resume:
+            rows = self.hash_rows(push, rows)
+
+        # skip the rows that are done in the run being resumed
+        if push.resume:
+            rows = self.skip_done_rows(push, rows)
+
+        # cancel the rows whose parent objects failed to post
+        if failed_dns:
+            rows = self.cancel_failed_children(push, rows, failed_dns)
+
+        # skip the rows that already match the config on the APIC
+        if push.incremental:
+            rows = self.skip_unchanged_rows(push, rows)
 
-            # post the payload and get the status result
-            status = self.post(full_uri,row_payload)
+        # the state of the DNs before they are posted, see rollback_push()
+        if push.rollback and self.rollback_set:
+            rows = self.capture_pre_images(push, rows)
 
-            #update the cell with the status result
-            row_status_location = table[row]['status_cell']
+        # rows sharing a parent DN are coalesced into a single post
+        if push.batch_size > 1:
+            batches = coalesce.build_batches(rows, push.batch_size)
+        else:
+            batches = ((None, [(row, uri, payload, None)])
+                       for row, uri, payload in rows)
+        for parent_dn, batch in batches:
+            yield push, (parent_dn, batch, push.cmd)
 
-            excel.update_status(row_status_location, status)
+    def hash_rows(self, push, rows):
+        for row, uri, payload in rows:
+            push.hashes[row] = journal.get_payload_hash(payload)
+            yield row, uri, payload
+
+    def skip_done_rows(self, push, rows):
+        """
+        Generator that yields the rendered rows that are not done in the
+        run being resumed. The rows that were posted successfully, and
+        have not changed since, keep the status they were given.
+        """
+        for row, uri, payload in rows:
+            status = push.resume.get_status(push.cmd, push.dns[row],
+                                            push.hashes[row])
+            if status in excel.SUCCESS_CODES:
+                self.record_status(push, row, status)
+            elif push.resume.failed_only and not push.resume.is_reached(
+                    push.cmd, push.cells[row], push.dns[row],
+                    push.hashes[row]):
+                # the row is left alone, it gets no status
+                self.record_status(push, row, None)
+            else:
+                yield row, uri, payload
+
+    def skip_unchanged_rows(self, push, rows):
+        """
+        Generator that yields the rendered rows that would change the
+        config on the APIC, the others are recorded as unchanged. The rows
+        are looked up a chunk at a time if the push has a chunk_size.
+        """
+        rows = iter(rows)
+        while True:
+            chunk = list(itertools.islice(rows, push.chunk_size))
+            if not chunk:
+                return
+            unchanged = self.find_unchanged_rows(chunk, push.max_in_flight)
+            for row in sorted(unchanged):
+                self.record_status(push, row, STATUS_UNCHANGED)
+            for rendered in chunk:
+                if rendered[0] not in unchanged:
+                    yield rendered
+            if not push.chunk_size:
+                return
+
+    def capture_pre_images(self, push, rows):
+        """
+        Generator that yields the rendered rows once the state of their
+        DNs has been fetched, and keeps the payload that undoes each row
+        until its status is known. The rows are fetched a chunk at a time,
+        while the rows of the previous chunks are being posted.
+        """
+        rows = iter(rows)
+        while True:
+            chunk = list(itertools.islice(rows, rollback.CAPTURE_CHUNK_SIZE))
+            if not chunk:
+                return
+            state, known_dns = self.get_current_state(chunk,
+                                                      push.max_in_flight)
+            for row, uri, payload in chunk:
+                dn = coalesce.uri_to_dn(uri)
+                if dn in known_dns:
+                    push.pre_images[row] = rollback.get_restore_payload(
+                        dn, payload, state.get(dn))
+                else:
+                    push.pre_images[row] = (None, None)
+                yield row, uri, payload
+
+    def cancel_failed_children(self, push, rows, failed_dns):
+        for row, uri, payload in rows:
+            rns = coalesce.split_dn(coalesce.uri_to_dn(uri))
+            if any('/'.join(rns[:i]) in failed_dns
+                   for i in range(1, len(rns) + 1)):
+                self.record_status(push, row, STATUS_CANCELLED)
+            else:
+                yield row, uri, payload
+
+    def record_status(self, push, row, status):
+        """
+        Record the status of a row, or of an object of an expanded row. A
+        status of None leaves the row alone.
+
+        Returns:
+            status_cell(str): the status cell that was updated, or None
+            if the row has objects that are still being pushed
+
+        """
+        if self.journal and status is not None:
+            self.journal.add(push.cmd, row, push.cells[row], push.dns[row],
+                             push.hashes.get(row), status)
+        if row in push.pre_images:
+            self.add_pre_image(push, row, status)
+        row_status_location, status = push.add_status(row, status)
+        if row_status_location is None:
+            return None
+        push.progress.row_done(status)
+
+        #update the cell with the status result
+        with self.tracer.span('write_back', push.cmd, row=row):
+            self.excel.update_status(row_status_location, status,
+                                     writer=push.writer)
+        return row_status_location
+
+    def add_pre_image(self, push, row, status):
+        # rows the APIC rejected have not changed anything to roll back
+        action, payload = push.pre_images.pop(row)
+        if status is None or 400 <= status < 500:
+            return
+        if payload is None:
+            self.tracer.count('not_captured', push.cmd)
+            return
+        self.rollback_set.add(push.cmd, push.dns[row], action, payload)
+
+    def finish_push(self, push):
+        with self.tracer.span('flush', push.cmd):
+            push.writer.flush()
+
+        if tracing.TRACE_FILE:
+            self.tracer.export(tracing.TRACE_FILE)
 
         # update status for the overall exceution of the script
-        excel.show_push_report_status(table_name=table_name,
-                                      action_msg=action_msg)
+        template_stats = self.templates.get_stats(push.json_folder,
+                                                  push.json_file)
+        self.excel.show_push_report_status(
+            table_name=push.table_name, action_msg=push.action_msg,
+            conn_stats=self.connection_stats, template_stats=template_stats,
+            trace_stats=self.tracer.get_summary(push.cmd), push=push)
+
+    def flush_status(self, pushes):
+        # write the statuses still buffered when a push is interrupted, the
+        # journal already has them
+        for push in pushes:
+            if push is not None and push.writer is not None:
+                push.writer.flush()
+
+    def validate_commands(self, cmds):
+        """
+        Check the templates and json_uri of the commands against the columns
+        of their tables, the problems are shown in the console
+
+        Returns:
+            bool: True if the commands can be pushed
+
+        """
+        if not VALIDATE:
+            return True
+        problems = []
+        for cmd in cmds:
+            cmd_data = self.launcher.data[cmd]
+            header = self.excel.get_table_header(cmd_data['table_name'])
+            problems += validate.check_command(cmd, cmd_data, header,
+                                               self.templates,
+                                               launcher_data=self.launcher.data)
+        if problems:
+            self.excel.show_validation_problems(problems)
+        return not problems
+
+    def build_reference_index(self, cmds):
+        """
+        Build the index that the references of the commands, the
+        'references' key in launcher.json, are resolved against before they
+        are pushed. It holds the DNs of every row of the referenced tables
+        and, if references.APIC_SNAPSHOT is set, the DNs of their classes on
+        the APIC, fetched with one paginated class query per class and
+        cached for references.SNAPSHOT_TTL seconds.
+
+        Args:
+            cmds(list): command names from launcher.json
+
+        Returns:
+            index(ReferenceIndex): or None if the commands have no references
+
+        """
+        if not references.CHECK_REFERENCES:
+            return None
+        cmd_references = OrderedDict(
+            (cmd, self.launcher.data[cmd]['references']) for cmd in cmds
+            if self.launcher.data[cmd].get('references'))
+        if not cmd_references:
+            return None
+        index = references.ReferenceIndex(cmd_references)
+        targets = sorted(set(itertools.chain.from_iterable(
+            cmd_refs.values() for cmd_refs in cmd_references.values())))
+        queries = {}
+        for target in targets:
+            cmd_data = self.launcher.data.get(target)
+            if not cmd_data or self.excel.get_table_header(
+                    cmd_data['table_name']) is None:
+                continue
+            try:
+                source = self.templates.env.loader.get_source(
+                    self.templates.env, self.launcher.index[target][
+                        'template'])[0]
+            except (OSError, jinja2.TemplateError) as e:
+                continue
+            cls = references.get_root_class(source)
+            index.add_target(target, cls, cmd_data['json_uri'])
+            self.add_table_to_index(index, CommandPush(target, cmd_data))
+
+            if not references.APIC_SNAPSHOT or not cls:
+                continue
+            dns = references.get_snapshot(self.apic, cls)
+            if dns is not None:
+                index.add_snapshot(cls, dns)
+            elif self.cookies:
+                queries[(cls, references.SNAPSHOT_QUERY_FILE)] = \
+                    self.templates.get_template(
+                        export.QUERY_FOLDER, references.SNAPSHOT_QUERY_FILE)
+            else:
+                # not logged in, i.e. compile_plan(), the APIC is unknown
+                index.add_snapshot(cls, None)
+
+        results, failed = self.query_classes(queries)
+        for query in queries:
+            dns = None
+            if query in results:
+                dns = set(mo['attributes']['dn'] for mo in results[query])
+                references.set_snapshot(self.apic, query[0], dns)
+            index.add_snapshot(query[0], dns)
+        return index
+
+    def add_table_to_index(self, index, push):
+        # every object of the table, the ranges of its rows are expanded.
+        # The table is not pushed, its ignored rows are left alone.
+        table = self.excel.read_table(table_name=push.table_name,
+                                      mandatory_keys=push.mandatory_keys,
+                                      default_values=push.default_values)
+        for row, row_data in table:
+            try:
+                count, objects = expand.expand_row(
+                    row_data, push.expand_columns,
+                    product=push.expand_product)
+                for object_data in objects:
+                    index.add_row(push.get_dn(object_data), object_data)
+            except (ValueError, KeyError, IndexError) as e:
+                continue
+
+    def start_journal(self, cmds, incremental=None):
+        """
+        Start journaling the status of every row of a push run, so that the
+        run can be resumed if it is interrupted, see resume_push()
+        """
+        try:
+            self.journal = journal.new_journal(cmds, apic=self.apic,
+                                               incremental=incremental,
+                                               fabric=self.fabric)
+        except OSError as e:
+            self.journal = None
+
+    def close_journal(self):
+        if self.journal:
+            self.journal.close()
+        self.journal = None
+
+    def start_rollback_set(self, cmds, capture=None, commands=None):
+        """
+        Start the rollback set of a push run, if one of the commands
+        captures the state of its DNs before they are pushed
+
+        Args:
+            cmds(list): command names of the run
+            capture(bool, optional): overrides 'rollback' from launcher.json
+            commands(dict, optional): launcher.json data of the commands,
+            i.e. from a push plan
+
+        """
+        commands = commands or self.launcher.data
+        if not any(capture if capture is not None else
+                   commands[cmd].get('rollback', ROLLBACK) for cmd in cmds):
+            return
+        try:
+            self.rollback_set = rollback.new_rollback_set(
+                cmds, apic=self.apic, fabric=self.fabric)
+        except OSError as e:
+            self.rollback_set = None
+
+    def close_rollback_set(self):
+        if self.rollback_set:
+            self.rollback_set.close()
+        self.rollback_set = None
+
+    def push_to_apic(self, cmd, incremental=None, resume=None,
+                     rollback=None):
+        if not self.validate_commands([cmd]):
+            return None
+        self.start_journal([cmd], incremental=incremental)
+        self.start_rollback_set([cmd], capture=rollback)
+        push = None
+        try:
+            self.references = self.build_reference_index([cmd])
+            push = self.prepare_push(cmd, incremental=incremental,
+                                     resume=resume, rollback=rollback)
+            for push, results in run_jobs(self.get_jobs(push),
+                                          worker=self.post_batch,
+                                          max_in_flight=push.max_in_flight):
+                for row, status in results:
+                    self.record_status(push, row, status)
+            self.finish_push(push)
+        finally:
+            self.flush_status([push])
+            self.close_journal()
+            self.close_rollback_set()
+            self.references = None
+        return push
+
+    def push_commands(self, cmds, incremental=None, resume=None,
+                      rollback=None):
+        """
+        Push several commands in the order of their dependencies, see
+        scheduler.get_levels(). The commands of a level are pushed
+        together, their rows are posted in parallel up to the highest
+        max_in_flight of the commands. The rows of a command whose parent
+        objects failed to post in an earlier level are cancelled.
+
+        Args:
+            cmds(list): command names from launcher.json
+            incremental(bool, optional): overrides 'incremental' from
+            launcher.json for every command
+            resume(ResumeState, optional): only push the rows that are not
+            done in a journaled run
+            rollback(bool, optional): overrides 'rollback' from
+            launcher.json for every command
+
+        Returns:
+            pushes (list): CommandPush for every command, in push order, or
+            None if the commands did not pass validate_commands()
+
+        """
+        if not self.validate_commands(cmds):
+            return None
+        self.start_journal(cmds, incremental=incremental)
+        self.start_rollback_set(cmds, capture=rollback)
+        try:
+            self.references = self.build_reference_index(cmds)
+            return self.push_levels(cmds, incremental=incremental,
+                                    resume=resume, rollback=rollback)
+        finally:
+            self.close_journal()
+            self.close_rollback_set()
+            self.references = None
+
+    def push_levels(self, cmds, incremental=None, resume=None,
+                    rollback=None):
+        pushes = []
+        level_pushes = []
+        failed_dns = set()
+        active_worksheet = self.excel.get_active_worksheet()
+        try:
+            for level in scheduler.get_levels(self.launcher.data, cmds):
+                level_failed = set()
+                for worksheet_name, level_cmds in \
+                        scheduler.group_by_worksheet(self.launcher.data,
+                                                     level):
+                    self.excel.activate_worksheet(worksheet_name)
+                    level_pushes = [self.prepare_push(cmd, incremental,
+                                                      resume, rollback)
+                                    for cmd in level_cmds]
+                    jobs = itertools.chain.from_iterable(
+                        self.get_jobs(push, failed_dns)
+                        for push in level_pushes)
+                    max_in_flight = max(push.max_in_flight
+                                        for push in level_pushes)
+                    for push, results in run_jobs(
+                            jobs, worker=self.post_batch,
+                            max_in_flight=max_in_flight):
+                        for row, status in results:
+                            self.record_status(push, row, status)
+                    for push in level_pushes:
+                        self.finish_push(push)
+                        level_failed.update(push.failed_dns)
+                    pushes.extend(level_pushes)
+                failed_dns.update(level_failed)
+        finally:
+            self.flush_status(level_pushes)
+        self.excel.activate_worksheet(active_worksheet)
+        self.excel.show_push_commands_report(pushes)
+        return pushes
+
+    def resume_push(self, fname=None, failed_only=False):
+        """
+        Push the commands of a journaled run again, only posting the rows
+        that are not done, i.e. after Excel hung or the laptop went to sleep
+        half way through a push
+
+        Args:
+            fname(str, optional): journal of the run, defaults to the last
+            run against this APIC, see journal.get_latest_journal()
+            failed_only(bool): only post the rows that were posted and
+            failed, not the rows the run did not get to
+
+        Returns:
+            pushes (list): CommandPush for every command, or None if there
+            is no journal to resume for this APIC or the commands did not
+            pass validation
+
+        """
+        fname = fname or journal.get_latest_journal(
+            controllers=self.cluster.addresses)
+        if not fname:
+            return None
+        resume = journal.ResumeState(fname, failed_only=failed_only)
+        if not self.is_run_of_apic(resume.run, fname):
+            return None
+        cmds = [cmd for cmd in resume.cmds if cmd in self.launcher.data]
+        if len(cmds) == 1:
+            push = self.push_to_apic(cmds[0], incremental=resume.incremental,
+                                     resume=resume)
+            return [push] if push else None
+        return self.push_commands(cmds, incremental=resume.incremental,
+                                  resume=resume)
+
+    def compile_plan(self, cmds, fname=None):
+        """
+        Read and render the tables of the commands and write them to a push
+        plan, in the order they are pushed, see plan.py. The plan can be
+        reviewed and replayed later with replay_plan(), without the
+        workbook or the templates.
+
+        Args:
+            cmds(list): command names from launcher.json
+            fname(str, optional): plan file, defaults to PLAN_FILE
+
+        Returns:
+            push_plan(Plan): or None if the commands did not pass
+            validate_commands()
+
+        """
+        if not self.validate_commands(cmds):
+            return None
+        fname = fname or PLAN_FILE
+        steps = []
+        for level, level_cmds in enumerate(scheduler.get_levels(
+                self.launcher.data, cmds)):
+            for worksheet_name, step_cmds in scheduler.group_by_worksheet(
+                    self.launcher.data, level_cmds):
+                steps.append(OrderedDict([('level', level),
+                                          ('worksheet_name', worksheet_name),
+                                          ('cmds', step_cmds)]))
+        writer = plan.PlanWriter(fname, steps, OrderedDict(
+            (cmd, self.launcher.data[cmd]) for cmd in cmds))
+        active_worksheet = self.excel.get_active_worksheet()
+        failed_cells = OrderedDict()
+        try:
+            self.references = self.build_reference_index(cmds)
+            for step_index, step in enumerate(steps):
+                self.excel.activate_worksheet(step['worksheet_name'])
+                for cmd in step['cmds']:
+                    push = self.prepare_push(cmd)
+                    for row, uri, payload in self.render_table(
+                            push.cmd, push.template, push.json_uri,
+                            push.rows, push.table_name,
+                            progress=push.progress):
+                        source = push.sources.pop(row, None)
+                        objects = (push.pending[source][0]
+                                   if source is not None else None)
+                        writer.add(step_index, cmd, row, push.cells.pop(row),
+                                   push.dns.pop(row), payload,
+                                   source=source, objects=objects)
+                    # rows that can not be rendered, i.e. invalid ranges
+                    push.writer.flush()
+                    if push.failed_cells:
+                        failed_cells[cmd] = list(push.failed_cells.values())
+        except Exception:
+            writer.abort()
+            raise
+        finally:
+            self.references = None
+        writer.close()
+        self.excel.activate_worksheet(active_worksheet)
+        push_plan = plan.Plan(fname)
+        console_msg = plan.get_plan_summary(push_plan)
+        for cmd, cells in failed_cells.items():
+            console_msg += '\n  -- {}: rows left out of the plan: {}'.format(
+                cmd, ', '.join(cells))
+        self.excel.update_console(msg=console_msg)
+        return push_plan
+
+    def read_plan_rows(self, push, entries):
+        """
+        Generator that yields the rows of a command from a push plan as
+        rendered rows, (row, full_uri, payload)
+        """
+        for entry in entries:
+            row = entry['row']
+            push.cells[row] = entry['cell']
+            push.dns[row] = entry['dn']
+            # an object of an expanded row, see read_rows()
+            if 'source' in entry:
+                source, objects = entry['source']
+                push.sources[row] = source
+                push.pending.setdefault(source, [objects, OrderedDict()])
+            full_uri = APIC_URI.format(apic=self.apic,
+                                       payload_uri='mo/' + entry['dn'])
+            yield row, full_uri, entry['payload']
+
+    def replay_plan(self, fname=None):
+        """
+        Push the rows of a push plan, as they were rendered by
+        compile_plan(). The steps of the plan are pushed in the same order,
+        and with the same settings, as push_commands() would, but nothing
+        is read from the workbook and nothing is rendered. The status of
+        every row is journaled, so it can be written back to the workbook
+        afterwards with write_back_results().
+
+        Args:
+            fname(str, optional): plan file, defaults to PLAN_FILE
+
+        Returns:
+            pushes (list): CommandPush for every command, in push order, or
+            None if the plan can not be read
+
+        """
+        fname = fname or PLAN_FILE
+        try:
+            push_plan = plan.Plan(fname)
+        except (OSError, ValueError) as e:
+            self.excel.update_console(msg='Push plan {} can not be read '
+                                          '({})'.format(fname, e))
+            return None
+        self.start_journal(list(push_plan.counts))
+        self.start_rollback_set(list(push_plan.counts),
+                                commands=push_plan.commands)
+        pushes = []
+        failed_dns = set()
+        level_failed = set()
+        level = 0
+        step_pushes = OrderedDict()
+        active_worksheet = self.excel.get_active_worksheet()
+        try:
+            for step, entries in push_plan.iter_steps():
+                if step['level'] != level:
+                    failed_dns.update(level_failed)
+                    level = step['level']
+                self.excel.activate_worksheet(step['worksheet_name'])
+                step_pushes = OrderedDict()
+                for cmd in step['cmds']:
+                    step_pushes[cmd] = CommandPush(cmd,
+                                                   push_plan.commands[cmd])
+                    self.start_push(step_pushes[cmd], push_plan.counts[cmd])
+                jobs = itertools.chain.from_iterable(
+                    self.get_post_jobs(
+                        step_pushes[cmd],
+                        self.read_plan_rows(step_pushes[cmd], cmd_entries),
+                        failed_dns)
+                    for cmd, cmd_entries in itertools.groupby(
+                        entries, key=lambda entry: entry['cmd']))
+                max_in_flight = max(push.max_in_flight
+                                    for push in step_pushes.values())
+                for push, results in run_jobs(jobs, worker=self.post_batch,
+                                              max_in_flight=max_in_flight):
+                    for row, status in results:
+                        self.record_status(push, row, status)
+                for push in step_pushes.values():
+                    self.finish_push(push)
+                    level_failed.update(push.failed_dns)
+                pushes.extend(step_pushes.values())
+        finally:
+            self.flush_status(step_pushes.values())
+            self.close_journal()
+            self.close_rollback_set()
+        self.excel.activate_worksheet(active_worksheet)
+        self.excel.show_push_commands_report(pushes)
+        return pushes
+
+    def write_back_results(self, fname=None):
+        """
+        Write the status of every row of a journaled run to the status
+        cells of the tables, i.e. once a push plan has been replayed
+        without the workbook
+
+        Args:
+            fname(str, optional): journal of the run, defaults to the last
+            run against this APIC, see journal.get_latest_journal()
+
+        Returns:
+            statuses (OrderedDict): k,v, k=command and v=dict of status
+            cell to status, or None if there is no journal for this APIC
+
+        """
+        fname = fname or journal.get_latest_journal(
+            controllers=self.cluster.addresses)
+        if not fname:
+            return None
+        run = {}
+        objects = OrderedDict()
+        for entry in journal.read_journal(fname):
+            if 'run' in entry:
+                run = entry
+            else:
+                # the objects of an expanded row share its status cell
+                objects.setdefault(entry['cmd'], OrderedDict()).setdefault(
+                    entry['cell'], {})[entry['row']] = entry['status']
+        if not self.is_run_of_apic(run, fname):
+            return None
+        statuses = OrderedDict(
+            (cmd, OrderedDict((cell, get_worst_status(cell_statuses))
+                              for cell, cell_statuses in cells.items()))
+            for cmd, cells in objects.items())
+
+        active_worksheet = self.excel.get_active_worksheet()
+        console_msg = 'Results of {} written back:'.format(fname)
+        for cmd, cells in statuses.items():
+            cmd_data = self.launcher.data.get(cmd)
+            if not cmd_data:
+                continue
+            self.excel.activate_worksheet(cmd_data['worksheet_name'])
+            writer = self.excel.StatusWriter(
+                table_name=cmd_data['table_name'])
+            for cell, status in cells.items():
+                self.excel.update_status(cell, status, writer=writer)
+            writer.flush()
+            console_msg += '\n  -- {}: {} rows'.format(cmd, len(cells))
+        self.excel.activate_worksheet(active_worksheet)
+        self.excel.update_console(msg=console_msg)
+        return statuses
+
+    def is_run_of_apic(self, run, fname):
+        """
+        Check that a journal or rollback set was written by a run against
+        this APIC, so that a run against another fabric, or a benchmark, is
+        never replayed here. The console shows why a run is refused.
+
+        Args:
+            run(dict): the first line of the file, describing the run
+            fname(str): the journal or rollback set
+
+        Returns:
+            bool: True if the run was against one of the controllers
+
+        """
+        if run.get('apic') and run['apic'] not in self.cluster.addresses:
+            self.excel.update_console(
+                msg='{} is for APIC {}, not {}'.format(fname, run['apic'],
+                                                       self.apic))
+            return False
+        return True
+
+    def rollback_push(self, fname=None, max_in_flight=rollback.MAX_IN_FLIGHT):
+        """
+        Undo a push run from its rollback set: the objects it created are
+        deleted and the objects it changed or deleted are put back as they
+        were, see rollback.get_levels() for the order. Only the DNs of the
+        run are posted, rather than a whole fabric snapshot.
+
+        Args:
+            fname(str, optional): rollback set of the run, defaults to the
+            last run against this APIC that captured one
+            max_in_flight(int): max number of objects posted in parallel
+
+        Returns:
+            results (list): (entry, status) for every entry of the set, or
+            None if there is no rollback set for this APIC
+
+        """
+        fname = fname or rollback.get_latest_rollback_set(
+            controllers=self.cluster.addresses)
+        if not fname:
+            return None
+        run, entries = rollback.read_rollback_set(fname)
+        if not self.is_run_of_apic(run, fname):
+            return None
+        results = []
+        for level in rollback.get_levels(entries):
+            jobs = ((entry, (entry['cmd'], [entry['dn']],
+                             APIC_URI.format(apic=self.apic,
+                                             payload_uri='mo/' + entry['dn']),
+                             entry['payload']))
+                    for entry in level)
+            results.extend(run_jobs(jobs, worker=self.trace_post,
+                                    max_in_flight=max_in_flight))
+        self.excel.update_console(
+            msg=rollback.get_rollback_summary(fname, results))
+        return results
+
+    def read_fabric_tables(self, cmds):
+        """
+        Read the tables of the commands, and of the commands they refer to,
+        once for all the fabrics they are pushed to. A table with a
+        chunk_size is read as a whole, as every fabric reads it.
+
+        Returns:
+            tables(TableCache): see fanout.py
+
+        """
+        tables = fanout.TableCache(self.excel)
+        active_worksheet = self.excel.get_active_worksheet()
+        targets = []
+        for cmd in cmds:
+            cmd_data = self.launcher.data[cmd]
+            push = CommandPush(cmd, cmd_data)
+            # the ignored rows are marked on the active worksheet
+            self.excel.activate_worksheet(cmd_data['worksheet_name'])
+            tables.add(push.table_name, mandatory_keys=push.mandatory_keys,
+                       default_values=push.default_values)
+            if references.CHECK_REFERENCES:
+                targets += cmd_data.get('references', {}).values()
+        self.excel.activate_worksheet(active_worksheet)
+        for target in targets:
+            if target not in self.launcher.data:
+                continue
+            push = CommandPush(target, self.launcher.data[target])
+            tables.add(push.table_name, mandatory_keys=push.mandatory_keys,
+                       default_values=push.default_values, pushed=False)
+        return tables
+
+    def push_to_fabrics(self, cmds, fabrics, rollback=None):
+        """
+        Push commands to several fabrics at the same time. Every fabric is
+        pushed by its own AciHandler, in its own thread, with
+        push_commands(): in dependency order, with its own journal,
+        rollback set and reference index, and the rows whose parent objects
+        failed on that fabric are cancelled. A fabric's run can be resumed
+        or rolled back against its APIC like any other run.
+
+        The tables are read once, see read_fabric_tables(). The status cell
+        of a row shows its worst status across the fabrics, and the status
+        of every fabric is written to the fabric results by the backend.
+
+        Rows are always posted, an incremental push is not supported as
+        the fabrics may not hold the same config.
+
+        Args:
+            cmds(list): command names from launcher.json
+            fabrics(OrderedDict): k,v, k=fabric name and v=AciHandler
+            that is logged in to the fabric
+            rollback(bool, optional): overrides 'rollback' from
+            launcher.json for every command
+
+        Returns:
+            pushes(OrderedDict): k,v, k=fabric name and v=CommandPush for
+            every command, or None if the commands did not pass
+            validate_commands()
+
+        """
+        if not self.validate_commands(cmds):
+            return None
+        # this handler may be one of the fabrics, its backend is swapped too
+        backend = self.excel
+        tables = self.read_fabric_tables(cmds)
+        updates = queue.Queue()
+        for name, handler in fabrics.items():
+            handler.excel = fanout.FabricBackend(name, tables, updates)
+            # the posts to every fabric are traced together
+            handler.tracer = self.tracer
+        try:
+            with ThreadPoolExecutor(max_workers=len(fabrics)) as pool:
+                futures = OrderedDict(
+                    (name, pool.submit(handler.push_commands, cmds,
+                                       incremental=False, rollback=rollback))
+                    for name, handler in fabrics.items())
+                statuses = self.write_fabric_statuses(backend, tables,
+                                                      updates, fabrics,
+                                                      futures.values())
+        finally:
+            for handler in fabrics.values():
+                handler.excel = backend
+
+        # one line per row, with the status of every fabric
+        for table_name, cells in statuses.items():
+            results = [[cell] + [cell_statuses.get(name) for name in fabrics]
+                       for cell, cell_statuses in sorted(
+                           cells.items(),
+                           key=lambda item: excel.split_address(item[0])[1])]
+            backend.write_fabric_results(table_name, list(fabrics), results)
+        pushes = OrderedDict((name, future.result())
+                             for name, future in futures.items())
+
+        console_msg = ''
+        for name, fabric_pushes in pushes.items():
+            console_msg += 'Fabric {}: {}\n'.format(
+                name, excel.get_push_commands_summary(fabric_pushes or []))
+        backend.update_console(msg=console_msg.strip())
+        return pushes
+
+    def write_fabric_statuses(self, backend, tables, updates, fabrics,
+                              futures):
+        """
+        Write the status cell of each row once every fabric has pushed it,
+        until the push of every fabric is done. A row that a fabric did not
+        get to, i.e. its push was interrupted, is written at the end as
+        if the fabric did not answer.
+
+        Args:
+            backend(module): excel, or the headless module
+            tables(TableCache): the tables of the push
+            updates(queue.Queue): status updates of every fabric, see
+            fanout.FabricBackend
+            fabrics(OrderedDict): k,v, k=fabric name and v=AciHandler
+            futures(list): the push of every fabric
+
+        Returns:
+            statuses(OrderedDict): k,v, k=table name and v=OrderedDict of
+            status cell to dict of fabric name to status
+
+        """
+        statuses = OrderedDict()
+        worksheets = dict((cmd_data['table_name'], cmd_data['worksheet_name'])
+                          for cmd_data in self.launcher.data.values())
+        active_worksheet = backend.get_active_worksheet()
+        progress = {}
+        # the status cells are written to the active worksheet, one table
+        # at a time
+        writer = None
+
+        def write_status(table_name, cell, status):
+            nonlocal writer
+            if writer is None or writer.table_name != table_name:
+                if writer is not None:
+                    writer.flush()
+                backend.activate_worksheet(worksheets.get(table_name))
+                writer = backend.StatusWriter(table_name=table_name)
+            if table_name not in progress:
+                progress[table_name] = backend.ConsoleProgress(
+                    table_name, total=tables.sizes.get(table_name, 0))
+            progress[table_name].row_done(status)
+            backend.update_status(cell, status, writer=writer)
+
+        pending = set(futures)
+        try:
+            while pending or not updates.empty():
+                try:
+                    name, table_name, cell, status = updates.get(
+                        timeout=FABRIC_POLL_INTERVAL)
+                except queue.Empty:
+                    pending = set(future for future in pending
+                                  if not future.done())
+                    continue
+                cell_statuses = statuses.setdefault(
+                    table_name, OrderedDict()).setdefault(cell, OrderedDict())
+                cell_statuses[name] = status
+                if len(cell_statuses) == len(fabrics):
+                    write_status(table_name, cell,
+                                 get_worst_status(cell_statuses))
+        finally:
+            for table_name, cells in statuses.items():
+                for cell, cell_statuses in cells.items():
+                    if len(cell_statuses) < len(fabrics):
+                        write_status(table_name, cell, get_worst_status(
+                            dict((name, cell_statuses.get(
+                                name, cluster.STATUS_NO_ANSWER))
+                                 for name in fabrics)))
+            if writer is not None:
+                writer.flush()
+            backend.activate_worksheet(active_worksheet)
+        return statuses
+
+
+class CommandPush(object):
+    """
+    State of a command while its table is being pushed to the APIC
+    """
+    def __init__(self, cmd, cmd_data):
+        # unpack command values from the dictionary
+        self.cmd = cmd
+        self.json_folder = cmd_data['json_folder']
+        self.json_file = cmd_data['json_file']
+        self.json_uri = cmd_data['json_uri']
+        self.action_msg = cmd_data['action_msg']
+        self.table_name = cmd_data['table_name']
+        self.mandatory_keys = cmd_data['mandatory_keys']
+        self.default_values = cmd_data['default_values']
+        self.max_in_flight = cmd_data.get('max_in_flight', MAX_IN_FLIGHT)
+        self.batch_size = cmd_data.get('batch_size', BATCH_SIZE)
+        self.incremental = cmd_data.get('incremental', INCREMENTAL)
+        self.chunk_size = cmd_data.get('chunk_size', CHUNK_SIZE)
+        self.expand_columns = cmd_data.get('expand_columns', [])
+        self.expand_product = cmd_data.get('expand_product', EXPAND_PRODUCT)
+        self.rollback = cmd_data.get('rollback', ROLLBACK)
+        self.retry_policy = retry.RetryPolicy(
+            max_retries=cmd_data.get('max_retries', retry.MAX_RETRIES),
+            budget=cmd_data.get('retry_budget', retry.RETRY_BUDGET),
+            timeout=cmd_data.get('timeout', TIMEOUT),
+            adaptive=cmd_data.get('adaptive', ADAPTIVE))
+        self.rows = None
+        self.template = None
+        self.writer = None
+        self.progress = None
+        # status cell and DN of the rows read but not recorded yet
+        self.cells = {}
+        self.dns = {}
+        self.hashes = {}
+        self.resume = None
+        # action and payload that undo each row, see capture_pre_images()
+        self.pre_images = {}
+        # objects of expanded rows: the row each key belongs to, and for
+        # each row the number of objects left and their statuses
+        self.keys = itertools.count()
+        self.sources = {}
+        self.pending = {}
+        # running tally of the push, kept so that the table does not have
+        # to be read back for the report
+        self.counts = {'success': 0, 'failed': 0, 'cancelled': 0}
+        self.failed_dns = set()
+        self.failed_cells = OrderedDict()
+
+    def get_dn(self, row_data):
+        return str(self.json_uri.format(**row_data))[len('mo/'):]
+
+    def add_status(self, row, status):
+        """
+        Add the status of a row to the tally of the push. The objects of an
+        expanded row are tallied as one row once they all have a status,
+        the row gets the first failure of its objects. A status of None
+        leaves the row alone.
+
+        Returns:
+            (status_cell, status): the status cell of the row, i.e. $A$37,
+            and its status, or (None, None) if the row gets no status yet
+
+        """
+        cell = self.cells.pop(row)
+        dn = self.dns.pop(row)
+        self.hashes.pop(row, None)
+        if status is not None and status not in excel.SUCCESS_CODES:
+            self.failed_dns.add(dn)
+        if row in self.sources:
+            row, status = self.collapse(row, status)
+        if status is None:
+            return None, None
+
+        if status in excel.SUCCESS_CODES:
+            self.counts['success'] += 1
+            return cell, status
+        if status == STATUS_CANCELLED:
+            self.counts['cancelled'] += 1
+        else:
+            self.counts['failed'] += 1
+        self.failed_cells[row] = cell
+        return cell, status
+
+    def collapse(self, key, status):
+        """
+        Add the status of an object to its expanded row
+
+        Returns:
+            (row, status): the row and its status once all of its objects
+            are done, else (None, None)
+
+        """
+        row = self.sources.pop(key)
+        pending = self.pending[row]
+        pending[0] -= 1
+        if status is not None:
+            pending[1][key] = status
+        if pending[0]:
+            return None, None
+        del self.pending[row]
+        if not pending[1]:
+            return None, None
+        return row, get_worst_status(pending[1])
+
+
+def run_jobs(jobs, worker, max_in_flight=MAX_IN_FLIGHT):
+    """
+    Run worker(*args) for each (key, args) job and yield (key, result)
+    as each one completes. With max_in_flight above 1 the jobs are run
+    by a thread pool, with no more than max_in_flight running at once.
+
+    Only the worker runs in the pool, the jobs generator and the code
+    consuming the results stay in the calling thread, so it is safe for
+    both to talk to excel.
+
+    Args:
+        jobs(iterable): (key, args) tuples, args is a tuple for the worker
+        worker(callable): function called with the job args, i.e. post()
+        max_in_flight(int): max number of jobs running in parallel
+
+    """
+    if max_in_flight <= 1:
+        for key, args in jobs:
+            yield key, worker(*args)
+        return
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        pending = {}
+        for key, args in jobs:
+            pending[pool.submit(worker, *args)] = key
+            # keep a bounded number of jobs queued up ahead of the workers
+            if len(pending) >= max_in_flight * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+
+
+def get_worst_status(statuses):
+    """
+    Get the status that represents a row pushed to several fabrics, the
+    first failure, or success if the row posted to every fabric
+
+    Args:
+        statuses(dict): k,v, k=fabric name and v=status of the row
+
+    """
+    for status in statuses.values():
+        if status not in excel.SUCCESS_CODES:
+            return status
+    if any(status == 200 for status in statuses.values()):
+        return 200
+    return STATUS_UNCHANGED
+
+
+def read_fabrics(fname=None):
+    """
+    Read the list of fabrics to push to from fabrics.json, i.e.
+
+        {"site-a": {"apic": "10.0.0.1", "user": "admin", "pword": "..."}}
+
+    The user and pword are optional, the runsheet values are used if they
+    are not defined for a fabric.
+
+    Returns:
+        fabrics(OrderedDict): k,v, k=fabric name and v=dict of details
+
+    """
+    with open(fname or FABRICS_FILE, 'r') as f:
+        return json.load(f, object_pairs_hook=OrderedDict)
+
+
+def login_to_fabrics(fabrics, user='', pword='', backend=excel):
+    """
+    Create an AciHandler for every fabric and log in to it
+
+    Args:
+        fabrics(OrderedDict): as returned by read_fabrics()
+        user(str): default user, if a fabric does not define one
+        pword(str): default password, if a fabric does not define one
+        backend(module): excel, or the headless module
+
+    Returns:
+        handlers(OrderedDict): k,v, k=fabric name and v=AciHandler, or
+        None if the login to one of the fabrics failed
+
+    """
+    handlers = OrderedDict()
+    for name, fabric in fabrics.items():
+        handler = AciHandler(apic=fabric['apic'],
+                             user=fabric.get('user') or user,
+                             pword=fabric.get('pword') or pword,
+                             backend=backend)
+        handler.fabric = name
+        handler.login()
+        if not handler.cookies:
+            return None
+        handlers[name] = handler
+    return handlers
+
+
+def get_handler(apic='', user='', pword='', backend=excel):
+    """
+    Get the AciHandler for an APIC and user. It is created on first use and
+    then kept, so that the button clicks served by the same process share
+    its session, connection pool and login.
+    """
+    key = (apic, user, backend.__name__)
+    handler = _handlers.get(key)
+    if handler is None or handler.pword != pword:
+        handler = _handlers[key] = AciHandler(apic=apic, user=user,
+                                              pword=pword, backend=backend)
+    else:
+        handler.reset_run()
+    return handler
 
 
 # This function is called from excel via xlwings addon
 def run_from_excel(cmd):
-    aci = AciHandler(apic=excel.APIC,user=excel.USER,pword=excel.PWORD)
+    aci = get_handler(apic=excel.APIC,user=excel.USER,pword=excel.PWORD)
     aci.login()
     if not aci.cookies:
         return
@@ -158,6 +2023,135 @@ def run_from_excel(cmd):
         return
     aci.push_to_apic(cmd)
 
+# This function is called from excel via xlwings addon
+def run_worksheet_from_excel():
+    """
+    Push every command of the active worksheet, in dependency order
+    """
+    aci = get_handler(apic=excel.APIC,user=excel.USER,pword=excel.PWORD)
+    aci.login()
+    if not aci.cookies:
+        return
+    if not aci.launcher.data:
+        return
+    worksheet_name = excel.get_active_worksheet()
+    cmds = [cmd for cmd in aci.launcher.data
+            if aci.launcher.data[cmd]['worksheet_name'] == worksheet_name]
+    aci.push_commands(cmds)
+
+# This function is called from excel via xlwings addon
+def run_all_from_excel():
+    """
+    Push every command in launcher.json, in dependency order
+    """
+    aci = get_handler(apic=excel.APIC,user=excel.USER,pword=excel.PWORD)
+    aci.login()
+    if not aci.cookies:
+        return
+    if not aci.launcher.data:
+        return
+    aci.push_commands(list(aci.launcher.data))
+
+# This function is called from excel via xlwings addon
+def run_fabrics_from_excel(cmd):
+    """
+    Push a command to every fabric listed in fabrics.json
+    """
+    try:
+        fabrics = read_fabrics()
+    except Exception as e:
+        excel.show_console_launcher_error(launcher_fname=FABRICS_FILE)
+        return
+    handlers = login_to_fabrics(fabrics, user=excel.USER, pword=excel.PWORD)
+    if not handlers:
+        return
+    aci = list(handlers.values())[0]
+    if not aci.launcher.data.get(cmd):
+        return
+    if not excel.can_run_cmd_from_worksheet(
+            cmd=cmd,launcher_data=aci.launcher.data):
+        return
+    aci.push_to_fabrics([cmd], handlers)
+
+# This function is called from excel via xlwings addon
+def run_resume_from_excel(failed_only=False):
+    """
+    Push the rows of the last push run that are not done, or only the rows
+    that failed if failed_only is set
+    """
+    aci = get_handler(apic=excel.APIC,user=excel.USER,pword=excel.PWORD)
+    aci.login()
+    if not aci.cookies:
+        return
+    if not aci.launcher.data:
+        return
+    if aci.resume_push(failed_only=failed_only) is None:
+        excel.update_console(msg='There is no push to resume')
+
+# This function is called from excel via xlwings addon
+def run_rollback_from_excel():
+    """
+    Undo the last push run that captured the state of its DNs, see
+    AciHandler.rollback_push()
+    """
+    aci = get_handler(apic=excel.APIC,user=excel.USER,pword=excel.PWORD)
+    aci.login()
+    if not aci.cookies:
+        return
+    if aci.rollback_push() is None:
+        excel.update_console(msg='There is no push to roll back')
+
+# This function is called from excel via xlwings addon
+def run_export_from_excel(cmd=None):
+    """
+    Add the current config of the APIC to the table of a command, or to
+    every table of the active worksheet if cmd is not set
+    """
+    aci = get_handler(apic=excel.APIC,user=excel.USER,pword=excel.PWORD)
+    aci.login()
+    if not aci.cookies:
+        return
+    if not aci.launcher.data:
+        return
+    if cmd:
+        if not aci.launcher.data.get(cmd):
+            return
+        if not excel.can_run_cmd_from_worksheet(
+                cmd=cmd,launcher_data=aci.launcher.data):
+            return
+        cmds = [cmd]
+    else:
+        worksheet_name = excel.get_active_worksheet()
+        cmds = [cmd for cmd in aci.launcher.data
+                if aci.launcher.data[cmd]['worksheet_name'] == worksheet_name]
+    aci.export_tables(cmds)
+
+# This function is called from excel via xlwings addon
+def run_compile_from_excel(fname=None):
+    """
+    Write the commands of the active worksheet to a push plan, to be
+    replayed later from the command line
+    """
+    aci = get_handler(apic=excel.APIC,user=excel.USER,pword=excel.PWORD)
+    if not aci.launcher.data:
+        return
+    worksheet_name = excel.get_active_worksheet()
+    cmds = [cmd for cmd in aci.launcher.data
+            if aci.launcher.data[cmd]['worksheet_name'] == worksheet_name]
+    aci.compile_plan(cmds, fname=fname)
+
+# This function is called from excel via xlwings addon
+def run_write_back_from_excel(fname=None):
+    """
+    Write the status of the rows of the last push, i.e. of a push plan
+    replayed from the command line, to the status cells of the tables
+    """
+    aci = get_handler(apic=excel.APIC,user=excel.USER,pword=excel.PWORD)
+    if not aci.launcher.data:
+        return
+    if aci.write_back_results(fname) is None:
+        excel.update_console(msg='There is no push to write back')
+
 def refresh_excel_data():
     """
     Used to update the hidden _commands and _tables worksheet
@@ -0,0 +1,485 @@
+"""
+Benchmark for AciHandler.push_to_apic, run without a fabric or excel, i.e.
+
+    python -m acixl benchmark tenants epgs --rows 2000 --latency 0.02
+
+A local stand-in for the APIC answers the logins and posts, with a
+configurable latency and error rate, and the excel module is replaced by an
+in-memory backend holding a generated table for each launcher.json command.
+The results of each run are appended to a json lines file so that runs can
+be compared.
+"""
+import copy
+import datetime
+import http.server
+import json
+import os
+import random
+import shutil
+import ssl
+import tempfile
+import threading
+import time
+import jinja2
+import aci
+import excel
+import journal
+import rollback
+import tokens
+import validate
+
+# Results of every run are appended to this file, one json object per line
+RESULTS_FILE = 'benchmark_results.jsonl'
+
+# Number of rows generated for the table of each command
+ROWS = 500
+
+# Seconds the mock APIC waits before answering a post, and the share of
+# posts (0 to 1) it answers with ERROR_STATUS
+LATENCY = 0.005
+ERROR_RATE = 0.0
+ERROR_STATUS = 400
+
+# Value of the 'action' column of the generated rows
+ROW_ACTION = 'created'
+
+# Percentiles of the post latency included in the results
+PERCENTILES = (50, 95, 99)
+
+
+class MockApicHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # the headers and body are written separately, without TCP_NODELAY
+    # every answer would wait for a delayed ack
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, data, token=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if token:
+            self.send_header('Set-Cookie', 'APIC-cookie={}; path=/'.format(
+                token))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        apic = self.server.apic
+        if 'aaaLogin' in self.path or 'aaaRefresh' in self.path:
+            token = 'benchmark-token'
+            data = {'imdata': [{'aaaLogin': {'attributes': {
+                'token': token, 'refreshTimeoutSeconds': '600'}}}]}
+            self.send_json(200, data, token=token)
+            return
+
+        if apic.latency:
+            time.sleep(apic.latency)
+        with apic.lock:
+            apic.requests += 1
+            failed = apic.error_rate and random.random() < apic.error_rate
+        if failed:
+            self.send_json(apic.error_status, {'imdata': [{'error': {
+                'attributes': {'code': str(apic.error_status),
+                               'text': 'mock APIC error'}}}]})
+        else:
+            self.send_json(200, {'totalCount': '0', 'imdata': []})
+
+    do_GET = do_POST
+
+
+class MockApic(object):
+    """
+    Local stand-in for an APIC. aaaLogin and aaaRefresh always succeed,
+    every other request (api/node/mo/..) is answered after latency seconds,
+    with error_status for a share of them set by error_rate.
+
+    The APIC is served over https if a certificate file is given, else
+    over plain http.
+    """
+    def __init__(self, latency=LATENCY, error_rate=ERROR_RATE,
+                 error_status=ERROR_STATUS, certfile=None, keyfile=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.certfile = certfile
+        self.keyfile = keyfile
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.server = None
+        self.thread = None
+
+    @property
+    def address(self):
+        host, port = self.server.server_address[:2]
+        return '{}:{}'.format(host, port)
+
+    @property
+    def scheme(self):
+        return 'https' if self.certfile else 'http'
+
+    def start(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0),
+                                                      MockApicHandler)
+        self.server.daemon_threads = True
+        self.server.apic = self
+        if self.certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(self.certfile, self.keyfile)
+            self.server.socket = context.wrap_socket(self.server.socket,
+                                                     server_side=True)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class FakeStatusWriter(object):
+    """
+    In-memory stand-in for excel.StatusWriter, the time spent adding and
+    flushing status updates is recorded as the write-back time
+    """
+    def __init__(self, backend, table_name=None):
+        self.backend = backend
+        self.table_name = table_name or backend.current_table
+        self.updates = []
+
+    def add(self, cell, status_code, status=''):
+        start = time.perf_counter()
+        self.updates.append((cell, status_code))
+        self.backend.write_back_time += time.perf_counter() - start
+
+    def flush(self):
+        start = time.perf_counter()
+        self.backend.results.setdefault(self.table_name, {}).update(
+            self.updates)
+        self.updates = []
+        self.backend.write_back_time += time.perf_counter() - start
+
+
+class FakeConsoleProgress(excel.ConsoleProgress):
+    def show(self, msg):
+        pass
+
+
+class FakeExcel(object):
+    """
+    In-memory stand-in for the excel module, provides the functions that
+    AciHandler calls on its backend. The tables are generated with
+    generate_table(), and the status of each row is kept in results.
+    """
+    SUCCESS_CODES = excel.SUCCESS_CODES
+    ConsoleProgress = FakeConsoleProgress
+
+    def __init__(self, apic='', user='admin', pword='password'):
+        self.APIC = apic
+        self.USER = user
+        self.PWORD = pword
+        self.tables = {}
+        self.results = {}
+        self.current_table = None
+        self.write_back_time = 0.0
+
+    def StatusWriter(self, table_name=None):
+        return FakeStatusWriter(self, table_name)
+
+    def get_table(self, table_name=None, mandatory_keys=None,
+                  default_values=None):
+        self.current_table = table_name
+        self.results.setdefault(table_name, {})
+        return dict(self.read_table(table_name, mandatory_keys=mandatory_keys,
+                                    default_values=default_values))
+
+    def read_table(self, table_name=None, mandatory_keys=None,
+                   default_values=None, chunk_size=None):
+        rows = self.tables[table_name]
+        header = list(rows[0]) if rows else []
+        values = [[rows[row][name] for name in header] for row in sorted(rows)]
+        table, ignored = excel.build_table(header, values, 'A', 3,
+                                           mandatory_keys=mandatory_keys,
+                                           default_values=default_values)
+        return iter(sorted(table.items()))
+
+    def iter_table(self, table_name=None, mandatory_keys=None,
+                   default_values=None, chunk_size=None):
+        table = self.get_table(table_name, mandatory_keys=mandatory_keys,
+                               default_values=default_values)
+        return iter(sorted(table.items()))
+
+    def get_table_header(self, table_name):
+        rows = self.tables.get(table_name)
+        if rows is None:
+            return None
+        return list(rows[0]) if rows else []
+
+    def show_validation_problems(self, problems):
+        print('\n'.join(problems))
+
+    def get_table_size(self, table_name):
+        return len(self.tables[table_name])
+
+    def update_status(self, cell, status_code, writer=None):
+        if writer:
+            writer.add(cell, status_code)
+        else:
+            writer = self.StatusWriter()
+            writer.add(cell, status_code)
+            writer.flush()
+
+    def update_console(self, msg):
+        pass
+
+    def show_console_payload(self, row, table_name, uri, payload):
+        pass
+
+    def show_console_launcher_error(self, launcher_fname=None):
+        print('Unable to read {}'.format(launcher_fname))
+
+    def show_cp_authentication_attempt_msg(self):
+        pass
+
+    def update_cp_authentication_response(self, status_code):
+        pass
+
+    def get_active_worksheet(self):
+        return None
+
+    def activate_worksheet(self, worksheet_name):
+        pass
+
+    def show_push_commands_report(self, pushes):
+        pass
+
+    def show_push_report_status(self, table_name, action_msg,
+                                conn_stats=None, template_stats=None,
+                                trace_stats=None, push=None):
+        pass
+
+    def write_fabric_results(self, table_name, fabrics, results):
+        pass
+
+
+class BenchmarkHandler(aci.AciHandler):
+    """
+    AciHandler that records the latency of every post. Tokens are kept in
+    memory only, and the connection pool is also used for plain http, so
+    that the mock APIC can be run without a certificate.
+    """
+    def __init__(self, *args, **kwargs):
+        self.latencies = []
+        super(BenchmarkHandler, self).__init__(*args, **kwargs)
+        self.tokens = tokens.TokenCache(fname=None)
+
+    def create_session(self, pool_size=aci.POOL_SIZE,
+                       keep_alive=aci.KEEP_ALIVE):
+        s = super(BenchmarkHandler, self).create_session(
+            pool_size=pool_size, keep_alive=keep_alive)
+        s.mount('http://', s.get_adapter('https://'))
+        return s
+
+    def resize_pool(self, pool_size):
+        super(BenchmarkHandler, self).resize_pool(pool_size)
+        self.session.mount('http://', self.session.get_adapter('https://'))
+
+    def send_post(self, uri, payload, timeout=aci.TIMEOUT):
+        start = time.perf_counter()
+        status = super(BenchmarkHandler, self).send_post(uri, payload,
+                                                         timeout=timeout)
+        self.latencies.append(time.perf_counter() - start)
+        return status
+
+
+def get_columns(registry, launcher):
+    """
+    Get the columns used by a command, the variables of its template and
+    the placeholders of its json_uri
+
+    Returns:
+        columns (list): sorted column names
+
+    """
+    columns = set(registry.get_variables(launcher['json_folder'],
+                                         launcher['json_file']))
+    columns.update(validate.get_uri_columns(launcher['json_uri']))
+    columns.update(launcher.get('mandatory_keys', []))
+    return sorted(columns)
+
+
+def generate_table(columns, rows=ROWS):
+    """
+    Generate the rows of a table, every cell holds '<column>-<row>' except
+    for the action column
+
+    Returns:
+        table(dict): k,v, k=row and v=the cells of the row by column
+
+    """
+    table = {}
+    for row in range(rows):
+        table[row] = dict((column, '{}-{}'.format(column, row))
+                          for column in columns)
+        if 'action' in table[row]:
+            table[row]['action'] = ROW_ACTION
+    return table
+
+
+def get_percentile(values, percentile):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = int(round(percentile / 100.0 * (len(values) - 1)))
+    return values[index]
+
+
+def run_command(handler, backend, cmd):
+    """
+    Push the generated table of a command to the mock APIC
+
+    Returns:
+        result(dict): the measurements of the push
+
+    """
+    handler.latencies = []
+    backend.write_back_time = 0.0
+    start = time.perf_counter()
+    push = handler.push_to_apic(cmd)
+    elapsed = time.perf_counter() - start
+
+    stats = handler.templates.get_stats(push.json_folder, push.json_file)
+    rows = sum(push.counts.values())
+    latencies = [latency * 1000 for latency in handler.latencies]
+    counters = handler.tracer.get_summary(cmd)['counters']
+    result = {'cmd': cmd,
+              'rows': rows,
+              'failed': push.counts['failed'],
+              'retries': counters.get('retries', 0),
+              'seconds': round(elapsed, 4),
+              'rows_per_sec': round(rows / elapsed, 1) if elapsed else 0,
+              'posts': len(latencies),
+              'render_ms': round(stats['render_time'] * 1000, 2),
+              'write_back_ms': round(backend.write_back_time * 1000, 2)}
+    for percentile in PERCENTILES:
+        result['post_p{}_ms'.format(percentile)] = round(
+            get_percentile(latencies, percentile), 2)
+    return result
+
+
+def run_benchmark(cmds=None, rows=ROWS, latency=LATENCY,
+                  error_rate=ERROR_RATE, error_status=ERROR_STATUS,
+                  max_in_flight=None, batch_size=None, adaptive=None,
+                  certfile=None, keyfile=None, label=None,
+                  results_file=RESULTS_FILE):
+    """
+    Benchmark the push of one or more launcher.json commands
+
+    Args:
+        cmds(list, optional): command names, defaults to every command
+        rows(int): number of rows generated for each table
+        latency(float): seconds the mock APIC waits before each answer
+        error_rate(float): share of the posts that the mock APIC fails
+        error_status(int): status code of the failed posts, i.e. 503 to
+        test the retries
+        max_in_flight(int, optional): overrides launcher.json for every
+        command
+        batch_size(int, optional): overrides launcher.json for every
+        command
+        adaptive(bool, optional): overrides launcher.json for every command
+        certfile(str, optional): serve the mock APIC over https
+        keyfile(str, optional): private key of the certificate
+        label(str, optional): stored with the results, to tell runs apart
+        results_file(str): json lines file the results are appended to,
+        None to not store them
+
+    Returns:
+        results (list): the measurements of each command
+
+    """
+    apic = MockApic(latency=latency, error_rate=error_rate,
+                    error_status=error_status, certfile=certfile, keyfile=keyfile).start()
+    # the journals and rollback sets of the mock pushes are kept apart, so
+    # that they never become the last push to resume or roll back
+    folders = (journal.JOURNAL_FOLDER, rollback.ROLLBACK_FOLDER)
+    temp_folder = tempfile.mkdtemp(prefix='acixl_benchmark_')
+    journal.JOURNAL_FOLDER = os.path.join(temp_folder, 'journal')
+    rollback.ROLLBACK_FOLDER = os.path.join(temp_folder, 'rollback')
+    uris = (aci.APIC_URI, aci.APIC_LOGIN_URI, aci.APIC_REFRESH_URI,
+            aci.APIC_CLASS_URI)
+    if apic.scheme == 'http':
+        aci.APIC_URI, aci.APIC_LOGIN_URI, aci.APIC_REFRESH_URI, \
+            aci.APIC_CLASS_URI = [uri.replace('https://', 'http://', 1)
+                                  for uri in uris]
+    try:
+        backend = FakeExcel(apic=apic.address)
+        handler = BenchmarkHandler(apic=apic.address, user=backend.USER,
+                                   pword=backend.PWORD, backend=backend)
+        # the launcher data is shared, the overrides are made to a copy
+        handler.launcher.data = copy.deepcopy(handler.launcher.data)
+        cmds = cmds or list(handler.launcher.data)
+        for cmd in cmds:
+            launcher = handler.launcher.data[cmd]
+            if max_in_flight:
+                launcher['max_in_flight'] = max_in_flight
+            if batch_size:
+                launcher['batch_size'] = batch_size
+            if adaptive is not None:
+                launcher['adaptive'] = adaptive
+            try:
+                columns = get_columns(handler.templates, launcher)
+            except (OSError, jinja2.TemplateError):
+                columns = launcher.get('mandatory_keys', [])
+            backend.tables[launcher['table_name']] = generate_table(columns,
+                                                                   rows)
+        handler.login()
+
+        run = {'time': datetime.datetime.now().isoformat(timespec='seconds'),
+               'label': label,
+               'latency': latency,
+               'error_rate': error_rate,
+               'error_status': error_status,
+               'max_in_flight': max_in_flight,
+               'batch_size': batch_size,
+               'adaptive': adaptive}
+        results = []
+        for cmd in cmds:
+            result = dict(run)
+            result.update(run_command(handler, backend, cmd))
+            results.append(result)
+    finally:
+        aci.APIC_URI, aci.APIC_LOGIN_URI, aci.APIC_REFRESH_URI, \
+            aci.APIC_CLASS_URI = uris
+        journal.JOURNAL_FOLDER, rollback.ROLLBACK_FOLDER = folders
+        shutil.rmtree(temp_folder, ignore_errors=True)
+        apic.stop()
+
+    if results_file:
+        with open(results_file, 'a') as f:
+            for result in results:
+                f.write(json.dumps(result) + '\n')
+    return results
+
+
+def format_results(results):
+    """
+    Format the results of a run as a table, one line per command
+    """
+    columns = ['cmd', 'rows', 'failed', 'retries', 'rows_per_sec'] + \
+              ['post_p{}_ms'.format(p) for p in PERCENTILES] + \
+              ['render_ms', 'write_back_ms']
+    lines = [columns] + [[str(result[c]) for c in columns]
+                         for result in results]
+    widths = [max(len(line[i]) for line in lines)
+              for i in range(len(columns))]
+    return '\n'.join('  '.join(value.ljust(width)
+                               for value, width in zip(line, widths))
+                     for line in lines)
@@ -0,0 +1,220 @@
+import threading
+import time
+
+# Query the controllers of the cluster from topSystem when logging in, and
+# post to all of them, even if only one is listed in the workbook
+DISCOVER = False
+
+# Query used to find the controllers of the cluster
+TOP_SYSTEM_FILTER = 'eq(topSystem.role,"controller")'
+
+# Seconds a controller that stopped answering is left out before it is
+# tried again
+DOWN_INTERVAL = 30
+
+# Status of a request that got no answer, see AciHandler.send_post()
+STATUS_NO_ANSWER = 999
+
+
+def parse_controllers(apic):
+    """
+    Get the controllers of an APIC cluster from the APIC cell of the
+    workbook or fabrics.json, i.e. '10.1.1.1, 10.1.1.2, 10.1.1.3' or
+    ['10.1.1.1', '10.1.1.2']
+
+    Returns:
+        controllers (list): the addresses of the controllers, in order
+
+    """
+    if isinstance(apic, (list, tuple)):
+        items = apic
+    else:
+        items = str(apic or '').split(',')
+    controllers = []
+    for item in items:
+        item = str(item).strip()
+        if item and item not in controllers:
+            controllers.append(item)
+    return controllers or ['']
+
+
+def parse_top_system(data):
+    """
+    Get the out of band addresses of the controllers from a topSystem
+    class query
+
+    Returns:
+        addresses (list): i.e. ['10.1.1.1', '10.1.1.2', '10.1.1.3']
+
+    """
+    addresses = []
+    for mo in data.get('imdata', []):
+        attributes = mo.get('topSystem', {}).get('attributes', {})
+        address = attributes.get('oobMgmtAddr')
+        if address and address != '0.0.0.0':
+            addresses.append(address)
+    return addresses
+
+
+def retarget(uri, address):
+    """
+    Point a full APIC URI at another controller, i.e.
+    'https://10.1.1.1/api/node/mo/uni.json' -> 'https://10.1.1.2/api/..'
+    """
+    scheme, sep, rest = uri.partition('://')
+    if not sep:
+        return uri
+    return '{}://{}/{}'.format(scheme, address, rest.partition('/')[2])
+
+
+class Controller(object):
+    """
+    A controller of the cluster and the requests it has served
+    """
+    def __init__(self, address):
+        self.address = address
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.busy_time = 0.0
+        self.first_request = None
+        self.last_request = None
+        self.down_until = 0
+
+    @property
+    def is_up(self):
+        return self.down_until <= time.time()
+
+    def get_stats(self):
+        elapsed = (self.last_request - self.first_request
+                   if self.requests else 0)
+        return {'controller': self.address,
+                'requests': self.requests,
+                'failures': self.failures,
+                'rate': self.requests / elapsed if elapsed else 0.0,
+                'mean': self.busy_time / self.requests if self.requests
+                        else 0.0,
+                'up': self.is_up}
+
+
+class Cluster(object):
+    """
+    The controllers of an APIC cluster. Each request goes to the controller
+    with the fewest requests outstanding, and is sent to another controller
+    if it gets no answer. A controller that does not answer is left out for
+    DOWN_INTERVAL seconds.
+    """
+    def __init__(self, addresses):
+        self.lock = threading.Lock()
+        self.controllers = [Controller(address) for address in addresses]
+
+    def __len__(self):
+        return len(self.controllers)
+
+    @property
+    def addresses(self):
+        return [controller.address for controller in self.controllers]
+
+    def add(self, addresses):
+        with self.lock:
+            for address in addresses:
+                if address not in self.addresses:
+                    self.controllers.append(Controller(address))
+
+    def set_up(self, controller, up):
+        with self.lock:
+            controller.down_until = 0 if up else time.time() + DOWN_INTERVAL
+
+    def get_order(self):
+        # the controllers that are up first, then the others in the order
+        # they are due to be tried again
+        return sorted(self.controllers, key=lambda controller: (
+            not controller.is_up, controller.down_until))
+
+    def acquire(self, exclude=()):
+        """
+        Pick the controller for a request: the controller that is up with
+        the fewest requests outstanding, or if all are down, the one that
+        went down first
+
+        Returns:
+            controller(Controller): or None if every controller is excluded
+
+        """
+        with self.lock:
+            candidates = [controller for controller in self.controllers
+                          if controller not in exclude]
+            if not candidates:
+                return None
+            up = [controller for controller in candidates if controller.is_up]
+            if up:
+                # ties go to the controller that has served the fewest
+                # requests, so that serial posts are spread as well
+                controller = min(up, key=lambda c: (c.outstanding,
+                                                    c.requests))
+            else:
+                controller = min(candidates, key=lambda c: c.down_until)
+            controller.outstanding += 1
+            return controller
+
+    def release(self, controller, status, elapsed):
+        now = time.time()
+        with self.lock:
+            controller.outstanding -= 1
+            controller.requests += 1
+            controller.busy_time += elapsed
+            if controller.first_request is None:
+                controller.first_request = now - elapsed
+            controller.last_request = now
+            if status == STATUS_NO_ANSWER:
+                controller.failures += 1
+                controller.down_until = now + DOWN_INTERVAL
+            else:
+                controller.down_until = 0
+
+    def call(self, uri, send, get_status=None):
+        """
+        Send a request to the cluster, failing over to the next controller
+        until one answers
+
+        Args:
+            uri(str): full URI of the request, for any of the controllers
+            send(function): sends the request to a URI, send(uri)
+            get_status(function, optional): gets the status from what send
+            returned, by default send returns the status
+
+        Returns:
+            result: what send returned for the last controller tried
+
+        """
+        tried = []
+        while True:
+            controller = self.acquire(exclude=tried)
+            if controller is None:
+                return result
+            start = time.time()
+            result = send(retarget(uri, controller.address))
+            status = get_status(result) if get_status else result
+            self.release(controller, status, time.time() - start)
+            if status != STATUS_NO_ANSWER:
+                return result
+            tried.append(controller)
+
+    def get_stats(self):
+        with self.lock:
+            return [controller.get_stats() for controller in self.controllers]
+
+
+def format_stats(stats):
+    """
+    Format the requests served by each controller for the console
+    """
+    console_msg = ''
+    for controller in stats:
+        console_msg += '\n  -- Controller {}: {} requests, {:.1f}/s, ' \
+                       'mean {:.1f} ms, {} failed{}'.format(
+                           controller['controller'], controller['requests'],
+                           controller['rate'], controller['mean'] * 1000,
+                           controller['failures'],
+                           '' if controller['up'] else ' (down)')
+    return console_msg
@@ -0,0 +1,163 @@
+import json
+from collections import OrderedDict
+
+# Class of the parent MO that coalesced rows are posted under, the key is
+# the rn of the parent (exact match) or the prefix of its rn
+PARENT_CLASSES = {'uni': 'polUni',
+                  'infra': 'infraInfra',
+                  'fabric': 'fabricInst',
+                  'tn-': 'fvTenant',
+                  'ap-': 'fvAp',
+                  'BD-': 'fvBD',
+                  'ctx-': 'fvCtx',
+                  'out-': 'l3extOut',
+                  'lnodep-': 'l3extLNodeP',
+                  'lifp-': 'l3extLIfP'}
+
+
+def split_dn(dn):
+    """
+    Split a DN into its relative names. A '/' inside square brackets is
+    part of the rn, i.e. 'uni/tn-a/BD-b/subnet-[10.0.0.1/24]' returns
+    ['uni', 'tn-a', 'BD-b', 'subnet-[10.0.0.1/24]']
+
+    Args:
+        dn(str): distinguished name of the MO
+
+    Returns:
+        rns (list): the relative names that make up the DN
+
+    """
+    rns = []
+    depth = 0
+    current = ''
+    for char in dn:
+        if char == '[':
+            depth += 1
+        elif char == ']':
+            depth -= 1
+        if char == '/' and depth == 0:
+            rns.append(current)
+            current = ''
+        else:
+            current += char
+    if current:
+        rns.append(current)
+    return rns
+
+
+def uri_to_dn(uri):
+    """
+    Get the DN from a full APIC URI, i.e.
+    'https://apic/api/node/mo/uni/tn-a.json' -> 'uni/tn-a'
+    """
+    dn = uri.split('/api/node/mo/', 1)[-1]
+    if dn.endswith('.json'):
+        dn = dn[:-len('.json')]
+    return dn
+
+
+def parent_class(rn):
+    """
+    Get the class name for the parent rn, or None if it is not known
+    """
+    if rn in PARENT_CLASSES:
+        return PARENT_CLASSES[rn]
+    for prefix, cls in PARENT_CLASSES.items():
+        if prefix.endswith('-') and rn.startswith(prefix):
+            return cls
+    return None
+
+
+def get_parent(uri, payload):
+    """
+    Work out the parent DN that a rendered row can be coalesced under
+
+    Args:
+        uri(str): full URI the row is normally posted to
+        payload(str): rendered payload of the row
+
+    Returns:
+        (parent_dn, child): the parent DN and the row payload as a child
+        dict, or (None, None) if the row can not be coalesced
+
+    """
+    try:
+        data = json.loads(payload, object_pairs_hook=OrderedDict)
+    except ValueError:
+        return None, None
+    if len(data) != 1:
+        return None, None
+
+    rns = split_dn(uri_to_dn(uri))
+    if len(rns) < 2 or not parent_class(rns[-2]):
+        return None, None
+
+    # children are addressed by rn, the dn only applies to the root object
+    cls = list(data)[0]
+    attributes = data[cls].setdefault('attributes', OrderedDict())
+    attributes.pop('dn', None)
+    attributes.setdefault('rn', rns[-1])
+    return '/'.join(rns[:-1]), data
+
+
+def merge_children(children):
+    """
+    Merge children that are the same object (same class and attributes)
+    into a single child that holds all of their children, i.e. the fvBD
+    of several bd_subnet rows for the same bridge domain.
+    """
+    merged = OrderedDict()
+    for child in children:
+        cls = list(child)[0]
+        key = (cls, json.dumps(child[cls].get('attributes', {}),
+                               sort_keys=True))
+        if key not in merged:
+            merged[key] = {cls: OrderedDict(
+                [('attributes', child[cls].get('attributes', {})),
+                 ('children', list(child[cls].get('children', [])))])}
+        else:
+            merged[key][cls]['children'].extend(
+                child[cls].get('children', []))
+    return list(merged.values())
+
+
+def build_payload(parent_dn, children):
+    """
+    Build a single payload for the parent DN that holds all the children
+
+    Returns:
+        payload(str): JSON payload to be posted to the parent DN
+
+    """
+    cls = parent_class(split_dn(parent_dn)[-1])
+    payload = {cls: OrderedDict([('attributes', {'dn': parent_dn}),
+                                 ('children', merge_children(children))])}
+    return json.dumps(payload)
+
+
+def build_batches(rows, batch_size):
+    """
+    Group rendered rows by their parent DN. Rows that can not be coalesced
+    are returned as a batch of their own.
+
+    Args:
+        rows(iterable): rendered rows, i.e. (row, full_uri, payload)
+        batch_size(int): max number of rows per batch
+
+    Yields:
+        (parent_dn, batch): batch is a list of (row, full_uri, payload,
+        child) tuples, parent_dn is None for a row posted on its own
+
+    """
+    groups = OrderedDict()
+    for row, uri, payload in rows:
+        parent_dn, child = get_parent(uri, payload)
+        if not parent_dn:
+            yield None, [(row, uri, payload, None)]
+            continue
+        groups.setdefault(parent_dn, []).append((row, uri, payload, child))
+        if len(groups[parent_dn]) >= batch_size:
+            yield parent_dn, groups.pop(parent_dn)
+    for parent_dn, batch in groups.items():
+        yield parent_dn, batch
@@ -0,0 +1,152 @@
+import json
+from collections import OrderedDict
+from coalesce import uri_to_dn
+
+# Max number of DNs looked up by a single class query
+QUERY_BATCH_SIZE = 40
+
+# Attributes that are not compared with the current state of the MO
+IGNORED_ATTRIBUTES = ('dn', 'rn', 'status')
+
+
+def get_root(payload):
+    """
+    Get the class and body of the root object of a rendered payload
+
+    Returns:
+        (cls, body): i.e. ('fvTenant', {'attributes': {..}}), or
+        (None, None) if the payload can not be parsed
+
+    """
+    try:
+        data = json.loads(payload, object_pairs_hook=OrderedDict)
+    except ValueError:
+        return None, None
+    if not isinstance(data, dict) or len(data) != 1:
+        return None, None
+    cls = list(data)[0]
+    return cls, data[cls]
+
+
+def build_queries(rows, batch_size=QUERY_BATCH_SIZE):
+    """
+    Group the DNs of the rendered rows by class, so that the current state
+    of the MOs can be fetched with a few class queries.
+
+    Args:
+        rows(list): rendered rows, i.e. (row, full_uri, payload)
+        batch_size(int): max number of DNs per query
+
+    Returns:
+        queries (list): (cls, dns) tuples, one per class query
+
+    """
+    classes = OrderedDict()
+    for row, uri, payload in rows:
+        cls, body = get_root(payload)
+        if cls:
+            dns = classes.setdefault(cls, [])
+            dn = uri_to_dn(uri)
+            if dn not in dns:
+                dns.append(dn)
+    queries = []
+    for cls, dns in classes.items():
+        for i in range(0, len(dns), batch_size):
+            queries.append((cls, dns[i:i + batch_size]))
+    return queries
+
+
+def get_query_filter(cls, dns):
+    """
+    Build the query-target-filter that matches a list of DNs, i.e.
+    or(eq(fvTenant.dn,"uni/tn-a"),eq(fvTenant.dn,"uni/tn-b"))
+    """
+    filters = ['eq({}.dn,"{}")'.format(cls, dn) for dn in dns]
+    if len(filters) == 1:
+        return filters[0]
+    return 'or({})'.format(','.join(filters))
+
+
+def is_deleted(body):
+    return 'deleted' in str(body.get('attributes', {}).get('status', ''))
+
+
+def find_child(current, cls, body):
+    """
+    Find the current child MO that a child of the payload refers to. The
+    child is matched by its rn, or by its class when it has no rn and there
+    is a single child of that class.
+    """
+    candidates = [child[cls] for child in current.get('children', [])
+                  if cls in child]
+    rn = body.get('attributes', {}).get('rn')
+    if rn:
+        for candidate in candidates:
+            if candidate.get('attributes', {}).get('rn') == rn:
+                return candidate
+        return None
+    if len(candidates) == 1:
+        return candidates[0]
+    return None
+
+
+def matches(body, current):
+    """
+    Check whether every attribute set by the payload already has the same
+    value on the APIC, for the object and all of its children. Values the
+    APIC normalises (i.e. 'true' stored as 'yes') are seen as different,
+    so those rows are posted.
+
+    Args:
+        body(dict): object from the payload, {'attributes':.., 'children':..}
+        current(dict): the same object as returned by the APIC
+
+    Returns:
+        bool: True if posting the payload would not change anything
+
+    """
+    attributes = current.get('attributes', {})
+    for key, value in body.get('attributes', {}).items():
+        if key in IGNORED_ATTRIBUTES:
+            continue
+        if str(attributes.get(key, '')) != str(value):
+            return False
+
+    for child in body.get('children', []):
+        cls = list(child)[0]
+        existing = find_child(current, cls, child[cls])
+        if is_deleted(child[cls]):
+            if existing is not None:
+                return False
+        elif existing is None or not matches(child[cls], existing):
+            return False
+    return True
+
+
+def find_unchanged(rows, state, known_dns):
+    """
+    Find the rows that would not change anything on the APIC
+
+    Args:
+        rows(list): rendered rows, i.e. (row, full_uri, payload)
+        state(dict): k,v, k=dn and v=current MO body, for MOs that exist
+        known_dns(set): DNs that were looked up successfully, a DN which is
+        in known_dns but not in state does not exist on the APIC
+
+    Returns:
+        unchanged (set): the rows which can be skipped
+
+    """
+    unchanged = set()
+    for row, uri, payload in rows:
+        dn = uri_to_dn(uri)
+        cls, body = get_root(payload)
+        if not cls or dn not in known_dns:
+            continue
+        current = state.get(dn)
+        if is_deleted(body):
+            if current is None:
+                unchanged.add(row)
+        elif current is not None and matches(body, current):
+            unchanged.add(row)
+    return unchanged
@@ -1,22 +1,85 @@
-import xlwings as xw
-from xlwings.constants import DeleteShiftDirection
+import cluster
+import re
+import time
+import tracing
+from collections import OrderedDict
+try:
+    import xlwings as xw
+    from xlwings.constants import DeleteShiftDirection, InsertShiftDirection
+except ImportError:
+    # headless mode (see headless.py), only the excel-free helpers are used
+    xw = None
 
 # Workbook details
 WORKBOOK_NAME = 'runsheet.xlsm'
-wb = xw.Book(WORKBOOK_NAME)
 
 # Define hidden internal worksheet names
-ws_commands = wb.sheets['_commands']
-ws_tables = wb.sheets['_tables']
+WS_COMMANDS = '_commands'
+WS_TABLES = '_tables'
+WS_FABRIC_RESULTS = '_fabric_results'
+WS_TRACE_SUMMARY = '_trace_summary'
 
-# Get the authentication details from the spreadsheet
-APIC = wb.sheets['Test_Authentication'].range('$B$3').value
-USER = wb.sheets['Test_Authentication'].range('$B$4').value
-PWORD = wb.sheets['Test_Authentication'].range('$B$5').value
+# Authentication details in the spreadsheet
+WS_AUTHENTICATION = 'Test_Authentication'
+AUTHENTICATION_CELLS = {'APIC': '$B$3',
+                        'USER': '$B$4',
+                        'PWORD': '$B$5'}
+
+_workbook = None
+
+# row numbers of the rows of each table that were ignored by its last read,
+# they never reach the push and are added to its report
+_ignored = {}
+
+
+def get_workbook():
+    """
+    Connect to the workbook the first time it is needed rather than when
+    this module is imported, so that it can be imported without excel.
+    """
+    global _workbook
+    if _workbook is None:
+        _workbook = xw.Book(WORKBOOK_NAME)
+    return _workbook
+
+
+def reset_workbook(workbook_name=None):
+    """
+    Connect to the workbook again on its next use, i.e. from a resident
+    worker that outlives the workbook it first connected to
+    """
+    global _workbook, WORKBOOK_NAME
+    if workbook_name:
+        WORKBOOK_NAME = workbook_name
+    _workbook = None
+
+
+def __getattr__(name):
+    # wb, ws_commands, ws_tables, APIC, USER and PWORD are read on first use
+    if name == 'wb':
+        return get_workbook()
+    if name == 'ws_commands':
+        return get_workbook().sheets[WS_COMMANDS]
+    if name == 'ws_tables':
+        return get_workbook().sheets[WS_TABLES]
+    if name in AUTHENTICATION_CELLS:
+        ws = get_workbook().sheets[WS_AUTHENTICATION]
+        return ws.range(AUTHENTICATION_CELLS[name]).value
+    raise AttributeError('module {!r} has no attribute {!r}'.format(
+        __name__, name))
 
 # Define special cell locations
 CONSOLE_CELL = '$E$3'
 
+# Max number of console updates per second while a table is pushed, and
+# whether the console shows the payload of the rows (see ConsoleProgress)
+CONSOLE_REFRESH_RATE = 2
+VERBOSE_CONSOLE = False
+
+# Max number of seconds that buffered status updates are held before
+# being written to excel, see StatusWriter
+FLUSH_INTERVAL = 2
+
 # Font Colors
 COLOR_BLACK = 1
 COLOR_RED = 2
@@ -27,11 +90,22 @@ COLOR_DEFAULT = (255, 255, 255, 255)  # white
 COLOR_FAILED = (250, 128, 144)  # Red
 COLOR_PASS = (144, 238, 144)  # Green
 COLOR_IGNORED = (255, 207, 80)  # Amber
+COLOR_UNCHANGED = (189, 215, 238)  # Blue
+
+# Status codes counted as a successful push, 304 is used for the rows that
+# were skipped by an incremental push as they already match the APIC
+SUCCESS_CODES = (200, 304)
+
+# Status shown for rows that are missing a mandatory field
+ROW_IGNORED_MSG = 'Row ignored - missing field'
 
 # HTTP status codes, meanings and formatting
 HTTP_STATUS_CODES = {200: {'msg1': '200',
                            'msg2': 'Success',
                            'color': COLOR_PASS},
+                     304: {'msg1': '304',
+                           'msg2': 'Unchanged - already matches the APIC',
+                           'color': COLOR_UNCHANGED},
                      400: {'msg1': '400',
                            'msg2': 'Bad request - incorrect URL or payload',
                            'color': COLOR_FAILED},
@@ -44,11 +118,64 @@ HTTP_STATUS_CODES = {200: {'msg1': '200',
                      404: {'msg1': '404',
                            'msg2': 'Not found - Post to page that does not exist',
                            'color': COLOR_FAILED},
+                     412: {'msg1': '412',
+                           'msg2': 'Missing reference - a referenced object does not exist',
+                           'color': COLOR_FAILED},
+                     422: {'msg1': '422',
+                           'msg2': 'Invalid range - can not be expanded',
+                           'color': COLOR_FAILED},
+                     424: {'msg1': '424',
+                           'msg2': 'Cancelled - a parent object failed',
+                           'color': COLOR_IGNORED},
+                     429: {'msg1': '429',
+                           'msg2': 'Too many requests - throttled by the APIC',
+                           'color': COLOR_FAILED},
+                     500: {'msg1': '500',
+                           'msg2': 'Internal server error on the APIC',
+                           'color': COLOR_FAILED},
+                     502: {'msg1': '502',
+                           'msg2': 'Bad gateway - APIC web server not ready',
+                           'color': COLOR_FAILED},
+                     503: {'msg1': '503',
+                           'msg2': 'Service unavailable - APIC busy or throttling',
+                           'color': COLOR_FAILED},
+                     504: {'msg1': '504',
+                           'msg2': 'Gateway timeout - APIC did not answer in time',
+                           'color': COLOR_FAILED},
                      999: {'msg1': '999 - Unknown error occured',
                            'msg2': 'Check IP/connectivity',
                            'color': COLOR_FAILED}}
 
 
+def get_status_format(status_code):
+    """
+    Get the msgs and color of a status code, status codes that are not in
+    HTTP_STATUS_CODES are shown as a failure with their own number
+    """
+    if status_code in HTTP_STATUS_CODES:
+        return HTTP_STATUS_CODES[status_code]
+    return {'msg1': str(status_code),
+            'msg2': 'Unexpected status code from the APIC',
+            'color': COLOR_FAILED}
+
+
+def get_invalid_rows(table, mandatory_keys):
+    """
+    Get the rows of a table that are missing one of the mandatory keys
+    (defined in launcher.json).
+
+    Args:
+        table(dict): the table as called via the get_table() function
+        mandatory_keys (list): as extracted from launcher.json
+
+    Returns:
+        invalid_rows (list): sorted list of the invalid row numbers
+
+    """
+    return [row for row in sorted(table)
+            if not all(table[row].get(key) for key in mandatory_keys)]
+
+
 def remove_invalid_rows(table, mandatory_keys):
     """
     Iterate through a table to see whether any of the mandatory keys
@@ -64,16 +191,12 @@ def remove_invalid_rows(table, mandatory_keys):
         table(dict): revised dictionary minus the invalid row entries
 
     """
-    table_copy = dict(table)
-    for row in sorted(table_copy):
-        for key in mandatory_keys:
-            if not table_copy[row].get(key):
-                status_cell = table_copy[row]['status_cell']
-                if table.get(row):
-                    del table[row]
-                update_cell(cell=status_cell,
-                            value='Row ignored - missing field',
-                            bg_color=COLOR_IGNORED)
+    for row in get_invalid_rows(table, mandatory_keys):
+        status_cell = table[row]['status_cell']
+        del table[row]
+        update_cell(cell=status_cell,
+                    value=ROW_IGNORED_MSG,
+                    bg_color=COLOR_IGNORED)
     return table
 
 
@@ -109,6 +232,67 @@ def apply_default_values(table, default_values):
     return table
 
 
+def build_table(header, rows, status_col, first_row, mandatory_keys=None,
+                default_values=None, row_offset=0):
+    """
+    Build a table from the values of its data rows in a single pass. The
+    values are turned into columns first, so that the mandatory keys are
+    checked and the default values applied once per column rather than
+    once per cell.
+
+    Args:
+        header(list): column names, the first row of the table
+        rows(list): values of the data rows, one list per row
+        status_col(str): column letter of the status_code column, i.e. 'A'
+        first_row(int): sheet row number of the first data row
+        mandatory_keys (list): table mandatory keys, from launcher.json
+        default_values (dict): table default values, from launcher.json
+        row_offset(int): key of the first row, when the rows are a chunk
+        of the table
+
+    Returns:
+        (table, ignored): the same table as get_table(), and the status
+        cells of the rows that are missing a mandatory key
+
+    """
+    mandatory_keys = mandatory_keys or []
+    default_values = default_values or {}
+    count = len(rows)
+    columns = OrderedDict((name, list(values))
+                          for name, values in zip(header, zip(*rows)))
+    if count and not columns:
+        columns = OrderedDict((name, [None] * count) for name in header)
+
+    # a row is valid if it has a value for every mandatory key
+    valid = [True] * count
+    for key in mandatory_keys:
+        values = columns.get(key)
+        if values is None:
+            valid = [False] * count
+            break
+        valid = [v and bool(value) for v, value in zip(valid, values)]
+
+    # empty cells get the default value of their column, or ''
+    for name in default_values:
+        columns.setdefault(name, [None] * count)
+    for name, values in columns.items():
+        default = default_values.get(name, '')
+        columns[name] = [value if value else default for value in values]
+
+    names = list(columns) + ['status_cell']
+    status_cells = ['${}${}'.format(status_col, first_row + row)
+                    for row in range(count)]
+    table = {}
+    ignored = []
+    for row, cells in enumerate(zip(*(list(columns.values()) +
+                                      [status_cells]))):
+        if valid[row]:
+            table[row + row_offset] = dict(zip(names, cells))
+        else:
+            ignored.append(status_cells[row])
+    return table, ignored
+
+
 def get_table(table_name=None, mandatory_keys=None, default_values=None):
     """
     Read the content of a table from the active worksheet in excel.
@@ -116,6 +300,9 @@ def get_table(table_name=None, mandatory_keys=None, default_values=None):
     will create a dictionary with the row as the primary key, columns
     as the sub-keys which are mapped to the cell content.
 
+    The table is read with a single range read, and the rows that are
+    missing a mandatory key are marked as ignored with a single write.
+
     Args:
         table_name(str): The name of the table in excel.
         mandatory_keys (list): table mandatory keys, from launcher.json
@@ -126,23 +313,99 @@ def get_table(table_name=None, mandatory_keys=None, default_values=None):
         invalid rows and has default values applied to cells
 
     """
-    t = xw.Range(table_name).options(numbers=int)
-    header = xw.Range(table_name).value[0]
-    table = {}
+    t = xw.Range(table_name)
+    values = t.options(numbers=int, ndim=2).value
+    status_col, top_row = split_address(t.address.split(':')[0])
+
     # skip the first two rows (headers)
-    for row, col in enumerate(t.value[2:]):
-        dictionary = dict(zip(header, col))
-        table[row] = {}
-        table[row] = dictionary
-        table[row]['status_cell'] = t[(row + 2, 0)].address
+    table, ignored = build_table(values[0], values[2:], status_col,
+                                 top_row + 2, mandatory_keys=mandatory_keys,
+                                 default_values=default_values)
+
+    # mark the invalid rows as ignored
+    writer = StatusWriter()
+    for cell in ignored:
+        writer.add(cell=cell, value=ROW_IGNORED_MSG, bg_color=COLOR_IGNORED)
+    writer.flush()
+    _ignored[table_name] = [split_address(cell)[1] - top_row - 1
+                            for cell in ignored]
+    return table
 
-    # remove invalid rows
-    table = remove_invalid_rows(table, mandatory_keys=mandatory_keys)
 
-    # if a non-mandatory cell has no value, then use default values
-    table = apply_default_values(table, default_values=default_values)
+def iter_table(table_name=None, mandatory_keys=None, default_values=None,
+               chunk_size=1000):
+    """
+    Generator that reads a table chunk_size rows at a time, so that a very
+    large table is never held in memory as a whole. The rows are the same
+    as the ones returned by get_table().
+
+    Yields:
+        (row, row_data): row_data holds the columns mapped to the cell content
+
+    """
+    return read_rows(table_name, mandatory_keys, default_values, chunk_size,
+                     mark_ignored=True)
+
+
+def read_table(table_name=None, mandatory_keys=None, default_values=None,
+               chunk_size=1000):
+    """
+    Generator that reads the rows of a table like iter_table(), without
+    marking the rows that are missing a mandatory key as ignored, i.e. to
+    look up the rows of a table that is not pushed
+    """
+    return read_rows(table_name, mandatory_keys, default_values, chunk_size,
+                     mark_ignored=False)
 
-    return table
+
+def read_rows(table_name, mandatory_keys, default_values, chunk_size,
+              mark_ignored):
+    t = xw.Range(table_name)
+    header = t[0, :].value
+    status_col, top_row = split_address(t.address.split(':')[0])
+    count = t.rows.count
+    if mark_ignored:
+        _ignored[table_name] = []
+
+    # skip the first two rows (headers)
+    for start in range(2, count, chunk_size):
+        end = min(start + chunk_size, count)
+        values = t[start:end, :].options(numbers=int, ndim=2).value
+        table, ignored = build_table(header, values, status_col,
+                                     top_row + start,
+                                     mandatory_keys=mandatory_keys,
+                                     default_values=default_values,
+                                     row_offset=start - 2)
+        if mark_ignored:
+            writer = StatusWriter()
+            for cell in ignored:
+                writer.add(cell=cell, value=ROW_IGNORED_MSG,
+                           bg_color=COLOR_IGNORED)
+            writer.flush()
+            _ignored[table_name] += [split_address(cell)[1] - top_row - 1
+                                     for cell in ignored]
+        for row in sorted(table):
+            yield row, table[row]
+
+
+def get_table_header(table_name):
+    """
+    Get the column names of a table, the first row of the table. A blank
+    column is kept as None, so that the names line up with the columns.
+
+    Returns:
+        header (list): or None if the table does not exist
+    """
+    try:
+        header = xw.Range(table_name)[0, :].options(ndim=1).value
+    except Exception as e:
+        return None
+    return [column if column else None for column in header]
+
+
+def get_table_size(table_name):
+    # number of data rows, without the two header rows
+    return xw.Range(table_name).rows.count - 2
 
 
 def get_table_list():
@@ -155,7 +418,7 @@ def get_table_list():
         table(dict): k,v, k=worksheet_name and v=list of tables
 
     """
-    tables = ws_tables.range('TABLES').value
+    tables = get_workbook().sheets[WS_TABLES].range('TABLES').value
     table_list= {}
     for t in tables:
         worksheet_name,table_name = t[0], t[1]
@@ -182,7 +445,7 @@ def update_cell(cell='', value='', bg_color=COLOR_DEFAULT, font_color=COLOR_BLAC
     cell.color = bg_color
 
 
-def update_status(cell, status_code):
+def update_status(cell, status_code, writer=None):
     """
     Updates a cell with pre-formatted colors and msg based on the
     status_code received when attempting to post the payload
@@ -190,11 +453,112 @@ def update_status(cell, status_code):
     Args:
         cell(str): cell, i.e. A1, or (1,1)
         status_code(int): status code number returned from REST post command
+        writer(StatusWriter, optional): buffer the update instead of
+        writing it to excel straight away
+
+    """
+    status = get_status_format(status_code)['msg1']
+    bg_color = get_status_format(status_code)['color']
+    if writer:
+        writer.add(cell=cell, value=status, bg_color=bg_color)
+    else:
+        update_cell(cell=cell, value=status, bg_color=bg_color)
+
+
+def split_address(cell):
+    """
+    Split an absolute cell address into its column and row, i.e.
+    '$A$5' -> ('A', 5)
+    """
+    match = re.match(r'\$?([A-Z]+)\$?(\d+)$', cell)
+    return match.group(1), int(match.group(2))
+
+
+def group_runs(items, key):
+    """
+    Split a list into runs of consecutive items that share the same key
+
+    Returns:
+        runs (list): list of lists, each holding one run of items
 
     """
-    status = HTTP_STATUS_CODES.get(status_code)['msg1']
-    bg_color = HTTP_STATUS_CODES.get(status_code)['color']
-    update_cell(cell=cell, value=status, bg_color=bg_color)
+    runs = []
+    for item in items:
+        if runs and key(runs[-1][-1]) == key(item):
+            runs[-1].append(item)
+        else:
+            runs.append([item])
+    return runs
+
+
+class StatusWriter(object):
+    """
+    Buffers status cell updates and writes them to excel in bulk. Each run
+    of adjacent cells in a column is written with a single range write, and
+    the colors are set once per run of cells sharing the same color.
+
+    Buffered updates are written when flush() is called, i.e. at the end
+    of a table, or when the buffer is older than flush_interval seconds.
+    Screen updating is suspended while the buffer is being written.
+    """
+    def __init__(self, table_name=None, flush_interval=FLUSH_INTERVAL):
+        # the status cells are on the active worksheet, table_name is only
+        # needed by the headless backend
+        self.table_name = table_name
+        self.flush_interval = flush_interval
+        self.cells = {}
+        self.last_flush = time.time()
+
+    def add(self, cell, value, bg_color=COLOR_DEFAULT, font_color=COLOR_BLACK):
+        self.cells[cell] = (value, bg_color, font_color)
+        if time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self.cells:
+            app = get_workbook().app
+            screen_updating = app.screen_updating
+            app.screen_updating = False
+            try:
+                for block in self.get_blocks():
+                    self.write_block(block)
+            finally:
+                app.screen_updating = screen_updating
+        self.cells = {}
+        self.last_flush = time.time()
+
+    def get_blocks(self):
+        """
+        Group the buffered cells into blocks of adjacent cells in a column
+
+        Returns:
+            blocks (list): each block is a list of (col, row, update) tuples
+
+        """
+        items = sorted((split_address(cell) + (update,))
+                       for cell, update in self.cells.items())
+        blocks = []
+        for col, row, update in items:
+            if blocks and blocks[-1][-1][0] == col and \
+                    blocks[-1][-1][1] == row - 1:
+                blocks[-1].append((col, row, update))
+            else:
+                blocks.append([(col, row, update)])
+        return blocks
+
+    @staticmethod
+    def block_range(block):
+        col = block[0][0]
+        return xw.Range('${0}${1}:${0}${2}'.format(col, block[0][1],
+                                                   block[-1][1]))
+
+    def write_block(self, block):
+        values = [update[0] for col, row, update in block]
+        self.block_range(block).options(transpose=True).value = values
+        for run in group_runs(block, key=lambda item: item[2][1]):
+            self.block_range(run).color = run[0][2][1]
+        for run in group_runs(block, key=lambda item: item[2][2]):
+            self.block_range(run).api.Font.ColorIndex = run[0][2][2]
 
 
 def get_status_codes_from_table(table_name):
@@ -228,11 +592,25 @@ def get_failed_rows_from_table(table_name):
     """
     table = xw.Range(table_name).options(numbers=int)
     failed_rows = [row_no+1 for row_no, row in enumerate(table.value[2:])
-                   if row[0] != 200]
+                   if row[0] not in SUCCESS_CODES]
     return sorted(failed_rows)
 
 
-def show_push_report_status(table_name, action_msg):
+def get_action_status(success, failed):
+    """
+    Get the 'Action status' line of the report from the number of rows that
+    were posted and failed
+    """
+    if not failed:
+        return '\n  -- Action status: all entries posted to APIC'
+    if success:
+        return '\n  -- Action status: partial entries pushed'
+    return '\n  -- Action status: all entries failed'
+
+
+def show_push_report_status(table_name, action_msg, conn_stats=None,
+                            template_stats=None, trace_stats=None,
+                            push=None):
     """
     Updates the console in the control panel with a list of rows
     which did not execute successfully as part of the push. This function
@@ -245,12 +623,54 @@ def show_push_report_status(table_name, action_msg):
         action_msg(str, optional): msg to be shown in the 'last
         action performed' cell,  passed from launcher.json file
 
+        conn_stats(dict, optional): connections opened/reused by the
+        APIC session, as returned by AciHandler.connection_stats
+
+        template_stats(dict, optional): compile and render times of the
+        template, as returned by TemplateRegistry.get_stats
+
+        trace_stats(dict, optional): time spent in each stage of the push,
+        as returned by Tracer.get_summary
+
+        push(CommandPush, optional): the tally of the push, the status
+        column is read back from the table if it is not given. The rows
+        ignored when the table was read are not in the tally and are added
+        to it.
+
     """
     # get the inital console msg
-    console_msg = get_status_results(table_name, action_msg)
+    if push:
+        ignored = _ignored.get(table_name, [])
+        console_msg = 'Last action performed: {}'.format(action_msg)
+        console_msg += get_action_status(
+            push.counts['success'],
+            push.counts['failed'] + push.counts['cancelled'] + len(ignored))
+    else:
+        console_msg = get_status_results(table_name, action_msg)
+
+    if conn_stats:
+        console_msg += '\n  -- Connections: {} opened, {} re-used'.format(
+            conn_stats['opened'], conn_stats['reused'])
+        if conn_stats.get('controllers'):
+            console_msg += cluster.format_stats(conn_stats['controllers'])
+
+    if template_stats:
+        console_msg += '\n  -- Template: compiled in {:.1f} ms, {} rows ' \
+                       'rendered in {:.1f} ms'.format(
+                           template_stats['compile_time'] * 1000,
+                           template_stats['renders'],
+                           template_stats['render_time'] * 1000)
+
+    if trace_stats:
+        console_msg += tracing.format_summary(trace_stats)
+        write_trace_summary(table_name, trace_stats)
 
     # get a list of failed rows
-    failed_rows = get_failed_rows_from_table(table_name)
+    if push:
+        failed_rows = sorted(set(row + 1 for row in push.failed_cells) |
+                             set(ignored))
+    else:
+        failed_rows = get_failed_rows_from_table(table_name)
 
     # add failed rows output to the console_msg (if there are any)
     if failed_rows:
@@ -281,9 +701,10 @@ def get_status_results(table_name, action_msg=''):
     console_msg = 'Last action performed: {}'.format(action_msg)
 
     # update the cp 'script status' cell to success status:
-    if all(status == '200' for status in table_status):
+    success = [str(code) for code in SUCCESS_CODES]
+    if all(status in success for status in table_status):
         console_msg +='\n  -- Action status: all entries posted to APIC'
-    elif any(status == '200' for status in table_status):
+    elif any(status in success for status in table_status):
         console_msg += '\n  -- Action status: partial entries pushed'
     else:
         console_msg += '\n  -- Action status: all entries failed'
@@ -329,12 +750,8 @@ def set_table_action(table_name, action):
 
     """
     table = xw.Range(table_name)
-    # skip the first two rows (headers)
-    for no, row in enumerate(table.value[2:]):
-        cell = table[no + 2, 1].address
-        color = table[no + 2, 1].color
-        xw.Range(cell).value = action
-        xw.Range(cell).color = color
+    # skip the first two rows (headers), the cell colors are left as they are
+    table[2:, 1].value = action
 
 
 def set_all_table_action(action):
@@ -347,13 +764,13 @@ def set_all_table_action(action):
     """
     current_worksheet = xw.sheets.active.name
     console_msg = 'Change action for all tables in worksheet: {}'.format(current_worksheet)
-    update_console(console_msg)
 
     TABLES = get_table_list()
     for table in TABLES[current_worksheet]:
         console_msg += '\n  -{} action changed to --> \'{}\''.format(table, action)
-        update_console(msg=console_msg)
         set_table_action(table, action)
+    # the console is only updated once, when all the tables are done
+    update_console(msg=console_msg)
 
 
 def update_console(msg):
@@ -385,6 +802,83 @@ def show_console_payload(row, table_name, uri, payload):
     update_console(msg=console_msg)
 
 
+class ConsoleProgress(object):
+    """
+    Shows the progress of a table push in the console: rows done, rows/sec,
+    failures and the estimated time left. The messages are coalesced and
+    the console is refreshed at most refresh_rate times per second.
+
+    In verbose mode the console also shows the payload and URI of the last
+    row that was rendered, as show_console_payload() does.
+    """
+    # the refresh rate applies to every table being pushed at the same time
+    last_refresh = 0
+
+    def __init__(self, table_name, total, refresh_rate=CONSOLE_REFRESH_RATE,
+                 verbose=None):
+        self.table_name = table_name
+        self.total = total
+        self.interval = 1.0 / refresh_rate
+        self.verbose = VERBOSE_CONSOLE if verbose is None else verbose
+        self.done = 0
+        self.failed = 0
+        self.start = time.time()
+        self.payload = None
+
+    def show_payload(self, row, table_name, uri, payload):
+        if self.verbose:
+            self.payload = (row, uri, payload)
+            self.refresh()
+
+    def row_done(self, status_code):
+        self.done += 1
+        if status_code not in SUCCESS_CODES:
+            self.failed += 1
+        self.refresh()
+
+    def get_summary(self):
+        elapsed = max(time.time() - self.start, 0.001)
+        rate = self.done / elapsed
+        eta = (self.total - self.done) / rate if rate else 0
+        console_msg = 'Pushing table: {}'.format(self.table_name)
+        console_msg += '\n  -- Rows done: {} of {}'.format(self.done,
+                                                           self.total)
+        console_msg += '\n  -- Rows/sec: {:.1f}'.format(rate)
+        console_msg += '\n  -- Failures: {}'.format(self.failed)
+        console_msg += '\n  -- Time left: {:.0f} sec'.format(eta)
+        if self.payload:
+            row, uri, payload = self.payload
+            console_msg += '\n\nReading row: {}'.format(row + 1)
+            console_msg += '\n\nPayload: {}'.format(payload)
+            console_msg += '\n\nPosting to URI: {}'.format(uri)
+        return console_msg
+
+    def refresh(self, force=False):
+        now = time.time()
+        if not force and now - ConsoleProgress.last_refresh < self.interval:
+            return
+        ConsoleProgress.last_refresh = now
+        self.show(self.get_summary())
+
+    def show(self, msg):
+        update_console(msg=msg)
+
+
+def show_validation_problems(problems):
+    """
+    Updates the console with the problems found by validating the
+    commands, before anything was posted
+
+    Args:
+        problems(list): one msg per problem
+
+    """
+    console_msg = 'Nothing was pushed, the following problems were found:'
+    for problem in problems:
+        console_msg += '\n -- {}'.format(problem)
+    update_console(msg=console_msg)
+
+
 def show_console_launcher_error(launcher_fname=None):
     """
     Update the console with an error that the launcher.json
@@ -409,16 +903,14 @@ def reset_table_status():
     try:
         current_worksheet = xw.sheets.active.name
         console_msg = 'Clear status code for worksheet: {}'.format(current_worksheet)
-        update_console(console_msg)
         TABLES = get_table_list()
         for table in TABLES[current_worksheet]:
             console_msg += '\n  -Clearing status code for table: {}'.format(table)
-            update_console(console_msg)
-            t = xw.Range(table)
-            for no, row in enumerate(t.value[2:]):
-                cell = t[no + 2, 0].address
-                xw.Range(cell).value = ''
-                xw.Range(cell).color = COLOR_DEFAULT
+            status_column = xw.Range(table)[2:, 0]
+            status_column.value = ''
+            status_column.color = COLOR_DEFAULT
+        # the console is only updated once, when all the tables are done
+        update_console(console_msg)
     except Exception as e:
         update_console('\n  -Error clearing status codes')
 
@@ -442,6 +934,8 @@ def update_excel_data(commands, tables):
     """
     worksheet_names = tables[0]
     worksheet_tables = tables[1]
+    ws_commands = get_workbook().sheets[WS_COMMANDS]
+    ws_tables = get_workbook().sheets[WS_TABLES]
 
     # add a row in case the table is empty, otherwise delete would return error
     ws_commands.range('COMMANDS').value = 'N/A'
@@ -459,6 +953,133 @@ def update_excel_data(commands, tables):
     #TODO: prepend the fabric folder name to the command
 
 
+def get_active_worksheet():
+    return xw.sheets.active.name
+
+
+def activate_worksheet(worksheet_name):
+    """
+    Make a worksheet the active one, the tables and the console cell are
+    read and updated on the active worksheet
+    """
+    if worksheet_name and worksheet_name != get_active_worksheet():
+        get_workbook().sheets[worksheet_name].activate()
+
+
+def get_push_commands_summary(pushes):
+    """
+    Build the summary of a push of several commands, one line per command
+
+    Args:
+        pushes(list): CommandPush for every command, in push order
+
+    """
+    console_msg = 'Pushed {} commands in dependency order'.format(len(pushes))
+    for push in pushes:
+        counts = push.counts
+        console_msg += '\n  -- {}: {} ok, {} failed, {} cancelled'.format(
+            push.cmd, counts['success'], counts['failed'],
+            counts['cancelled'])
+    return console_msg
+
+
+def show_push_commands_report(pushes):
+    """
+    Updates the console with the result of each command, once several
+    commands have been pushed together
+
+    Args:
+        pushes(list): CommandPush for every command, in push order
+
+    """
+    update_console(msg=get_push_commands_summary(pushes))
+
+
+def get_worksheet(worksheet_name):
+    """
+    Get a worksheet of the workbook, it is added if it does not exist yet
+    """
+    wb = get_workbook()
+    if worksheet_name not in [ws.name for ws in wb.sheets]:
+        wb.sheets.add(worksheet_name, after=wb.sheets[-1])
+    return wb.sheets[worksheet_name]
+
+
+def write_fabric_results(table_name, fabrics, results):
+    """
+    Add the status of every row for every fabric to the fabric results
+    worksheet, below the results that are already there, as a single
+    range write
+
+    Args:
+        table_name(str): Name of the table that was pushed
+        fabrics(list): names of the fabrics
+        results(list): one list per row, the status cell of the row
+        followed by the status code of the row for each fabric
+
+    """
+    active_worksheet = get_active_worksheet()
+    ws = get_worksheet(WS_FABRIC_RESULTS)
+    last_cell = ws.used_range.last_cell
+    first_row = last_cell.row + 2 if last_cell.value is not None else 1
+    values = [['table_name', 'status_cell'] + list(fabrics)]
+    values += [[table_name] + list(row) for row in results]
+    ws.range((first_row, 1)).value = values
+    activate_worksheet(active_worksheet)
+
+
+def write_table_rows(table_name, header, rows):
+    """
+    Add rows to the bottom of a table with a single range write. Cells are
+    inserted in the columns of the table first, so that the tables below
+    are moved down and the named range of the table grows to hold the new
+    rows. The tables beside it are left where they are.
+
+    Args:
+        table_name(str): Name of the table the rows are added to
+        header(list): column names of the table
+        rows(list): one list of values per row, in the order of the header
+
+    """
+    if not rows:
+        return
+    t = xw.Range(table_name)
+    ws = t.sheet
+    last_row = t.row + t.rows.count - 1
+    last_column = t.column + t.columns.count - 1
+    # insert above the last row, which is written again below the new rows
+    last_values = ws.range((last_row, t.column),
+                           (last_row, last_column)).options(ndim=2).value
+    ws.range((last_row, t.column),
+             (last_row + len(rows) - 1, last_column)).api.Insert(
+                 InsertShiftDirection.xlShiftDown)
+    ws.range((last_row, t.column)).value = last_values + rows
+
+
+def write_trace_summary(table_name, trace_stats):
+    """
+    Add the timings of a push to the hidden trace summary worksheet, below
+    the timings that are already there
+
+    Args:
+        table_name(str): Name of the table that was pushed
+        trace_stats(dict): as returned by Tracer.get_summary
+
+    """
+    active_worksheet = get_active_worksheet()
+    ws = get_worksheet(WS_TRACE_SUMMARY)
+    last_cell = ws.used_range.last_cell
+    first_row = last_cell.row + 2 if last_cell.value is not None else 1
+    values = [['table_name', 'stage', 'count', 'total_ms', 'mean_ms',
+               'max_ms']]
+    values += [[table_name] + list(stage) for stage in trace_stats['stages']]
+    values += [[table_name, counter, value] for counter, value in
+               sorted(trace_stats['counters'].items())]
+    ws.range((first_row, 1)).value = values
+    ws.visible = False
+    activate_worksheet(active_worksheet)
+
+
 def can_run_cmd_from_worksheet(cmd, launcher_data):
     # get the current active worksheet and the cmd allowed worksheet names
     current_worksheet = xw.sheets.active.name
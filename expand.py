@@ -0,0 +1,94 @@
+import itertools
+import re
+
+# A range inside a cell value, i.e. the '1-48' of 'eth1/1-48'
+RANGE = re.compile(r'(\d+)-(\d+)')
+
+
+def parse_value(value):
+    """
+    Expand the ranges of a cell value into the values they stand for. A
+    value is a comma separated list of items, the last number range of an
+    item is expanded, i.e.
+
+        'eth1/1-4'         -> ['eth1/1', 'eth1/2', 'eth1/3', 'eth1/4']
+        'vlan 100-101,200' -> ['vlan 100', 'vlan 101', '200']
+        '01-03'            -> ['01', '02', '03']
+
+    Values that are not text are not expanded.
+
+    Returns:
+        values (list): the expanded values, [value] if there is no range
+
+    Raises:
+        ValueError: if a range ends before it starts
+
+    """
+    if not isinstance(value, str) or not RANGE.search(value):
+        return [value]
+    values = []
+    for item in value.split(','):
+        item = item.strip()
+        matches = list(RANGE.finditer(item))
+        if not matches:
+            values.append(item)
+            continue
+        match = matches[-1]
+        start, end = match.group(1), match.group(2)
+        if int(end) < int(start):
+            raise ValueError('{} ends before it starts'.format(item))
+        # keep the leading zeros of the start, i.e. 01-10
+        width = len(start) if start.startswith('0') else 0
+        prefix, suffix = item[:match.start()], item[match.end():]
+        values.extend('{}{}{}'.format(prefix, str(number).zfill(width),
+                                      suffix)
+                      for number in range(int(start), int(end) + 1))
+    return values
+
+
+def expand_row(row_data, columns, product=False):
+    """
+    Expand the ranges in some columns of a row into one row per object.
+    The values of the columns are paired in order (the ranges must then be
+    of the same length, a single value is used for every object), or
+    combined into their cartesian product if product is set.
+
+    Args:
+        row_data(dict): the row, columns mapped to the cell content
+        columns(list): columns whose ranges are expanded, from the
+        'expand_columns' key in launcher.json
+        product(bool): combine the columns rather than pair them
+
+    Returns:
+        (count, rows): the number of objects, and a generator that yields
+        a copy of row_data for each of them
+
+    Raises:
+        ValueError: if a range is invalid, or the ranges of the columns
+        can not be paired
+
+    """
+    columns = [column for column in columns if column in row_data]
+    values = [parse_value(row_data[column]) for column in columns]
+    if product or not values:
+        count = 1
+        for column_values in values:
+            count *= len(column_values)
+        combinations = itertools.product(*values)
+    else:
+        lengths = set(len(column_values) for column_values in values) - {1}
+        if len(lengths) > 1:
+            raise ValueError('the ranges of {} are not of the same '
+                             'length'.format(', '.join(columns)))
+        count = lengths.pop() if lengths else 1
+        combinations = zip(*[column_values * count
+                             if len(column_values) == 1 else column_values
+                             for column_values in values])
+    return count, get_rows(row_data, columns, combinations)
+
+
+def get_rows(row_data, columns, combinations):
+    for combination in combinations:
+        data = dict(row_data)
+        data.update(zip(columns, combination))
+        yield data
@@ -0,0 +1,200 @@
+import json
+import re
+from collections import OrderedDict
+
+# Folder under jsondata holding the query templates, and the template used
+# for the class queries unless 'query_file' is set for the command
+QUERY_FOLDER = 'Query'
+QUERY_FILE = 'class_query.json'
+
+# MOs returned by a single page of a class query
+PAGE_SIZE = 1000
+
+# Pages of the class queries fetched in parallel
+MAX_IN_FLIGHT = 4
+
+# Seconds to wait for the APIC to answer a page
+TIMEOUT = 30
+
+# Value of the action column of the exported rows
+EXPORT_ACTION = 'created'
+
+VARIABLE = re.compile(r'{{\s*(\w+)\s*}}')
+
+
+def get_value_pattern(value):
+    """
+    Turn a template value into a regex that reads the variables back from
+    the value of the attribute on the APIC, i.e. 'vlan-{{start}}' matches
+    'vlan-100' with start='100'
+
+    Returns:
+        (pattern, names): or (None, []) if the value has no variables
+
+    """
+    names = []
+    regex = ''
+    end = 0
+    for match in VARIABLE.finditer(value):
+        regex += re.escape(value[end:match.start()])
+        name = match.group(1)
+        if name in names:
+            regex += '(?P={})'.format(name)
+        else:
+            regex += '(?P<{}>.*?)'.format(name)
+            names.append(name)
+        end = match.end()
+    if not names:
+        return None, []
+    regex += re.escape(value[end:])
+    return re.compile(regex + '$'), names
+
+
+def is_owned(body):
+    # a child whose status is the action of the row is created and deleted
+    # with the row, the APIC may hold several of them, i.e. BD subnets
+    status = body.get('attributes', {}).get('status', '')
+    return VARIABLE.sub(lambda m: m.group(1), status).strip() == 'action'
+
+
+def compile_node(body):
+    attributes = []
+    for key, value in body.get('attributes', {}).items():
+        if key == 'status' or not isinstance(value, str):
+            continue
+        pattern, names = get_value_pattern(value)
+        if pattern:
+            attributes.append((key, pattern, names))
+    children = []
+    for child in body.get('children', []):
+        cls = list(child)[0]
+        children.append((cls, compile_node(child[cls]), is_owned(child[cls])))
+    return {'attributes': attributes, 'children': children}
+
+
+def compile_mapping(source, json_uri):
+    """
+    Build the mapping from the MOs of a class query back to the columns of
+    a table, from the payload template and json_uri of the command. The
+    dn of the root object is read with the json_uri, i.e.
+    'mo/uni/tn-{tn_name}' reads tn_name from 'uni/tn-common'.
+
+    Args:
+        source(str): payload template, it must be plain json with {{ }}
+        values, templates with {% %} blocks can not be exported
+        json_uri(str): json_uri of the command, from launcher.json
+
+    Returns:
+        (cls, node): class of the root object, and its compiled mapping
+
+    Raises:
+        ValueError: if the template is not plain json
+
+    """
+    data = json.loads(source, object_pairs_hook=OrderedDict)
+    if not isinstance(data, dict) or len(data) != 1:
+        raise ValueError('the payload must have a single root object')
+    cls = list(data)[0]
+    node = compile_node(data[cls])
+    dn = re.sub(r'{(\w+)}', r'{{\1}}', json_uri)
+    if dn.startswith('mo/'):
+        dn = dn[len('mo/'):]
+    pattern, names = get_value_pattern(dn)
+    node['attributes'] = [a for a in node['attributes'] if a[0] != 'dn']
+    if pattern:
+        node['attributes'].insert(0, ('dn', pattern, names))
+    return cls, node
+
+
+def extract(node, mo):
+    """
+    Read the variables of a template node from an MO and its children. An
+    owned child gives one set of values per instance on the APIC, other
+    children give the values of their first match.
+
+    Returns:
+        values (list): one dict of variables per row, empty if the MO does
+        not match the template
+
+    """
+    attributes = mo.get('attributes', {})
+    values = {}
+    for key, pattern, names in node['attributes']:
+        if key not in attributes:
+            continue
+        match = pattern.match(str(attributes[key]))
+        if not match:
+            return []
+        for name in names:
+            values.setdefault(name, match.group(name))
+
+    rows = [values]
+    for cls, child, owned in node['children']:
+        found = []
+        for candidate in mo.get('children', []):
+            if cls in candidate:
+                found.extend(extract(child, candidate[cls]))
+        if not owned:
+            found = found[:1] or [{}]
+        rows = [dict(child_values, **row) for row in rows
+                for child_values in found]
+    return rows
+
+
+def parse_bd_scope(scope):
+    """
+    Reverse of AciHandler.format_bd_scope(), i.e. 'public,shared' ->
+    advertised_externally and shared_between_vrfs enabled
+    """
+    scope = scope.split(',')
+    return {'private_to_vrf': 'enabled' if 'private' in scope
+                              else 'disabled',
+            'advertised_externally': 'enabled' if 'public' in scope
+                                     else 'disabled',
+            'shared_between_vrfs': 'enabled' if 'shared' in scope
+                                   else 'disabled'}
+
+
+def get_rows(cmd, node, mos, header, mandatory_keys=None):
+    """
+    Map the MOs of a class query to rows of a table
+
+    Args:
+        cmd(str): command name from launcher.json
+        node(dict): compiled mapping, see compile_mapping()
+        mos(list): MO bodies, as returned by the APIC
+        header(list): column names of the table
+        mandatory_keys(list): rows without a value for one of these are
+        left out
+
+    Returns:
+        (rows, skipped): rows are lists of values in the order of the
+        header, skipped is the number of rows left out
+
+    """
+    mandatory_keys = [key for key in mandatory_keys or [] if key != 'action']
+    rows = []
+    skipped = 0
+    for mo in mos:
+        for values in extract(node, mo):
+            # convert scope for bd_subnet
+            if 'bd_subnet' in cmd and 'scope' in values:
+                values.update(parse_bd_scope(values.pop('scope')))
+            values['action'] = EXPORT_ACTION
+            if not all(values.get(key) for key in mandatory_keys):
+                skipped += 1
+                continue
+            rows.append([values.get(column, '') for column in header])
+    return rows, skipped
+
+
+def get_query_params(template, cls, page, page_size):
+    """
+    Render the query template of a command for one page of a class query
+
+    Returns:
+        params (dict): query parameters, i.e. {'page': '0', ..}
+
+    """
+    return json.loads(template.render(cls=cls, page=page,
+                                      page_size=page_size))
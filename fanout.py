@@ -0,0 +1,153 @@
+"""
+Backend of the AciHandler of each fabric when commands are pushed to
+several fabrics at the same time, see AciHandler.push_to_fabrics().
+
+Every fabric is pushed by its own handler in its own thread, so that it
+gets its own journal, rollback set and reference index. The tables are
+read once, before the push, and the status updates of every fabric are
+queued for the main thread, so that only the main thread uses excel.
+"""
+import excel
+
+
+class TableCache(object):
+    """
+    The tables of a push to several fabrics, read once from the backend and
+    shared by the backend of every fabric. Each read gets its own copy of
+    the rows, as the rows are changed while they are rendered.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        self.headers = {}
+        self.sizes = {}
+        self.tables = {}
+
+    def add(self, table_name, mandatory_keys=None, default_values=None,
+            pushed=True):
+        """
+        Read a table, a table that is pushed has the rows that are missing
+        a mandatory key marked as ignored, see excel.get_table()
+
+        Args:
+            table_name(str): The name of the table in excel
+            mandatory_keys (list): table mandatory keys, from launcher.json
+            default_values (dict): table default values, from launcher.json
+            pushed(bool): False if the table is only looked up, i.e. the
+            table of a command that is referred to
+
+        """
+        if table_name in self.tables:
+            return
+        header = self.backend.get_table_header(table_name)
+        self.headers[table_name] = header
+        if header is None:
+            return
+        if pushed:
+            table = self.backend.get_table(table_name=table_name,
+                                           mandatory_keys=mandatory_keys,
+                                           default_values=default_values)
+            rows = sorted(table.items())
+        else:
+            rows = list(self.backend.read_table(
+                table_name=table_name, mandatory_keys=mandatory_keys,
+                default_values=default_values))
+        self.sizes[table_name] = self.backend.get_table_size(table_name)
+        self.tables[table_name] = rows
+
+    def get_rows(self, table_name):
+        return [(row, dict(row_data))
+                for row, row_data in self.tables[table_name]]
+
+
+class FabricStatusWriter(object):
+    """
+    Stand-in for excel.StatusWriter, the status updates of a fabric are
+    queued as soon as they are made, see FabricBackend.update_status()
+    """
+    def __init__(self, table_name=None):
+        self.table_name = table_name
+
+    def flush(self):
+        pass
+
+
+class QuietProgress(excel.ConsoleProgress):
+    # the main thread shows the progress of the rows of every fabric
+    def show(self, msg):
+        pass
+
+
+class FabricBackend(object):
+    """
+    In-memory stand-in for the excel module, provides the functions that
+    AciHandler calls on its backend while it pushes commands. The tables
+    are served from a TableCache, and every status update is put on the
+    updates queue as (fabric, table_name, cell, status_code).
+
+    Args:
+        fabric(str): fabric name from fabrics.json
+        tables(TableCache): the tables of the push, read beforehand
+        updates(queue.Queue): status updates of every fabric
+
+    """
+    ConsoleProgress = QuietProgress
+
+    def __init__(self, fabric, tables, updates):
+        self.fabric = fabric
+        self.tables = tables
+        self.updates = updates
+
+    def StatusWriter(self, table_name=None):
+        return FabricStatusWriter(table_name)
+
+    def get_table(self, table_name=None, mandatory_keys=None,
+                  default_values=None):
+        return dict(self.tables.get_rows(table_name))
+
+    def iter_table(self, table_name=None, mandatory_keys=None,
+                   default_values=None, chunk_size=None):
+        return iter(self.tables.get_rows(table_name))
+
+    def read_table(self, table_name=None, mandatory_keys=None,
+                   default_values=None, chunk_size=None):
+        return iter(self.tables.get_rows(table_name))
+
+    def get_table_header(self, table_name):
+        return self.tables.headers.get(table_name)
+
+    def get_table_size(self, table_name):
+        return self.tables.sizes[table_name]
+
+    def update_status(self, cell, status_code, writer=None):
+        table_name = writer.table_name if writer else None
+        self.updates.put((self.fabric, table_name, cell, status_code))
+
+    def show_validation_problems(self, problems):
+        # the commands were validated before the fabrics were pushed
+        pass
+
+    def update_console(self, msg):
+        pass
+
+    def show_console_payload(self, row, table_name, uri, payload):
+        pass
+
+    def show_cp_authentication_attempt_msg(self):
+        pass
+
+    def update_cp_authentication_response(self, status_code):
+        pass
+
+    def get_active_worksheet(self):
+        return None
+
+    def activate_worksheet(self, worksheet_name):
+        pass
+
+    def show_push_commands_report(self, pushes):
+        pass
+
+    def show_push_report_status(self, table_name, action_msg,
+                                conn_stats=None, template_stats=None,
+                                trace_stats=None, push=None):
+        pass
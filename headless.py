@@ -0,0 +1,483 @@
+"""
+Headless backend used in place of excel.py when there is no running
+instance of excel, i.e. from a linux jump host or a scheduled job.
+
+The named tables are streamed straight from the .xlsm file, and the status
+of each row is written to a results file instead of the status_code column.
+It provides the same functions that AciHandler calls on the excel module.
+"""
+import csv
+import itertools
+import os
+import re
+import zipfile
+import xml.etree.ElementTree as ElementTree
+import openpyxl
+from openpyxl.utils import get_column_letter, range_boundaries
+import cluster
+import excel
+import tracing
+
+# Results file written next to the workbook, unless one is specified
+RESULTS_SUFFIX = '_results.csv'
+FABRIC_RESULTS_SUFFIX = '_fabric_results.csv'
+# Rows exported from the APIC are written to <workbook name>_<table>.csv
+EXPORT_SUFFIX = '_{table_name}.csv'
+RESULTS_HEADER = ['table_name', 'status_cell', 'status_code', 'status']
+
+# Status recorded for rows that are missing a mandatory field
+STATUS_IGNORED = 'ignored'
+
+# Namespaces used in the .xlsx/.xlsm package
+NS_MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+NS_PKG_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+# Authentication details, read from the workbook by open_workbook()
+APIC = None
+USER = None
+PWORD = None
+
+_workbook = None
+_table_refs = {}
+_results_file = None
+_fabric_results_file = None
+_export_prefix = None
+_ignored = {}
+_current_table = None
+
+
+def read_xml(package, name):
+    return ElementTree.fromstring(package.read(name))
+
+
+def read_rels(package, name):
+    """
+    Read a relationships part, i.e. xl/_rels/workbook.xml.rels
+
+    Returns:
+        rels(dict): k,v, k=relationship id and v=(type, target)
+
+    """
+    if name not in package.namelist():
+        return {}
+    rels = {}
+    for rel in read_xml(package, name).iter(NS_PKG_REL + 'Relationship'):
+        rels[rel.get('Id')] = (rel.get('Type'), rel.get('Target'))
+    return rels
+
+
+def resolve_target(folder, target):
+    """
+    Resolve a relationship target relative to the part it belongs to, i.e.
+    ('xl/worksheets', '../tables/table1.xml') -> 'xl/tables/table1.xml'
+    """
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return os.path.normpath(os.path.join(folder, target)).replace('\\', '/')
+
+
+def read_table_refs(workbook_name):
+    """
+    Map the defined names of the workbook (i.e. TABLE_TENANT) to the
+    worksheet and cell range that they refer to. The names refer either to
+    an excel table (i.e. Table13[#All]) or directly to a range of cells.
+
+    Args:
+        workbook_name(str): path to the .xlsm file
+
+    Returns:
+        table_refs(dict): k,v, k=defined name and v=(worksheet_name, ref)
+
+    """
+    with zipfile.ZipFile(workbook_name) as package:
+        workbook = read_xml(package, 'xl/workbook.xml')
+        workbook_rels = read_rels(package, 'xl/_rels/workbook.xml.rels')
+
+        # find the range of every excel table, by its display name
+        tables = {}
+        for sheet in workbook.iter(NS_MAIN + 'sheet'):
+            _, target = workbook_rels[sheet.get(NS_REL + 'id')]
+            sheet_part = resolve_target('xl', target)
+            folder, fname = sheet_part.rsplit('/', 1)
+            sheet_rels = read_rels(package,
+                                   '{}/_rels/{}.rels'.format(folder, fname))
+            for rel_type, rel_target in sheet_rels.values():
+                if not rel_type.endswith('/table'):
+                    continue
+                table = read_xml(package, resolve_target(folder, rel_target))
+                tables[table.get('displayName')] = (sheet.get('name'),
+                                                    table.get('ref'))
+
+        table_refs = {}
+        for name in workbook.iter(NS_MAIN + 'definedName'):
+            text = name.text or ''
+            if text.startswith('#REF!'):
+                # the table the name referred to has been deleted
+                continue
+            if '!' in text:
+                sheet_name, ref = text.rsplit('!', 1)
+                table_refs[name.get('name')] = (sheet_name.strip("'"),
+                                                ref.replace('$', ''))
+            elif re.sub(r'\[.*\]$', '', text) in tables:
+                table_refs[name.get('name')] = tables[
+                    re.sub(r'\[.*\]$', '', text)]
+    return table_refs
+
+
+def open_workbook(workbook_name=excel.WORKBOOK_NAME, results_file=None):
+    """
+    Open the workbook in read-only (streaming) mode, read the authentication
+    details and start a new results file.
+
+    Args:
+        workbook_name(str): path to the .xlsm file
+        results_file(str, optional): path to the results file, defaults
+        to <workbook name>_results.csv
+
+    """
+    global APIC, USER, PWORD
+    global _workbook, _table_refs, _results_file, _ignored
+    global _fabric_results_file, _export_prefix
+    _table_refs = read_table_refs(workbook_name)
+    _workbook = openpyxl.load_workbook(workbook_name, read_only=True,
+                                       data_only=True, keep_vba=False)
+    _results_file = results_file or (os.path.splitext(workbook_name)[0] +
+                                     RESULTS_SUFFIX)
+    _ignored = {}
+    _fabric_results_file = (os.path.splitext(workbook_name)[0] +
+                            FABRIC_RESULTS_SUFFIX)
+    _export_prefix = os.path.splitext(workbook_name)[0]
+    if os.path.exists(_fabric_results_file):
+        os.remove(_fabric_results_file)
+
+    ws = _workbook[excel.WS_AUTHENTICATION]
+    cells = [excel.AUTHENTICATION_CELLS[k] for k in ('APIC', 'USER', 'PWORD')]
+    APIC, USER, PWORD = [read_cell(ws, cell) for cell in cells]
+
+    with open(_results_file, 'w', newline='') as f:
+        csv.writer(f).writerow(RESULTS_HEADER)
+
+
+def close_workbook():
+    global _workbook
+    if _workbook:
+        _workbook.close()
+    _workbook = None
+
+
+def read_cell(ws, cell):
+    min_col, min_row, _, _ = range_boundaries(cell.replace('$', ''))
+    for values in ws.iter_rows(min_row=min_row, max_row=min_row,
+                               min_col=min_col, max_col=min_col,
+                               values_only=True):
+        return values[0]
+
+
+def get_table(table_name=None, mandatory_keys=None, default_values=None):
+    """
+    Stream the content of a table from the workbook. The returned table
+    is the same as the one returned by excel.get_table(), the row as the
+    primary key, the columns as the sub-keys mapped to the cell content.
+
+    Args:
+        table_name(str): The name of the table in excel.
+        mandatory_keys (list): table mandatory keys, from launcher.json
+        default_values (dict): table default values, from launcher.json
+
+    Returns:
+        table(dict): content from the table that has removed
+        invalid rows and has default values applied to cells
+
+    """
+    return dict(iter_table(table_name, mandatory_keys=mandatory_keys,
+                           default_values=default_values))
+
+
+def iter_table(table_name=None, mandatory_keys=None, default_values=None,
+               chunk_size=None):
+    """
+    Stream the rows of a table from the workbook, the same
+    rows as the ones returned by get_table(). With a chunk_size only that
+    many rows are held in memory at a time.
+
+    Returns:
+        rows (generator): (row, row_data) tuples, row_data holds the
+        columns mapped to the cell content
+
+    """
+    # set straight away, as the status writer of the push is created
+    # before the first row is read
+    global _current_table
+    _current_table = table_name
+    _ignored[table_name] = []
+    return read_rows(table_name, mandatory_keys, default_values, chunk_size,
+                     mark_ignored=True)
+
+
+def read_table(table_name=None, mandatory_keys=None, default_values=None,
+               chunk_size=None):
+    """
+    Stream the rows of a table like iter_table(), without recording the
+    rows that are missing a mandatory key as ignored, i.e. to look up the
+    rows of a table that is not pushed
+    """
+    return read_rows(table_name, mandatory_keys, default_values, chunk_size,
+                     mark_ignored=False)
+
+
+def read_rows(table_name, mandatory_keys, default_values, chunk_size,
+              mark_ignored):
+    sheet_name, ref = _table_refs[table_name]
+    min_col, min_row, max_col, max_row = range_boundaries(ref)
+    rows = _workbook[sheet_name].iter_rows(min_row=min_row, max_row=max_row,
+                                           min_col=min_col, max_col=max_col,
+                                           values_only=True)
+    # skip the first two rows (headers)
+    header = next(rows)
+    next(rows, None)
+    row_offset = 0
+    while True:
+        values = list(itertools.islice(rows, chunk_size))
+        if not values:
+            return
+        table, chunk_ignored = excel.build_table(
+            header, values, get_column_letter(min_col),
+            min_row + 2 + row_offset, mandatory_keys=mandatory_keys,
+            default_values=default_values, row_offset=row_offset)
+        row_offset += len(values)
+
+        # mark the invalid rows as ignored
+        if mark_ignored:
+            writer = StatusWriter(table_name)
+            for cell in chunk_ignored:
+                writer.add(cell, STATUS_IGNORED, excel.ROW_IGNORED_MSG)
+            writer.flush()
+            _ignored[table_name].extend(chunk_ignored)
+
+        for row in sorted(table):
+            yield row, table[row]
+
+
+def get_table_header(table_name):
+    if table_name not in _table_refs:
+        return None
+    sheet_name, ref = _table_refs[table_name]
+    min_col, min_row, max_col, max_row = range_boundaries(ref)
+    for header in _workbook[sheet_name].iter_rows(min_row=min_row,
+                                                  max_row=min_row,
+                                                  min_col=min_col,
+                                                  max_col=max_col,
+                                                  values_only=True):
+        # a blank column is kept, so that the names line up with the columns
+        return [column if column else None for column in header]
+
+
+def get_table_size(table_name):
+    # number of data rows, without the two header rows
+    min_col, min_row, max_col, max_row = range_boundaries(
+        _table_refs[table_name][1])
+    return max_row - min_row - 1
+
+
+class StatusWriter(object):
+    """
+    Buffers the status of each row of a table and appends them to the
+    results file when flush() is called
+    """
+    def __init__(self, table_name=None):
+        # the writer belongs to the table that was read last
+        self.table_name = table_name or _current_table
+        self.rows = []
+
+    def add(self, cell, status_code, status=''):
+        self.rows.append([self.table_name, cell, status_code, status])
+
+    def flush(self):
+        if self.rows:
+            with open(_results_file, 'a', newline='') as f:
+                csv.writer(f).writerows(self.rows)
+        self.rows = []
+
+
+def update_status(cell, status_code, writer=None):
+    """
+    Record the status_code received when attempting to post the payload
+
+    Args:
+        cell(str): status cell of the row, i.e. $A$37
+        status_code(int): status code number returned from REST post command
+        writer(StatusWriter, optional): buffer the update instead of
+        writing it to the results file straight away
+
+    """
+    status = excel.get_status_format(status_code)['msg2']
+    if writer:
+        writer.add(cell, status_code, status)
+    else:
+        writer = StatusWriter()
+        writer.add(cell, status_code, status)
+        writer.flush()
+
+
+def update_console(msg):
+    print(msg)
+
+
+def show_console_payload(row, table_name, uri, payload):
+    update_console('Reading row: {}, from table: {}'.format(row + 1,
+                                                            table_name))
+
+
+class ConsoleProgress(excel.ConsoleProgress):
+    """
+    Prints the progress of a table push, in verbose mode the payload of
+    every row is printed as well
+    """
+    def show_payload(self, row, table_name, uri, payload):
+        if self.verbose:
+            update_console('Row: {}, from table: {}\nPayload: {}\n'
+                           'Posting to URI: {}'.format(row + 1, table_name,
+                                                       payload, uri))
+
+    def show(self, msg):
+        update_console(msg)
+
+
+def show_console_launcher_error(launcher_fname=None):
+    update_console('Error, could not find: {}'.format(launcher_fname))
+
+
+def show_validation_problems(problems):
+    update_console('Nothing was pushed, the following problems were '
+                   'found:\n -- ' + '\n -- '.join(problems))
+
+
+def show_cp_authentication_attempt_msg():
+    update_console('Attempting authentication...')
+
+
+def update_cp_authentication_response(status_code):
+    if excel.HTTP_STATUS_CODES.get(status_code):
+        msg_1 = excel.HTTP_STATUS_CODES.get(status_code)['msg1']
+        msg_2 = excel.get_status_format(status_code)['msg2']
+        console_msg = 'Authentication response from APIC'
+        console_msg += '\n  - Status code: {}'.format(msg_1)
+        console_msg += '\n  - Status explanation: {}'.format(msg_2)
+        update_console(msg=console_msg)
+
+
+def get_active_worksheet():
+    return None
+
+
+def activate_worksheet(worksheet_name):
+    # tables are read by name, there is no active worksheet in headless mode
+    pass
+
+
+def show_push_commands_report(pushes):
+    update_console(msg=excel.get_push_commands_summary(pushes))
+
+
+def write_fabric_results(table_name, fabrics, results):
+    """
+    Append the status of every row for every fabric to the fabric results
+    file, <workbook name>_fabric_results.csv
+
+    Args:
+        table_name(str): Name of the table that was pushed
+        fabrics(list): names of the fabrics
+        results(list): one list per row, the status cell of the row
+        followed by the status code of the row for each fabric
+
+    """
+    with open(_fabric_results_file, 'a', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['table_name', 'status_cell'] + list(fabrics))
+        writer.writerows([table_name] + list(row) for row in results)
+
+
+def write_table_rows(table_name, header, rows):
+    """
+    Write the rows exported from the APIC for a table to
+    <workbook name>_<table>.csv, with the header of the table, ready to be
+    pasted into the table
+
+    Args:
+        table_name(str): Name of the table the rows belong to
+        header(list): column names of the table
+        rows(list): one list of values per row, in the order of the header
+
+    """
+    fname = _export_prefix + EXPORT_SUFFIX.format(table_name=table_name)
+    with open(fname, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    update_console('Rows written to: {}'.format(fname))
+
+
+def can_run_cmd_from_worksheet(cmd, launcher_data):
+    # there is no active worksheet in headless mode
+    return True
+
+
+def show_push_report_status(table_name, action_msg, conn_stats=None,
+                            template_stats=None, trace_stats=None,
+                            push=None):
+    """
+    Show the result of the push for a table, using the tally of the push
+    rather than reading the status codes back from the results file.
+
+    Args:
+        table_name(str): Name of the table which is retrieved from
+        launcher.json file
+
+        action_msg(str, optional): msg to be shown as the 'last
+        action performed', passed from launcher.json file
+
+        conn_stats(dict, optional): connections opened/reused by the
+        APIC session, as returned by AciHandler.connection_stats
+
+        template_stats(dict, optional): compile and render times of the
+        template, as returned by TemplateRegistry.get_stats
+
+        trace_stats(dict, optional): time spent in each stage of the push,
+        as returned by Tracer.get_summary
+
+        push(CommandPush, optional): the tally of the push
+
+    """
+    failed = list(_ignored.get(table_name, []))
+    success = 0
+    if push:
+        failed += list(push.failed_cells.values())
+        success = push.counts['success']
+    console_msg = 'Last action performed: {}'.format(action_msg)
+    console_msg += excel.get_action_status(success, len(failed))
+
+    if conn_stats:
+        console_msg += '\n  -- Connections: {} opened, {} re-used'.format(
+            conn_stats['opened'], conn_stats['reused'])
+        if conn_stats.get('controllers'):
+            console_msg += cluster.format_stats(conn_stats['controllers'])
+
+    if template_stats:
+        console_msg += '\n  -- Template: compiled in {:.1f} ms, {} rows ' \
+                       'rendered in {:.1f} ms'.format(
+                           template_stats['compile_time'] * 1000,
+                           template_stats['renders'],
+                           template_stats['render_time'] * 1000)
+
+    if trace_stats:
+        console_msg += tracing.format_summary(trace_stats)
+
+    failed = sorted(failed, key=excel.split_address)
+    if failed:
+        console_msg += '\n\nThe following rows from table {} experienced ' \
+                       'a problem'.format(table_name)
+        for cell in failed:
+            console_msg += '\n -- Row: {} did not post properly'.format(cell)
+    console_msg += '\n\nResults written to: {}'.format(_results_file)
+    update_console(msg=console_msg)
@@ -0,0 +1,187 @@
+import datetime
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+# Every push run is journaled to a file in this folder, None to not keep
+# a journal
+JOURNAL_FOLDER = os.path.join(os.path.expanduser('~'), '.acixl_journal')
+
+# Max number of seconds between two syncs of the journal to disk
+FSYNC_INTERVAL = 1
+
+
+def get_payload_hash(payload):
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+class Journal(object):
+    """
+    Append-only journal of a push run, one json object per line. The first
+    line describes the run, every other line holds the status of a row:
+
+        {"cmd": "tenants", "row": 0, "cell": "$A$37", "dn": "uni/tn-a",
+         "hash": "<sha1 of the payload>", "status": 200}
+
+    A line is written as soon as the status of its row is known, so the
+    journal shows which rows made it even if the push is interrupted.
+    """
+    def __init__(self, fname, cmds, apic='', incremental=None):
+        self.fname = fname
+        self.lock = threading.Lock()
+        self.last_sync = time.time()
+        self.f = open(fname, 'a')
+        self.write({'run': datetime.datetime.now().isoformat(
+                        timespec='seconds'),
+                    'apic': apic,
+                    'cmds': list(cmds),
+                    'incremental': incremental})
+
+    def write(self, entry):
+        with self.lock:
+            self.f.write(json.dumps(entry) + '\n')
+            self.f.flush()
+            if time.time() - self.last_sync >= FSYNC_INTERVAL:
+                os.fsync(self.f.fileno())
+                self.last_sync = time.time()
+
+    def add(self, cmd, row, cell, dn, payload_hash, status):
+        self.write({'cmd': cmd, 'row': row, 'cell': cell, 'dn': dn,
+                    'hash': payload_hash, 'status': status})
+
+    def close(self):
+        with self.lock:
+            if not self.f.closed:
+                self.f.flush()
+                os.fsync(self.f.fileno())
+                self.f.close()
+
+
+def new_journal(cmds, apic='', incremental=None, folder=None, fabric=None):
+    """
+    Start the journal of a push run, the name of the fabric is added to the
+    file name so that the fabrics pushed at the same time have a journal
+    each, see AciHandler.push_to_fabrics()
+
+    Returns:
+        journal(Journal): or None if JOURNAL_FOLDER is not set
+
+    """
+    folder = folder or JOURNAL_FOLDER
+    if not folder:
+        return None
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    fname = os.path.join(folder, 'push-{}-{}{}.jsonl'.format(
+        datetime.datetime.now().strftime('%Y%m%d-%H%M%S'), os.getpid(),
+        get_fabric_suffix(fabric)))
+    return Journal(fname, cmds, apic=apic, incremental=incremental)
+
+
+def get_fabric_suffix(fabric):
+    # the fabric name as it can be used in a file name
+    if not fabric:
+        return ''
+    return '-' + re.sub(r'[^\w.-]', '_', fabric)
+
+
+def get_latest_journal(folder=None, controllers=None):
+    """
+    Get the journal of the last push run
+
+    Args:
+        folder(str, optional): defaults to JOURNAL_FOLDER
+        controllers(list, optional): only the runs against one of these
+        APIC controllers, or that did not record their APIC
+
+    Returns:
+        fname(str): or None if there is no journal
+
+    """
+    folder = folder or JOURNAL_FOLDER
+    fnames = glob.glob(os.path.join(folder or '', 'push-*.jsonl'))
+    if controllers is not None:
+        fnames = [fname for fname in fnames
+                  if is_run_of(next(read_journal(fname), {}), controllers)]
+    if not fnames:
+        return None
+    return max(fnames, key=os.path.getmtime)
+
+
+def is_run_of(run, controllers):
+    return not run.get('apic') or run['apic'] in controllers
+
+
+def read_journal(fname):
+    """
+    Generator that yields the entries of a journal, the first one describes
+    the run and the others hold the status of a row
+    """
+    with open(fname, 'r') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # the last line of an interrupted run may be cut short
+                continue
+
+
+class ResumeState(object):
+    """
+    The outcome of each row of a journaled push run, used to push only the
+    rows that are not done. A row is done if it was posted successfully
+    and its payload has not changed since. The rows are matched on their
+    DN and payload hash, as several rows can post to the same DN, i.e. the
+    bd_subnet rows of a BD.
+
+    Args:
+        fname(str): journal of the run to resume
+        failed_only(bool): only post the rows that were posted and failed,
+        the rows the run did not get to are left alone
+
+    """
+    def __init__(self, fname, failed_only=False):
+        self.fname = fname
+        self.failed_only = failed_only
+        self.run = {}
+        self.rows = {}
+        # the status cells the run got to, for each DN
+        self.cells = set()
+        for entry in read_journal(fname):
+            if 'run' in entry:
+                self.run = entry
+            else:
+                self.rows[(entry['cmd'], entry['dn'], entry['hash'])] = \
+                    entry['status']
+                self.cells.add((entry['cmd'], entry['cell'], entry['dn']))
+
+    @property
+    def cmds(self):
+        return self.run.get('cmds', [])
+
+    @property
+    def incremental(self):
+        return self.run.get('incremental')
+
+    def get_status(self, cmd, dn, payload_hash):
+        """
+        Returns:
+            status(int): of the row in the journal, or None if the run did
+            not post this payload to the DN
+
+        """
+        return self.rows.get((cmd, dn, payload_hash))
+
+    def is_reached(self, cmd, cell, dn, payload_hash):
+        """
+        Returns:
+            bool: True if the run got to the row, even if its payload has
+            changed since
+
+        """
+        return (cmd, dn, payload_hash) in self.rows or \
+            (cmd, cell, dn) in self.cells
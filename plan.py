@@ -0,0 +1,133 @@
+import datetime
+import gzip
+import json
+from collections import OrderedDict
+
+
+def open_plan(fname, mode='r'):
+    # plans whose name ends with .gz are compressed
+    if fname.endswith('.gz'):
+        return gzip.open(fname, mode + 't')
+    return open(fname, mode)
+
+
+class PlanWriter(object):
+    """
+    Writes a push plan, the rendered rows of a set of commands in the order
+    they are pushed, so that the push can be reviewed and then replayed
+    without reading the workbook or rendering the templates. The plan is
+    one json object per line:
+
+        {"plan": "<created>", "steps": [{"level": 0, "worksheet_name": ..,
+         "cmds": ["tenants"]}, ..], "commands": {"tenants": {<launcher>}}}
+        {"step": 0, "cmd": "tenants", "row": 0, "cell": "$A$37",
+         "dn": "uni/tn-a", "payload": "{..}"}
+        ..
+        {"end": {"tenants": 2}}
+
+    The objects of an expanded row also hold "source": [row, objects], the
+    row of the table and its number of objects. The last line holds the
+    number of rows of each command, a plan without it was not written
+    completely.
+    """
+    def __init__(self, fname, steps, commands):
+        self.fname = fname
+        self.counts = OrderedDict((cmd, 0) for step in steps
+                                  for cmd in step['cmds'])
+        self.last_source = None
+        self.f = open_plan(fname, 'w')
+        self.write({'plan': datetime.datetime.now().isoformat(
+                        timespec='seconds'),
+                    'steps': steps,
+                    'commands': commands})
+
+    def write(self, entry):
+        self.f.write(json.dumps(entry) + '\n')
+
+    def add(self, step, cmd, row, cell, dn, payload, source=None,
+            objects=None):
+        entry = {'step': step, 'cmd': cmd, 'row': row, 'cell': cell,
+                 'dn': dn, 'payload': payload}
+        # the objects of an expanded row are counted as one row
+        if source is None or (cmd, source) != self.last_source:
+            self.counts[cmd] += 1
+        if source is not None:
+            entry['source'] = [source, objects]
+            self.last_source = (cmd, source)
+        self.write(entry)
+
+    def close(self):
+        self.write({'end': self.counts})
+        self.f.close()
+
+    def abort(self):
+        # the plan is left without its last line, so it can not be replayed
+        self.f.close()
+
+
+class Plan(object):
+    """
+    A push plan written by PlanWriter. The header and the row counts are
+    read when the plan is opened, the rows are streamed from the file by
+    iter_steps().
+
+    Raises:
+        ValueError: if the plan is not complete
+    """
+    def __init__(self, fname):
+        self.fname = fname
+        self.header = {}
+        self.counts = None
+        with open_plan(fname) as f:
+            for line in f:
+                if line.startswith('{"step"'):
+                    continue
+                entry = json.loads(line, object_pairs_hook=OrderedDict)
+                if 'plan' in entry:
+                    self.header = entry
+                elif 'end' in entry:
+                    self.counts = entry['end']
+        if not self.header or self.counts is None:
+            raise ValueError('{} is not a complete push plan'.format(fname))
+
+    @property
+    def steps(self):
+        return self.header['steps']
+
+    @property
+    def commands(self):
+        return self.header['commands']
+
+    def iter_entries(self):
+        with open_plan(self.fname) as f:
+            for line in f:
+                if line.startswith('{"step"'):
+                    yield json.loads(line)
+
+    def iter_steps(self):
+        """
+        Generator that yields each step of the plan as (step, entries),
+        entries yields the rows of the step and has to be used up before
+        the next step is taken
+        """
+        entries = self.iter_entries()
+        pending = [next(entries, None)]
+
+        def take(index):
+            while pending[0] is not None and pending[0]['step'] == index:
+                yield pending[0]
+                pending[0] = next(entries, None)
+
+        for index, step in enumerate(self.steps):
+            yield step, take(index)
+
+
+def get_plan_summary(plan):
+    """
+    Format the commands of a plan and their number of rows for the console
+    """
+    console_msg = 'Push plan: {}'.format(plan.fname)
+    for step in plan.steps:
+        for cmd in step['cmds']:
+            console_msg += '\n  -- {}: {} rows'.format(cmd, plan.counts[cmd])
+    return console_msg
@@ -0,0 +1,170 @@
+import re
+import string
+import time
+
+# Check the references of the rows to the objects of other tables before
+# they are pushed, see 'references' in launcher.json
+CHECK_REFERENCES = True
+
+# Look up the referenced objects that are not in the workbook on the APIC,
+# with one class query per class. Set to False to only accept references
+# to objects in the workbook.
+APIC_SNAPSHOT = True
+
+# Seconds the DNs of a class fetched from the APIC are re-used for
+SNAPSHOT_TTL = 300
+
+# Query template used to fetch the DNs of a class, under jsondata/Query
+SNAPSHOT_QUERY_FILE = 'dn_query.json'
+
+# Objects referenced by name are also looked up in tenant common, as the
+# APIC does
+COMMON_TENANT = 'uni/tn-common'
+
+ROOT_CLASS = re.compile(r'"(\w+)"\s*:')
+
+# DNs fetched from the APIC, by (apic, cls): (time, dns)
+_snapshots = {}
+
+
+def get_root_class(source):
+    """
+    Get the class of the root object of a payload template, i.e. fvCtx
+
+    Returns:
+        cls(str): or None if the template has no json object
+    """
+    match = ROOT_CLASS.search(source)
+    return match.group(1) if match else None
+
+
+def get_reference_dn(json_uri, row_data, column):
+    """
+    Build the DN a column of a row refers to, from the json_uri of the
+    referenced command. The last placeholder of the json_uri takes the
+    value of the column, the others the columns of the same name, i.e.
+    'mo/uni/tn-{tn_name}/ctx-{vrf_name}' with vrf_name from the column.
+
+    Returns:
+        dn(str): or None if the column is empty or the row does not have
+        the other columns
+
+    """
+    value = row_data.get(column)
+    if value in (None, ''):
+        return None
+    fields = [field for _, field, _, _ in string.Formatter().parse(json_uri)
+              if field]
+    if not fields:
+        return None
+    values = dict(row_data)
+    values[fields[-1]] = value
+    try:
+        dn = json_uri.format(**values)
+    except (KeyError, IndexError):
+        return None
+    if dn.startswith('mo/'):
+        dn = dn[len('mo/'):]
+    return dn
+
+
+def get_common_dn(dn):
+    # i.e. uni/tn-a/ctx-b -> uni/tn-common/ctx-b
+    return '/'.join([COMMON_TENANT] + dn.split('/')[2:])
+
+
+def is_deleted(row_data):
+    return 'deleted' in str(row_data.get('action', ''))
+
+
+def get_snapshot(apic, cls):
+    entry = _snapshots.get((apic, cls))
+    if entry and time.time() - entry[0] < SNAPSHOT_TTL:
+        return entry[1]
+    return None
+
+
+def set_snapshot(apic, cls, dns):
+    _snapshots[(apic, cls)] = (time.time(), dns)
+
+
+class ReferenceIndex(object):
+    """
+    The objects the rows of a push may refer to: the DNs created or
+    deleted by the rows of the workbook tables, and the DNs on the APIC of
+    their classes. Every reference of a row is resolved against it before
+    the row is rendered, so that a row with a dangling reference is never
+    posted.
+
+    Args:
+        references(dict): k,v, k=command and v=its 'references' from
+        launcher.json, {column: referenced command}
+
+    """
+    def __init__(self, references):
+        self.references = references
+        # DN: True if a row of the workbook creates it, False if deleted
+        self.workbook = {}
+        # DNs on the APIC, by class, None if they could not be fetched
+        self.apic = {}
+        # class and json_uri of the referenced commands
+        self.targets = {}
+
+    def add_target(self, cmd, cls, json_uri):
+        self.targets[cmd] = (cls, json_uri)
+
+    def add_row(self, dn, row_data):
+        # a row that deletes the object wins over one that creates it
+        self.workbook[dn] = self.workbook.get(dn, True) and \
+            not is_deleted(row_data)
+
+    def remove(self, dn):
+        # the row that creates the object is not pushed, the object may
+        # still exist on the APIC
+        self.workbook.pop(dn, None)
+
+    def add_snapshot(self, cls, dns):
+        self.apic[cls] = dns
+
+    def exists(self, dn, cls):
+        """
+        Returns:
+            bool: True if the object exists or is created by the workbook,
+            None if it is not known, i.e. the APIC could not be queried
+
+        """
+        if dn in self.workbook:
+            return self.workbook[dn]
+        if cls not in self.apic:
+            return False
+        if self.apic[cls] is None:
+            return None
+        return dn in self.apic[cls]
+
+    def find_missing(self, cmd, row_data):
+        """
+        Find the references of a row to objects that do not exist, a row
+        that deletes its object has no references
+
+        Returns:
+            missing (list): the DNs that can not be found, empty if every
+            reference can be resolved
+
+        """
+        if is_deleted(row_data):
+            return []
+        missing = []
+        for column, target in self.references.get(cmd, {}).items():
+            if target not in self.targets:
+                continue
+            cls, json_uri = self.targets[target]
+            dn = get_reference_dn(json_uri, row_data, column)
+            if dn is None:
+                continue
+            found = self.exists(dn, cls)
+            if found is False and dn.startswith('uni/tn-') and \
+                    not dn.startswith(COMMON_TENANT + '/'):
+                found = self.exists(get_common_dn(dn), cls)
+            if found is False:
+                missing.append(dn)
+        return missing
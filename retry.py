@@ -0,0 +1,128 @@
+import random
+import threading
+
+# Status codes that are posted again: throttled by the APIC, server errors
+# and 999, used when there was no answer at all (timeout, connection reset)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504, 999)
+
+# Status codes the APIC answers with when it is throttling requests
+THROTTLE_STATUS_CODES = (429, 503)
+
+# Max number of times a post is retried, and the max number of retries for
+# all the rows of a command push, so a fabric that is down does not make
+# every row wait for its own retries
+MAX_RETRIES = 3
+RETRY_BUDGET = 100
+
+# Backoff before a retry is a random time between 0 and
+# BACKOFF_BASE * 2^attempt seconds, capped at BACKOFF_MAX
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+
+# Posts slower than this (seconds) lower the number of posts in flight
+# when the adaptive mode is on
+LATENCY_TARGET = 2.0
+
+
+class RetryPolicy(object):
+    """
+    Retry settings of a command push, with the budget of retries that is
+    shared by all of its rows
+    """
+    def __init__(self, max_retries=MAX_RETRIES, budget=RETRY_BUDGET,
+                 timeout=None, backoff_base=BACKOFF_BASE,
+                 backoff_max=BACKOFF_MAX, adaptive=False):
+        self.max_retries = max_retries
+        self.budget = budget
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.adaptive = adaptive
+        self.lock = threading.Lock()
+        self.retries = 0
+
+    def should_retry(self, status, attempt):
+        """
+        Check whether a post should be sent again, a retry is taken from
+        the budget if it is
+
+        Args:
+            status(int): status of the last attempt
+            attempt(int): number of retries done so far for the post
+
+        """
+        if status not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+            return False
+        with self.lock:
+            if self.retries >= self.budget:
+                return False
+            self.retries += 1
+        return True
+
+    def get_delay(self, attempt):
+        """
+        Get the time to wait before a retry, exponential backoff with full
+        jitter so that the posts that failed together are not all sent
+        again at the same time
+        """
+        return random.uniform(0, min(self.backoff_max,
+                                     self.backoff_base * 2 ** attempt))
+
+
+class AdaptiveLimiter(object):
+    """
+    Limits the number of posts in flight to an APIC. The limit is halved
+    when the APIC throttles a post or answers slower than latency_target,
+    and raised by one again after a full window of posts (limit posts)
+    that were answered in time.
+    """
+    def __init__(self, max_limit, min_limit=1,
+                 latency_target=LATENCY_TARGET):
+        self.condition = threading.Condition()
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.latency_target = latency_target
+        self.limit = max_limit
+        self.lowest = max_limit
+        self.in_flight = 0
+        self.successes = 0
+
+    def set_max_limit(self, max_limit):
+        with self.condition:
+            self.limit = max(self.min_limit,
+                             self.limit + max_limit - self.max_limit)
+            self.max_limit = max_limit
+            self.condition.notify_all()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= self.limit:
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, status, latency):
+        """
+        Release a post that has been answered, and adjust the limit
+
+        Returns:
+            bool: True if the limit was lowered
+
+        """
+        lowered = False
+        with self.condition:
+            self.in_flight -= 1
+            if status in THROTTLE_STATUS_CODES or \
+                    latency > self.latency_target:
+                self.successes = 0
+                if self.limit > self.min_limit:
+                    self.limit = max(self.min_limit, self.limit // 2)
+                    self.lowest = min(self.lowest, self.limit)
+                    lowered = True
+            elif status not in RETRY_STATUS_CODES:
+                self.successes += 1
+                if self.successes >= self.limit and \
+                        self.limit < self.max_limit:
+                    self.limit += 1
+                    self.successes = 0
+            self.condition.notify_all()
+        return lowered
@@ -0,0 +1,310 @@
+import datetime
+import glob
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import diff
+import journal
+from coalesce import split_dn
+
+# The rollback set of every push run that captures pre-images is written to
+# a file in this folder, None to not capture them
+ROLLBACK_FOLDER = os.path.join(os.path.expanduser('~'), '.acixl_rollback')
+
+# Rows whose pre-images are fetched together, the rows of a chunk are only
+# posted once its pre-images are known
+CAPTURE_CHUNK_SIZE = 200
+
+# Objects posted in parallel by a rollback
+MAX_IN_FLIGHT = 4
+
+# Actions of a rollback set: objects that did not exist before the push are
+# deleted, the others are put back as they were
+ACTION_DELETE = 'delete'
+ACTION_RESTORE = 'restore'
+
+
+def clean(body):
+    """
+    Copy an MO body returned by the APIC so that it can be posted back,
+    without its status and empty dn/rn
+    """
+    attributes = OrderedDict(
+        (key, value) for key, value in body.get('attributes', {}).items()
+        if key != 'status' and not (key in ('dn', 'rn') and not value))
+    cleaned = OrderedDict([('attributes', attributes)])
+    children = [{cls: clean(child[cls])} for child in body.get('children', [])
+                for cls in child]
+    if children:
+        cleaned['children'] = children
+    return cleaned
+
+
+def find_existing(current, cls, body):
+    """
+    Find the current child MO that a child of the payload refers to, see
+    diff.find_child(). A child whose rn is not returned by the APIC is
+    matched by the end of its dn.
+    """
+    existing = diff.find_child(current, cls, body)
+    rn = body.get('attributes', {}).get('rn')
+    if existing is not None or not rn:
+        return existing
+    for child in current.get('children', []):
+        dn = child.get(cls, {}).get('attributes', {}).get('dn', '')
+        if dn.endswith('/' + rn):
+            return child[cls]
+    return None
+
+
+def restore_node(body, current):
+    """
+    Build the body that puts an object of a payload back as it is on the
+    APIC. Only the attributes and children set by the payload are kept, so
+    that the rollback set stays small and the rollback does not touch
+    anything the push did not change.
+
+    Args:
+        body(dict): object from the payload, {'attributes':.., 'children':..}
+        current(dict): the same object as returned by the APIC before the
+        push
+
+    Returns:
+        restore (OrderedDict): the body to post
+
+    """
+    current_attributes = current.get('attributes', {})
+    attributes = OrderedDict((key, current_attributes[key])
+                             for key in ('dn', 'rn')
+                             if current_attributes.get(key))
+    for key in body.get('attributes', {}):
+        if key not in diff.IGNORED_ATTRIBUTES and key in current_attributes:
+            attributes[key] = current_attributes[key]
+
+    children = []
+    for child in body.get('children', []):
+        cls = list(child)[0]
+        existing = find_existing(current, cls, child[cls])
+        if existing is None:
+            # created by the push, unless the push deleted it
+            if not diff.is_deleted(child[cls]):
+                identity = OrderedDict(
+                    (key, value) for key, value in
+                    child[cls].get('attributes', {}).items()
+                    if key != 'status')
+                identity['status'] = 'deleted'
+                children.append({cls: {'attributes': identity}})
+        elif diff.is_deleted(child[cls]):
+            children.append({cls: clean(existing)})
+        else:
+            children.append({cls: restore_node(child[cls], existing)})
+
+    restore = OrderedDict([('attributes', attributes)])
+    if children:
+        restore['children'] = children
+    return restore
+
+
+def get_restore_payload(dn, payload, current):
+    """
+    Build the payload that undoes a row, from its rendered payload and the
+    state of its DN before the push
+
+    Args:
+        dn(str): DN the row is posted to
+        payload(str): rendered payload of the row
+        current(dict): MO body of the DN before the push, with its subtree,
+        None if the DN did not exist
+
+    Returns:
+        (action, payload): ACTION_DELETE or ACTION_RESTORE and the payload
+        to post, or (None, None) if the payload can not be parsed
+
+    """
+    cls, body = diff.get_root(payload)
+    if not cls:
+        return None, None
+    if current is None:
+        return ACTION_DELETE, json.dumps(
+            {cls: {'attributes': {'dn': dn, 'status': 'deleted'}}})
+    if diff.is_deleted(body):
+        restore = clean(current)
+    else:
+        restore = restore_node(body, current)
+    restore['attributes']['dn'] = dn
+    return ACTION_RESTORE, json.dumps({cls: restore})
+
+
+class RollbackSet(object):
+    """
+    The payloads that undo a push run, one json object per line. The first
+    line describes the run, every other line undoes a row:
+
+        {"cmd": "tenants", "dn": "uni/tn-a", "action": "delete",
+         "payload": "{..}"}
+
+    A line is written once the row has been posted, rows the APIC rejected
+    are left out. Rows with the same undo payload, i.e. the rows of a
+    bd_subnet table that create the same BD, are written once.
+    """
+    def __init__(self, fname, cmds, apic=''):
+        self.fname = fname
+        self.lock = threading.Lock()
+        self.payloads = set()
+        self.count = 0
+        self.f = open(fname, 'a')
+        self.write({'run': datetime.datetime.now().isoformat(
+                        timespec='seconds'),
+                    'apic': apic,
+                    'cmds': list(cmds)})
+
+    def write(self, entry):
+        with self.lock:
+            self.f.write(json.dumps(entry) + '\n')
+            self.f.flush()
+
+    def add(self, cmd, dn, action, payload):
+        if payload in self.payloads:
+            return
+        self.payloads.add(payload)
+        self.count += 1
+        self.write({'cmd': cmd, 'dn': dn, 'action': action,
+                    'payload': payload})
+
+    def close(self):
+        with self.lock:
+            if not self.f.closed:
+                self.f.close()
+
+
+def new_rollback_set(cmds, apic='', folder=None, fabric=None):
+    """
+    Start the rollback set of a push run, the name of the fabric is added
+    to the file name, see journal.new_journal()
+
+    Returns:
+        rollback_set(RollbackSet): or None if ROLLBACK_FOLDER is not set
+
+    """
+    folder = folder or ROLLBACK_FOLDER
+    if not folder:
+        return None
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    fname = os.path.join(folder, 'rollback-{}-{}{}.jsonl'.format(
+        datetime.datetime.now().strftime('%Y%m%d-%H%M%S'), os.getpid(),
+        journal.get_fabric_suffix(fabric)))
+    return RollbackSet(fname, cmds, apic=apic)
+
+
+def get_latest_rollback_set(folder=None, controllers=None):
+    """
+    Get the rollback set of the last push run that captured pre-images
+
+    Args:
+        folder(str, optional): defaults to ROLLBACK_FOLDER
+        controllers(list, optional): only the runs against one of these
+        APIC controllers, or that did not record their APIC
+
+    Returns:
+        fname(str): or None if there is no rollback set
+
+    """
+    folder = folder or ROLLBACK_FOLDER
+    fnames = glob.glob(os.path.join(folder or '', 'rollback-*.jsonl'))
+    if controllers is not None:
+        fnames = [fname for fname in fnames if journal.is_run_of(
+            next(journal.read_journal(fname), {}), controllers)]
+    if not fnames:
+        return None
+    return max(fnames, key=os.path.getmtime)
+
+
+def read_rollback_set(fname):
+    """
+    Read a rollback set, the last line of an interrupted run may be cut
+    short and is left out
+
+    Returns:
+        (run, entries): the description of the run, and the entries that
+        undo its rows
+
+    """
+    run = {}
+    entries = []
+    with open(fname, 'r') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if 'run' in entry:
+                run = entry
+            else:
+                entries.append(entry)
+    return run, entries
+
+
+def get_levels(entries):
+    """
+    Order the entries of a rollback set so that no object is put back
+    before its parent, the reverse of the push. The objects created by the
+    push are deleted first, children before parents, then the objects that
+    were changed or deleted are restored, parents before children.
+
+    An object deleted by the rollback did not exist before the push, the
+    entries that restore it or its children, i.e. the bd_subnet rows of a
+    BD created by the push, are left out.
+
+    Returns:
+        levels (list): lists of entries, the entries of a level can be
+        posted in parallel
+
+    """
+    deleted = set(entry['dn'] for entry in entries
+                  if entry['action'] == ACTION_DELETE)
+    deletes = OrderedDict()
+    restores = OrderedDict()
+    for entry in entries:
+        rns = split_dn(entry['dn'])
+        if entry['action'] == ACTION_DELETE:
+            levels = deletes
+        elif any('/'.join(rns[:i]) in deleted
+                 for i in range(1, len(rns) + 1)):
+            continue
+        else:
+            levels = restores
+        levels.setdefault(len(rns), []).append(entry)
+    return ([deletes[depth] for depth in sorted(deletes, reverse=True)] +
+            [restores[depth] for depth in sorted(restores)])
+
+
+def get_rollback_summary(fname, results):
+    """
+    Format the outcome of a rollback for the console
+
+    Args:
+        fname(str): the rollback set
+        results(list): (entry, status) for every entry of the set
+
+    """
+    counts = OrderedDict()
+    failed = []
+    for entry, status in results:
+        cmd_counts = counts.setdefault(entry['cmd'], OrderedDict(
+            [(ACTION_DELETE, 0), (ACTION_RESTORE, 0), ('failed', 0)]))
+        if status == 200:
+            cmd_counts[entry['action']] += 1
+        else:
+            cmd_counts['failed'] += 1
+            failed.append('{} ({})'.format(entry['dn'], status))
+    console_msg = 'Rollback of {}:'.format(fname)
+    for cmd, cmd_counts in counts.items():
+        console_msg += '\n  -- {}: {} deleted, {} restored, {} failed'.format(
+            cmd, cmd_counts[ACTION_DELETE], cmd_counts[ACTION_RESTORE],
+            cmd_counts['failed'])
+    if failed:
+        console_msg += '\n  -- Failed: {}'.format(', '.join(failed))
+    return console_msg
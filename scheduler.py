@@ -0,0 +1,88 @@
+import re
+from collections import OrderedDict
+from coalesce import split_dn
+
+
+def get_uri_pattern(json_uri):
+    """
+    Get the rns of a launcher.json uri with the placeholders replaced by
+    '*', i.e. 'mo/uni/tn-{tn_name}/BD-{bd_name}' -> ['uni', 'tn-*', 'BD-*']
+    """
+    if json_uri.startswith('mo/'):
+        json_uri = json_uri[len('mo/'):]
+    return [re.sub(r'\{[^}]*\}', '*', rn) for rn in split_dn(json_uri)]
+
+
+def get_dependencies(launcher_data, cmds):
+    """
+    Work out which commands have to be pushed before each command. A
+    command depends on the commands whose uri is a parent of its own uri,
+    i.e. 'bridge_domains' (tn-{tn_name}/BD-{bd_name}) depends on 'tenants'
+    (tn-{tn_name}). Extra dependencies can be listed in launcher.json with
+    the 'depends_on' key of a command.
+
+    Args:
+        launcher_data(dict): data from launcher.json
+        cmds(list): the commands that are being pushed
+
+    Returns:
+        dependencies (dict): k,v, k=command and v=set of commands
+
+    """
+    patterns = dict((cmd, get_uri_pattern(launcher_data[cmd]['json_uri']))
+                    for cmd in cmds)
+    dependencies = OrderedDict()
+    for cmd in cmds:
+        dependencies[cmd] = set()
+        for other in cmds:
+            parent = patterns[other]
+            if len(parent) < len(patterns[cmd]) and \
+                    patterns[cmd][:len(parent)] == parent:
+                dependencies[cmd].add(other)
+        for other in launcher_data[cmd].get('depends_on', []):
+            if other in cmds and other != cmd:
+                dependencies[cmd].add(other)
+    return dependencies
+
+
+def get_levels(launcher_data, cmds):
+    """
+    Split the commands into levels, every command only depends on commands
+    from the levels before its own, so the commands of a level can be
+    pushed at the same time. Commands that are part of a dependency loop
+    are pushed in the last level.
+
+    Args:
+        launcher_data(dict): data from launcher.json
+        cmds(list): the commands that are being pushed
+
+    Returns:
+        levels (list): list of lists of commands, in push order
+
+    """
+    dependencies = get_dependencies(launcher_data, cmds)
+    levels = []
+    done = set()
+    while len(done) < len(dependencies):
+        level = [cmd for cmd in dependencies
+                 if cmd not in done and dependencies[cmd] <= done]
+        if not level:
+            level = [cmd for cmd in dependencies if cmd not in done]
+        levels.append(level)
+        done.update(level)
+    return levels
+
+
+def group_by_worksheet(launcher_data, cmds):
+    """
+    Group the commands of a level by the worksheet that holds their table
+
+    Returns:
+        groups (list): (worksheet_name, cmds) tuples
+
+    """
+    groups = OrderedDict()
+    for cmd in cmds:
+        worksheet_name = launcher_data[cmd].get('worksheet_name')
+        groups.setdefault(worksheet_name, []).append(cmd)
+    return list(groups.items())
@@ -0,0 +1,123 @@
+import os
+import time
+import jinja2
+from jinja2 import meta
+
+# Folder for the compiled template bytecode, None to keep it in memory only
+BYTECODE_CACHE_FOLDER = None
+
+_registries = {}
+
+
+class TimedTemplate(object):
+    """
+    Wraps a jinja2 template to record how long each render takes
+    """
+    def __init__(self, template, stats):
+        self.template = template
+        self.stats = stats
+
+    def render(self, *args, **kwargs):
+        start = time.perf_counter()
+        output = self.template.render(*args, **kwargs)
+        self.stats['render_time'] += time.perf_counter() - start
+        self.stats['renders'] += 1
+        return output
+
+
+class TemplateRegistry(object):
+    """
+    Compiled jsondata templates, shared by every command. A template is
+    compiled the first time it is used (or by precompile()) and is only
+    compiled again when the mtime of its file changes.
+    """
+    def __init__(self, root, bytecode_cache_folder=BYTECODE_CACHE_FOLDER):
+        self.root = root
+        bytecode_cache = None
+        if bytecode_cache_folder:
+            if not os.path.isdir(bytecode_cache_folder):
+                os.makedirs(bytecode_cache_folder)
+            bytecode_cache = jinja2.FileSystemBytecodeCache(
+                bytecode_cache_folder)
+        self.env = jinja2.Environment(loader=jinja2.FileSystemLoader(root),
+                                      bytecode_cache=bytecode_cache,
+                                      auto_reload=True)
+        self.templates = {}
+        self.variables = {}
+        self.stats = {}
+
+    def get_template(self, json_folder, json_file):
+        """
+        Get the compiled template for a payload file
+
+        Args:
+            json_folder(str): sub directory under the jsondata folder
+            json_file(str): file name of the payload
+
+        Returns:
+            template(TimedTemplate): the compiled template
+
+        """
+        name = '{}/{}'.format(json_folder, json_file)
+        mtime = os.path.getmtime(os.path.join(self.root, json_folder,
+                                              json_file))
+        cached = self.templates.get(name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        stats = self.stats.setdefault(name, {'compiles': 0,
+                                             'compile_time': 0.0,
+                                             'renders': 0,
+                                             'render_time': 0.0})
+        start = time.perf_counter()
+        template = TimedTemplate(self.env.get_template(name), stats)
+        stats['compile_time'] += time.perf_counter() - start
+        stats['compiles'] += 1
+        self.templates[name] = (mtime, template)
+        return template
+
+    def precompile(self, launcher_data):
+        """
+        Compile every template listed in launcher.json. Missing templates
+        are skipped, they are reported when the command is pushed.
+        """
+        for cmd in launcher_data:
+            try:
+                self.get_template(launcher_data[cmd]['json_folder'],
+                                  launcher_data[cmd]['json_file'])
+            except (OSError, KeyError, jinja2.TemplateError):
+                continue
+
+    def get_variables(self, json_folder, json_file):
+        """
+        Get the variables a payload file expects from its table, i.e. the
+        {{ }} values that are not set by the template itself. They are
+        parsed again only when the mtime of the file changes.
+
+        Returns:
+            variables (set): variable names
+
+        """
+        name = '{}/{}'.format(json_folder, json_file)
+        mtime = os.path.getmtime(os.path.join(self.root, json_folder,
+                                              json_file))
+        cached = self.variables.get(name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        source = self.env.loader.get_source(self.env, name)[0]
+        variables = meta.find_undeclared_variables(self.env.parse(source))
+        self.variables[name] = (mtime, variables)
+        return variables
+
+    def get_stats(self, json_folder, json_file):
+        return self.stats.get('{}/{}'.format(json_folder, json_file))
+
+
+def get_registry(root):
+    """
+    Get the template registry for a jsondata folder, it is created once
+    and then shared for the lifetime of the process.
+    """
+    if root not in _registries:
+        _registries[root] = TemplateRegistry(root)
+    return _registries[root]
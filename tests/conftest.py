@@ -0,0 +1,25 @@
+import os
+import sys
+import pytest
+
+# the modules of this package import each other by name, i.e. 'import excel'
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import aci
+import benchmark
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    """
+    AciHandler of the launcher.json and jsondata of the repo, with the
+    in-memory backend of the benchmark. It is not logged in, nothing is
+    posted.
+    """
+    monkeypatch.setattr(aci, 'LAUNCHER_FILE',
+                        os.path.join(ROOT, 'launcher.json'))
+    monkeypatch.setattr(aci, 'JSON_ROOT_FOLDER',
+                        os.path.join(ROOT, 'jsondata') + os.sep)
+    backend = benchmark.FakeExcel(apic='127.0.0.1')
+    return aci.AciHandler(apic='127.0.0.1', backend=backend)
@@ -0,0 +1,57 @@
+import json
+import coalesce
+
+URI = 'https://apic/api/node/mo/{}.json'
+
+
+def test_split_dn():
+    assert coalesce.split_dn('uni/tn-a/BD-b/subnet-[10.0.0.1/24]') == \
+        ['uni', 'tn-a', 'BD-b', 'subnet-[10.0.0.1/24]']
+    assert coalesce.split_dn('uni/infra/vlanns-[pool/a]-static') == \
+        ['uni', 'infra', 'vlanns-[pool/a]-static']
+
+
+def test_uri_to_dn():
+    assert coalesce.uri_to_dn(URI.format('uni/tn-a')) == 'uni/tn-a'
+
+
+def test_get_parent():
+    payload = json.dumps({'fvBD': {'attributes': {'dn': 'uni/tn-a/BD-b',
+                                                  'name': 'b'}}})
+    parent_dn, child = coalesce.get_parent(URI.format('uni/tn-a/BD-b'),
+                                           payload)
+    assert parent_dn == 'uni/tn-a'
+    assert child == {'fvBD': {'attributes': {'name': 'b', 'rn': 'BD-b'}}}
+
+
+def test_get_parent_of_unknown_class():
+    payload = json.dumps({'fooBar': {'attributes': {}}})
+    assert coalesce.get_parent(URI.format('uni/foo-a/bar-b'), payload) == \
+        (None, None)
+    assert coalesce.get_parent(URI.format('uni/tn-a'), 'not json') == \
+        (None, None)
+
+
+def test_build_batches():
+    rows = [(row, URI.format('uni/tn-{}/BD-{}'.format(tn, row)),
+             json.dumps({'fvBD': {'attributes': {'name': str(row)}}}))
+            for row, tn in enumerate(['a', 'a', 'b', 'a'])]
+    rows.append((4, URI.format('uni/foo-x/bar-y'),
+                 json.dumps({'fooBar': {'attributes': {}}})))
+    batches = list(coalesce.build_batches(rows, batch_size=2))
+    assert [(parent_dn, [item[0] for item in batch])
+            for parent_dn, batch in batches] == [
+        ('uni/tn-a', [0, 1]), (None, [4]), ('uni/tn-b', [2]),
+        ('uni/tn-a', [3])]
+
+
+def test_build_payload_merges_children():
+    children = [{'fvBD': {'attributes': {'rn': 'BD-b'},
+                          'children': [{'fvSubnet': {'attributes': {
+                              'ip': ip}}}]}}
+                for ip in ('10.0.0.1/24', '10.0.1.1/24')]
+    payload = json.loads(coalesce.build_payload('uni/tn-a', children))
+    assert payload['fvTenant']['attributes'] == {'dn': 'uni/tn-a'}
+    bds = payload['fvTenant']['children']
+    assert len(bds) == 1
+    assert len(bds[0]['fvBD']['children']) == 2
@@ -0,0 +1,61 @@
+import json
+import diff
+
+URI = 'https://apic/api/node/mo/{}.json'
+
+
+def get_payload(name, children=None, status=None):
+    attributes = {'dn': 'uni/tn-{}'.format(name), 'name': name}
+    if status:
+        attributes['status'] = status
+    return json.dumps({'fvTenant': {'attributes': attributes,
+                                    'children': children or []}})
+
+
+def test_build_queries():
+    rows = [(row, URI.format('uni/tn-{}'.format(row)), get_payload(str(row)))
+            for row in range(5)]
+    assert diff.build_queries(rows, batch_size=2) == [
+        ('fvTenant', ['uni/tn-0', 'uni/tn-1']),
+        ('fvTenant', ['uni/tn-2', 'uni/tn-3']),
+        ('fvTenant', ['uni/tn-4'])]
+
+
+def test_get_query_filter():
+    assert diff.get_query_filter('fvTenant', ['uni/tn-a']) == \
+        'eq(fvTenant.dn,"uni/tn-a")'
+    assert diff.get_query_filter('fvTenant', ['uni/tn-a', 'uni/tn-b']) == \
+        'or(eq(fvTenant.dn,"uni/tn-a"),eq(fvTenant.dn,"uni/tn-b"))'
+
+
+def test_matches():
+    body = {'attributes': {'name': 'a', 'descr': 'x'},
+            'children': [{'fvCtx': {'attributes': {'rn': 'ctx-v'}}}]}
+    current = {'attributes': {'name': 'a', 'descr': 'x', 'dn': 'uni/tn-a'},
+               'children': [{'fvCtx': {'attributes': {'rn': 'ctx-v'}}}]}
+    assert diff.matches(body, current)
+    current['attributes']['descr'] = 'y'
+    assert not diff.matches(body, current)
+
+
+def test_matches_deleted_child():
+    body = {'attributes': {'name': 'a'},
+            'children': [{'fvCtx': {'attributes': {'rn': 'ctx-v',
+                                                   'status': 'deleted'}}}]}
+    assert diff.matches(body, {'attributes': {'name': 'a'}})
+    assert not diff.matches(body, {
+        'attributes': {'name': 'a'},
+        'children': [{'fvCtx': {'attributes': {'rn': 'ctx-v'}}}]})
+
+
+def test_find_unchanged():
+    rows = [(0, URI.format('uni/tn-a'), get_payload('a')),
+            (1, URI.format('uni/tn-b'), get_payload('b')),
+            (2, URI.format('uni/tn-c'), get_payload('c', status='deleted')),
+            (3, URI.format('uni/tn-d'), get_payload('d')),
+            (4, URI.format('uni/tn-e'), get_payload('e'))]
+    state = {'uni/tn-a': {'attributes': {'name': 'a'}},
+             'uni/tn-b': {'attributes': {'name': 'other'}}}
+    known_dns = {'uni/tn-a', 'uni/tn-b', 'uni/tn-c', 'uni/tn-d'}
+    # tn-d does not exist yet, tn-e could not be looked up
+    assert diff.find_unchanged(rows, state, known_dns) == {0, 2}
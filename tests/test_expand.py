@@ -0,0 +1,66 @@
+import pytest
+import expand
+
+
+def test_parse_value_without_range():
+    assert expand.parse_value('eth1/1') == ['eth1/1']
+    assert expand.parse_value(100) == [100]
+    assert expand.parse_value(None) == [None]
+
+
+def test_parse_value_expands_last_range_of_each_item():
+    assert expand.parse_value('eth1/1-4') == ['eth1/1', 'eth1/2', 'eth1/3',
+                                              'eth1/4']
+    assert expand.parse_value('vlan 100-101,200') == ['vlan 100', 'vlan 101',
+                                                      '200']
+    assert expand.parse_value('eth101-102/1-2') == ['eth101-102/1',
+                                                    'eth101-102/2']
+
+
+def test_parse_value_keeps_leading_zeros():
+    assert expand.parse_value('01-03') == ['01', '02', '03']
+    assert expand.parse_value('node-9-10') == ['node-9', 'node-10']
+
+
+def test_parse_value_range_that_ends_before_it_starts():
+    with pytest.raises(ValueError):
+        expand.parse_value('eth1/4-1')
+
+
+def test_expand_row_pairs_columns():
+    row_data = {'node': '101-102', 'port': 'eth1/1-2', 'tn_name': 'a'}
+    count, rows = expand.expand_row(row_data, ['node', 'port'])
+    assert count == 2
+    assert list(rows) == [
+        {'node': '101', 'port': 'eth1/1', 'tn_name': 'a'},
+        {'node': '102', 'port': 'eth1/2', 'tn_name': 'a'}]
+    # the row itself is left as it is
+    assert row_data['node'] == '101-102'
+
+
+def test_expand_row_repeats_single_value():
+    count, rows = expand.expand_row({'node': '101', 'port': 'eth1/1-3'},
+                                    ['node', 'port'])
+    assert count == 3
+    assert [row['node'] for row in rows] == ['101', '101', '101']
+
+
+def test_expand_row_product():
+    count, rows = expand.expand_row({'node': '101-102', 'port': 'eth1/1-3'},
+                                    ['node', 'port'], product=True)
+    assert count == 6
+    assert [(row['node'], row['port']) for row in rows][:4] == [
+        ('101', 'eth1/1'), ('101', 'eth1/2'), ('101', 'eth1/3'),
+        ('102', 'eth1/1')]
+
+
+def test_expand_row_ranges_of_different_lengths():
+    with pytest.raises(ValueError):
+        expand.expand_row({'node': '101-102', 'port': 'eth1/1-3'},
+                          ['node', 'port'])
+
+
+def test_expand_row_without_columns():
+    count, rows = expand.expand_row({'tn_name': 'a'}, ['missing'])
+    assert count == 1
+    assert list(rows) == [{'tn_name': 'a'}]
@@ -0,0 +1,93 @@
+import os
+import aci
+import journal
+
+
+def write_journal(folder, apic='10.0.0.1', fabric=None):
+    run = journal.new_journal(['tenants', 'vrfs'], apic=apic,
+                              incremental=True, folder=folder,
+                              fabric=fabric)
+    run.add('tenants', 0, '$A$37', 'uni/tn-a', 'hash-a', 200)
+    run.add('tenants', 1, '$A$38', 'uni/tn-b', 'hash-b', 500)
+    run.add('vrfs', 0, '$A$45', 'uni/tn-a/ctx-v', 'hash-v', 304)
+    run.close()
+    return run.fname
+
+
+def test_journal_round_trip(tmp_path):
+    fname = write_journal(str(tmp_path))
+    entries = list(journal.read_journal(fname))
+    assert entries[0]['apic'] == '10.0.0.1'
+    assert entries[0]['cmds'] == ['tenants', 'vrfs']
+    assert entries[1] == {'cmd': 'tenants', 'row': 0, 'cell': '$A$37',
+                          'dn': 'uni/tn-a', 'hash': 'hash-a',
+                          'status': 200}
+    assert len(entries) == 4
+
+
+def test_interrupted_journal(tmp_path):
+    fname = write_journal(str(tmp_path))
+    with open(fname, 'a') as f:
+        f.write('{"cmd": "vrfs", "row": 1, "ce')
+    assert len(list(journal.read_journal(fname))) == 4
+
+
+def test_resume_state(tmp_path):
+    resume = journal.ResumeState(write_journal(str(tmp_path)))
+    assert resume.cmds == ['tenants', 'vrfs']
+    assert resume.incremental is True
+    assert resume.get_status('tenants', 'uni/tn-a', 'hash-a') == 200
+    assert resume.get_status('tenants', 'uni/tn-b', 'hash-b') == 500
+    assert resume.get_status('vrfs', 'uni/tn-a/ctx-v', 'hash-v') == 304
+    # the payload of the row has changed since the run
+    assert resume.get_status('tenants', 'uni/tn-a', 'other') is None
+    assert resume.get_status('vrfs', 'uni/tn-a/ctx-w', 'hash-w') is None
+
+
+def test_resume_state_failed_only(tmp_path):
+    resume = journal.ResumeState(write_journal(str(tmp_path)),
+                                 failed_only=True)
+    assert resume.failed_only
+    assert resume.is_reached('tenants', '$A$38', 'uni/tn-b', 'hash-b')
+    # the run got to the row, its payload has changed since
+    assert resume.is_reached('tenants', '$A$37', 'uni/tn-a', 'other')
+    # the run did not get to the row
+    assert not resume.is_reached('vrfs', '$A$46', 'uni/tn-a/ctx-w',
+                                 'hash-w')
+
+
+def test_resume_skips_done_rows(handler, tmp_path):
+    fname = write_journal(str(tmp_path), apic=handler.apic)
+    table = [(0, {'status_cell': '$A$37', 'action': 'created',
+                  'tn_name': 'a'}),
+             (1, {'status_cell': '$A$38', 'action': 'created',
+                  'tn_name': 'b'}),
+             (2, {'status_cell': '$A$39', 'action': 'created',
+                  'tn_name': 'c'})]
+    push = aci.CommandPush('tenants', handler.launcher.data['tenants'])
+    push.resume = journal.ResumeState(fname)
+    handler.start_push(push, total=len(table))
+    rows = list(handler.read_rows(push, table))
+    push.hashes = {0: 'hash-a', 1: 'hash-b', 2: 'hash-c'}
+    rendered = [(row, 'uri', 'payload') for row, row_data in rows]
+
+    posted = list(handler.skip_done_rows(push, rendered))
+    # the row that was posted keeps its status, the others are posted
+    assert [row for row, uri, payload in posted] == [1, 2]
+    push.writer.flush()
+    assert handler.excel.results['TABLE_TENANT'] == {'$A$37': 200}
+
+
+def test_get_latest_journal(tmp_path):
+    folder = str(tmp_path)
+    assert journal.get_latest_journal(folder=folder) is None
+    fname_a = write_journal(folder, apic='10.0.0.1', fabric='site-a')
+    fname_b = write_journal(folder, apic='10.0.0.2', fabric='site/b')
+    os.utime(fname_a, (1, 1))
+    assert fname_a != fname_b
+    assert os.path.basename(fname_b).endswith('-site_b.jsonl')
+    assert journal.get_latest_journal(folder=folder) == fname_b
+    assert journal.get_latest_journal(folder=folder,
+                                      controllers=['10.0.0.1']) == fname_a
+    assert journal.get_latest_journal(folder=folder,
+                                      controllers=['10.0.0.3']) is None
@@ -0,0 +1,45 @@
+import pytest
+import plan
+
+STEPS = [{'level': 0, 'worksheet_name': 'Tenant_Policies',
+          'cmds': ['tenants']},
+         {'level': 1, 'worksheet_name': 'Tenant_Policies',
+          'cmds': ['vrfs']}]
+COMMANDS = {'tenants': {'table_name': 'TABLE_TENANT'},
+            'vrfs': {'table_name': 'TABLE_VRF'}}
+
+
+def write_plan(fname):
+    writer = plan.PlanWriter(fname, STEPS, COMMANDS)
+    writer.add(0, 'tenants', 0, '$A$37', 'uni/tn-a', '{}')
+    # the objects of an expanded row are counted as one row
+    writer.add(1, 'vrfs', 0, '$A$45', 'uni/tn-a/ctx-1', '{}', source=0,
+               objects=2)
+    writer.add(1, 'vrfs', 1, '$A$45', 'uni/tn-a/ctx-2', '{}', source=0,
+               objects=2)
+    writer.add(1, 'vrfs', 2, '$A$46', 'uni/tn-a/ctx-3', '{}')
+    return writer
+
+
+@pytest.mark.parametrize('name', ['plan.jsonl', 'plan.jsonl.gz'])
+def test_plan_round_trip(tmp_path, name):
+    fname = str(tmp_path / name)
+    write_plan(fname).close()
+
+    push_plan = plan.Plan(fname)
+    assert push_plan.steps == STEPS
+    assert push_plan.commands == COMMANDS
+    assert push_plan.counts == {'tenants': 1, 'vrfs': 2}
+    steps = [(step['cmds'], [entry['dn'] for entry in entries])
+             for step, entries in push_plan.iter_steps()]
+    assert steps == [(['tenants'], ['uni/tn-a']),
+                     (['vrfs'], ['uni/tn-a/ctx-1', 'uni/tn-a/ctx-2',
+                                 'uni/tn-a/ctx-3'])]
+    assert 'vrfs: 2 rows' in plan.get_plan_summary(push_plan)
+
+
+def test_incomplete_plan(tmp_path):
+    fname = str(tmp_path / 'plan.jsonl')
+    write_plan(fname).abort()
+    with pytest.raises(ValueError):
+        plan.Plan(fname)
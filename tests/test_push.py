@@ -0,0 +1,95 @@
+import aci
+
+URI = 'https://127.0.0.1/api/node/mo/{}.json'
+
+
+def start_push(handler, cmd, table, expand_columns=None):
+    push = aci.CommandPush(cmd, handler.launcher.data[cmd])
+    if expand_columns:
+        push.expand_columns = expand_columns
+    handler.start_push(push, total=len(table))
+    return push, list(handler.read_rows(push, table))
+
+
+def get_results(handler, push):
+    push.writer.flush()
+    return handler.excel.results[push.table_name]
+
+
+def test_get_worst_status():
+    assert aci.get_worst_status({'a': 200, 'b': 304}) == 200
+    assert aci.get_worst_status({'a': 304, 'b': 304}) == 304
+    assert aci.get_worst_status({'a': 200, 'b': 500, 'c': 400}) == 500
+
+
+def test_expanded_row_gets_worst_status_of_its_objects(handler):
+    table = [(0, {'status_cell': '$A$37', 'action': 'created',
+                  'tn_name': 'tn1-3'})]
+    push, rows = start_push(handler, 'tenants', table,
+                            expand_columns=['tn_name'])
+    assert [row_data['tn_name'] for key, row_data in rows] == ['tn1', 'tn2',
+                                                               'tn3']
+    assert [push.dns[key] for key, row_data in rows] == [
+        'uni/tn-tn1', 'uni/tn-tn2', 'uni/tn-tn3']
+
+    keys = [key for key, row_data in rows]
+    assert handler.record_status(push, keys[0], 200) is None
+    assert handler.record_status(push, keys[1], 500) is None
+    assert handler.record_status(push, keys[2], 200) == '$A$37'
+    assert get_results(handler, push) == {'$A$37': 500}
+    assert push.counts == {'success': 0, 'failed': 1, 'cancelled': 0}
+    # only the object that failed cancels its children
+    assert push.failed_dns == {'uni/tn-tn2'}
+    assert not push.pending
+
+
+def test_invalid_range_is_recorded_without_objects(handler):
+    table = [(0, {'status_cell': '$A$37', 'action': 'created',
+                  'tn_name': 'tn3-1'}),
+             (1, {'status_cell': '$A$38', 'action': 'created',
+                  'tn_name': 'tn4'})]
+    push, rows = start_push(handler, 'tenants', table,
+                            expand_columns=['tn_name'])
+    assert [row_data['tn_name'] for key, row_data in rows] == ['tn4']
+    assert get_results(handler, push) == {
+        '$A$37': aci.STATUS_INVALID_RANGE}
+
+
+def test_children_of_failed_dns_are_cancelled(handler):
+    table = [(0, {'status_cell': '$A$62', 'action': 'created',
+                  'tn_name': 'a', 'vrf_name': 'v', 'bd_name': 'x'}),
+             (1, {'status_cell': '$A$63', 'action': 'created',
+                  'tn_name': 'b', 'vrf_name': 'v', 'bd_name': 'y'}),
+             (2, {'status_cell': '$A$64', 'action': 'created',
+                  'tn_name': 'ab', 'vrf_name': 'v', 'bd_name': 'z'})]
+    push, rows = start_push(handler, 'bridge_domains', table)
+    rendered = [(row, URI.format(push.dns[row]), '{}')
+                for row, row_data in rows]
+
+    posted = list(handler.cancel_failed_children(push, rendered,
+                                                 {'uni/tn-a'}))
+    assert [row for row, uri, payload in posted] == [1, 2]
+    assert get_results(handler, push) == {'$A$62': aci.STATUS_CANCELLED}
+    assert push.counts['cancelled'] == 1
+
+
+def test_failed_rows_cancel_the_rows_of_the_next_level(handler):
+    table = [(0, {'status_cell': '$A$37', 'action': 'created',
+                  'tn_name': 'a'}),
+             (1, {'status_cell': '$A$38', 'action': 'created',
+                  'tn_name': 'b'})]
+    tenants, rows = start_push(handler, 'tenants', table)
+    handler.record_status(tenants, 0, 400)
+    handler.record_status(tenants, 1, 200)
+    assert tenants.failed_dns == {'uni/tn-a'}
+
+    table = [(0, {'status_cell': '$A$62', 'action': 'created',
+                  'tn_name': 'a', 'vrf_name': 'v', 'bd_name': 'x'}),
+             (1, {'status_cell': '$A$63', 'action': 'created',
+                  'tn_name': 'b', 'vrf_name': 'v', 'bd_name': 'y'})]
+    bds, rows = start_push(handler, 'bridge_domains', table)
+    rendered = [(row, URI.format(bds.dns[row]), '{}')
+                for row, row_data in rows]
+    posted = list(handler.cancel_failed_children(bds, rendered,
+                                                 tenants.failed_dns))
+    assert [row for row, uri, payload in posted] == [1]
@@ -0,0 +1,87 @@
+import references
+
+VRF_URI = 'mo/uni/tn-{tn_name}/ctx-{vrf_name}'
+
+
+def get_index(snapshot=None):
+    index = references.ReferenceIndex({'bridge_domains': {'vrf_name':
+                                                          'vrfs'}})
+    index.add_target('vrfs', 'fvCtx', VRF_URI)
+    index.add_snapshot('fvCtx', snapshot)
+    return index
+
+
+def test_get_root_class():
+    assert references.get_root_class('{"fvCtx": {"attributes": {}}}') == \
+        'fvCtx'
+    assert references.get_root_class('no json') is None
+
+
+def test_get_reference_dn():
+    row_data = {'tn_name': 'a', 'vrf_name': 'v', 'bd_name': 'b'}
+    assert references.get_reference_dn(VRF_URI, row_data, 'vrf_name') == \
+        'uni/tn-a/ctx-v'
+    assert references.get_reference_dn(VRF_URI, {'tn_name': 'a',
+                                                 'vrf_name': ''},
+                                       'vrf_name') is None
+    assert references.get_reference_dn(VRF_URI, {'vrf_name': 'v'},
+                                       'vrf_name') is None
+
+
+def test_find_missing():
+    index = get_index(snapshot={'uni/tn-a/ctx-apic'})
+    index.add_row('uni/tn-a/ctx-book', {'action': 'created'})
+    row_data = {'action': 'created', 'tn_name': 'a', 'bd_name': 'b'}
+    for vrf_name in ('book', 'apic'):
+        row_data['vrf_name'] = vrf_name
+        assert index.find_missing('bridge_domains', row_data) == []
+    row_data['vrf_name'] = 'none'
+    assert index.find_missing('bridge_domains', row_data) == \
+        ['uni/tn-a/ctx-none']
+
+
+def test_find_missing_in_common_tenant():
+    index = get_index(snapshot={'uni/tn-common/ctx-shared'})
+    row_data = {'action': 'created', 'tn_name': 'a', 'bd_name': 'b',
+                'vrf_name': 'shared'}
+    assert index.find_missing('bridge_domains', row_data) == []
+
+
+def test_deleted_rows():
+    index = get_index(snapshot=set())
+    index.add_row('uni/tn-a/ctx-v', {'action': 'created'})
+    index.add_row('uni/tn-a/ctx-v', {'action': 'deleted'})
+    row_data = {'action': 'created', 'tn_name': 'a', 'bd_name': 'b',
+                'vrf_name': 'v'}
+    assert index.find_missing('bridge_domains', row_data) == \
+        ['uni/tn-a/ctx-v']
+    # a row that deletes its object has no references
+    row_data['action'] = 'deleted'
+    assert index.find_missing('bridge_domains', row_data) == []
+
+
+def test_removed_row_falls_back_to_the_apic():
+    index = get_index(snapshot={'uni/tn-a/ctx-v'})
+    index.add_row('uni/tn-a/ctx-v', {'action': 'created'})
+    index.add_row('uni/tn-a/ctx-w', {'action': 'created'})
+    index.remove('uni/tn-a/ctx-v')
+    index.remove('uni/tn-a/ctx-w')
+    assert index.exists('uni/tn-a/ctx-v', 'fvCtx')
+    assert not index.exists('uni/tn-a/ctx-w', 'fvCtx')
+
+
+def test_unknown_snapshot():
+    index = get_index(snapshot=None)
+    row_data = {'action': 'created', 'tn_name': 'a', 'bd_name': 'b',
+                'vrf_name': 'v'}
+    assert index.exists('uni/tn-a/ctx-v', 'fvCtx') is None
+    assert index.find_missing('bridge_domains', row_data) == []
+
+
+def test_snapshot_ttl(monkeypatch):
+    monkeypatch.setattr(references, '_snapshots', {})
+    references.set_snapshot('apic-test', 'fvCtx', {'uni/tn-a/ctx-v'})
+    assert references.get_snapshot('apic-test', 'fvCtx') == \
+        {'uni/tn-a/ctx-v'}
+    monkeypatch.setattr(references, 'SNAPSHOT_TTL', 0)
+    assert references.get_snapshot('apic-test', 'fvCtx') is None
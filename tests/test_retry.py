@@ -0,0 +1,67 @@
+import retry
+
+
+def test_should_retry_status_codes():
+    policy = retry.RetryPolicy()
+    assert policy.should_retry(503, 0)
+    assert policy.should_retry(999, 0)
+    assert not policy.should_retry(200, 0)
+    assert not policy.should_retry(400, 0)
+
+
+def test_should_retry_max_retries():
+    policy = retry.RetryPolicy(max_retries=2)
+    assert policy.should_retry(500, 1)
+    assert not policy.should_retry(500, 2)
+    assert policy.retries == 1
+
+
+def test_retry_budget_is_shared_by_the_rows():
+    policy = retry.RetryPolicy(max_retries=3, budget=4)
+    assert [policy.should_retry(503, 0) for row in range(6)] == \
+        [True, True, True, True, False, False]
+    # a budget that is used up is not taken from again
+    assert not policy.should_retry(503, 1)
+    assert policy.retries == 4
+
+
+def test_get_delay_backoff(monkeypatch):
+    # the upper bound of the jitter
+    monkeypatch.setattr(retry.random, 'uniform', lambda low, high: high)
+    policy = retry.RetryPolicy(backoff_base=0.5, backoff_max=3)
+    assert [policy.get_delay(attempt) for attempt in range(5)] == \
+        [0.5, 1, 2, 3, 3]
+
+
+def test_get_delay_jitter():
+    policy = retry.RetryPolicy(backoff_base=0.5, backoff_max=30)
+    delays = [policy.get_delay(2) for i in range(100)]
+    assert all(0 <= delay <= 2 for delay in delays)
+
+
+def test_adaptive_limiter_is_halved_when_throttled():
+    limiter = retry.AdaptiveLimiter(max_limit=8)
+    limiter.acquire()
+    assert limiter.release(429, 0.1)
+    assert limiter.limit == 4
+    limiter.acquire()
+    assert limiter.release(200, retry.LATENCY_TARGET + 1)
+    assert limiter.limit == 2
+    assert limiter.lowest == 2
+
+
+def test_adaptive_limiter_is_raised_after_a_window():
+    limiter = retry.AdaptiveLimiter(max_limit=4)
+    limiter.limit = 2
+    for i in range(2):
+        limiter.acquire()
+        assert not limiter.release(200, 0.1)
+    assert limiter.limit == 3
+    assert limiter.in_flight == 0
+
+
+def test_adaptive_limiter_min_limit():
+    limiter = retry.AdaptiveLimiter(max_limit=1)
+    limiter.acquire()
+    assert not limiter.release(503, 0.1)
+    assert limiter.limit == 1
@@ -0,0 +1,87 @@
+import json
+import rollback
+
+
+def test_restore_payload_of_new_object():
+    payload = json.dumps({'fvTenant': {'attributes': {'name': 'a'}}})
+    action, restore = rollback.get_restore_payload('uni/tn-a', payload, None)
+    assert action == rollback.ACTION_DELETE
+    assert json.loads(restore) == {'fvTenant': {'attributes': {
+        'dn': 'uni/tn-a', 'status': 'deleted'}}}
+
+
+def test_restore_payload_of_changed_object():
+    payload = json.dumps({'fvTenant': {
+        'attributes': {'name': 'a', 'descr': 'new'},
+        'children': [{'fvCtx': {'attributes': {'rn': 'ctx-v'}}},
+                     {'fvCtx': {'attributes': {'rn': 'ctx-w'}}}]}})
+    current = {'attributes': {'name': 'a', 'descr': 'old', 'ownerKey': 'x',
+                              'dn': 'uni/tn-a', 'status': ''},
+               'children': [{'fvCtx': {'attributes': {'rn': 'ctx-v',
+                                                      'descr': 'kept'}}}]}
+    action, restore = rollback.get_restore_payload('uni/tn-a', payload,
+                                                   current)
+    assert action == rollback.ACTION_RESTORE
+    restore = json.loads(restore)['fvTenant']
+    # only the attributes set by the payload are put back
+    assert restore['attributes'] == {'dn': 'uni/tn-a', 'name': 'a',
+                                     'descr': 'old'}
+    assert restore['children'] == [
+        {'fvCtx': {'attributes': {'rn': 'ctx-v'}}},
+        {'fvCtx': {'attributes': {'rn': 'ctx-w', 'status': 'deleted'}}}]
+
+
+def test_restore_payload_of_deleted_object():
+    payload = json.dumps({'fvTenant': {'attributes': {
+        'name': 'a', 'status': 'deleted'}}})
+    current = {'attributes': {'name': 'a', 'descr': 'old', 'dn': '',
+                              'status': ''}}
+    action, restore = rollback.get_restore_payload('uni/tn-a', payload,
+                                                   current)
+    assert action == rollback.ACTION_RESTORE
+    assert json.loads(restore) == {'fvTenant': {'attributes': {
+        'name': 'a', 'descr': 'old', 'dn': 'uni/tn-a'}}}
+
+
+def test_rollback_set_round_trip(tmp_path):
+    rollback_set = rollback.new_rollback_set(['tenants'], apic='10.0.0.1',
+                                             folder=str(tmp_path),
+                                             fabric='site-a')
+    rollback_set.add('tenants', 'uni/tn-a', rollback.ACTION_DELETE, '{"a"}')
+    # the same undo payload is written once
+    rollback_set.add('tenants', 'uni/tn-a', rollback.ACTION_DELETE, '{"a"}')
+    rollback_set.add('tenants', 'uni/tn-b', rollback.ACTION_RESTORE, '{"b"}')
+    rollback_set.close()
+
+    run, entries = rollback.read_rollback_set(rollback_set.fname)
+    assert run['apic'] == '10.0.0.1'
+    assert [entry['dn'] for entry in entries] == ['uni/tn-a', 'uni/tn-b']
+    assert rollback.get_latest_rollback_set(
+        folder=str(tmp_path), controllers=['10.0.0.1']) == rollback_set.fname
+    assert rollback.get_latest_rollback_set(
+        folder=str(tmp_path), controllers=['10.0.0.2']) is None
+
+
+def test_get_levels():
+    entries = [{'dn': dn, 'action': action} for dn, action in [
+        ('uni/tn-a', rollback.ACTION_DELETE),
+        ('uni/tn-a/BD-b', rollback.ACTION_DELETE),
+        ('uni/tn-a/BD-b/subnet-[10.0.0.1/24]', rollback.ACTION_RESTORE),
+        ('uni/tn-c', rollback.ACTION_RESTORE),
+        ('uni/tn-c/BD-d', rollback.ACTION_RESTORE)]]
+    levels = [[entry['dn'] for entry in level]
+              for level in rollback.get_levels(entries)]
+    # children are deleted before their parents, and restored after them.
+    # The subnet of a BD the rollback deletes is not restored.
+    assert levels == [['uni/tn-a/BD-b'], ['uni/tn-a'], ['uni/tn-c'],
+                      ['uni/tn-c/BD-d']]
+
+
+def test_get_rollback_summary():
+    results = [({'cmd': 'tenants', 'dn': 'uni/tn-a',
+                 'action': rollback.ACTION_DELETE}, 200),
+               ({'cmd': 'tenants', 'dn': 'uni/tn-b',
+                 'action': rollback.ACTION_RESTORE}, 400)]
+    summary = rollback.get_rollback_summary('set.jsonl', results)
+    assert 'tenants: 1 deleted, 0 restored, 1 failed' in summary
+    assert 'uni/tn-b (400)' in summary
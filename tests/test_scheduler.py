@@ -0,0 +1,62 @@
+import scheduler
+
+LAUNCHER_DATA = {
+    'tenants': {'json_uri': 'mo/uni/tn-{tn_name}',
+                'worksheet_name': 'Tenant_Policies'},
+    'vrfs': {'json_uri': 'mo/uni/tn-{tn_name}/ctx-{vrf_name}',
+             'worksheet_name': 'Tenant_Policies'},
+    'bridge_domains': {'json_uri': 'mo/uni/tn-{tn_name}/BD-{bd_name}',
+                       'worksheet_name': 'Tenant_Policies',
+                       'depends_on': ['vrfs']},
+    'bd_subnet': {'json_uri': 'mo/uni/tn-{tn_name}/BD-{bd_name}/'
+                              'subnet-[{bd_subnet}]',
+                  'worksheet_name': 'Tenant_Policies'},
+    'vlan_pools': {'json_uri': 'mo/uni/infra/vlanns-[{name}]-static',
+                   'worksheet_name': 'Fabric_Access_Policies'},
+}
+
+
+def test_get_uri_pattern():
+    assert scheduler.get_uri_pattern('mo/uni/tn-{tn_name}/BD-{bd_name}') == \
+        ['uni', 'tn-*', 'BD-*']
+
+
+def test_get_dependencies():
+    dependencies = scheduler.get_dependencies(LAUNCHER_DATA,
+                                              list(LAUNCHER_DATA))
+    assert dependencies['tenants'] == set()
+    assert dependencies['vrfs'] == {'tenants'}
+    assert dependencies['bridge_domains'] == {'tenants', 'vrfs'}
+    assert dependencies['bd_subnet'] == {'tenants', 'bridge_domains'}
+    assert dependencies['vlan_pools'] == set()
+
+
+def test_get_levels():
+    levels = scheduler.get_levels(LAUNCHER_DATA, ['bd_subnet', 'vlan_pools',
+                                                  'bridge_domains', 'vrfs',
+                                                  'tenants'])
+    assert levels == [['vlan_pools', 'tenants'], ['vrfs'],
+                      ['bridge_domains'], ['bd_subnet']]
+
+
+def test_get_levels_of_some_commands():
+    # depends_on only applies to the commands that are pushed
+    assert scheduler.get_levels(LAUNCHER_DATA, ['bridge_domains',
+                                                'tenants']) == \
+        [['tenants'], ['bridge_domains']]
+
+
+def test_get_levels_with_dependency_loop():
+    launcher_data = {'a': {'json_uri': 'mo/uni/a-{a}', 'depends_on': ['b']},
+                     'b': {'json_uri': 'mo/uni/b-{b}', 'depends_on': ['a']},
+                     'c': {'json_uri': 'mo/uni/c-{c}'}}
+    assert scheduler.get_levels(launcher_data, ['a', 'b', 'c']) == \
+        [['c'], ['a', 'b']]
+
+
+def test_group_by_worksheet():
+    assert scheduler.group_by_worksheet(LAUNCHER_DATA, ['tenants',
+                                                       'vlan_pools',
+                                                       'vrfs']) == [
+        ('Tenant_Policies', ['tenants', 'vrfs']),
+        ('Fabric_Access_Policies', ['vlan_pools'])]
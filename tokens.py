@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+import time
+
+# APIC tokens are kept on disk so they can be re-used by the next button
+# click, None to keep them in memory only
+TOKEN_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.acixl_tokens.json')
+
+# Tokens are renewed with aaaRefresh when they are this close to expiring
+REFRESH_MARGIN = 60
+
+# Lifetime of a token if the APIC does not return refreshTimeoutSeconds
+DEFAULT_TIMEOUT = 600
+
+
+class TokenCache(object):
+    """
+    APIC login tokens with their expiry time, by APIC and user, stored in
+    a json file. The file only holds tokens, never passwords.
+    """
+    def __init__(self, fname=TOKEN_CACHE_FILE):
+        self.fname = fname
+        self.lock = threading.Lock()
+        self.tokens = {}
+
+    @staticmethod
+    def get_key(apic, user):
+        return '{}@{}'.format(user, apic)
+
+    def read(self):
+        if not self.fname or not os.path.exists(self.fname):
+            return {}
+        try:
+            with open(self.fname, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write(self, tokens):
+        if not self.fname:
+            return
+        # the file is only readable by the current user
+        fd = os.open(self.fname, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(tokens, f)
+
+    def get(self, apic, user):
+        """
+        Get the cached token for an APIC and user
+
+        Returns:
+            entry(dict): {'token': str, 'expires': epoch seconds}, or None
+            if there is no token or it has expired
+
+        """
+        with self.lock:
+            self.tokens.update(self.read())
+            entry = self.tokens.get(self.get_key(apic, user))
+        if entry and entry['expires'] > time.time():
+            return entry
+        return None
+
+    def set(self, apic, user, token, timeout=DEFAULT_TIMEOUT):
+        entry = {'token': token, 'expires': time.time() + timeout}
+        with self.lock:
+            tokens = self.read()
+            tokens[self.get_key(apic, user)] = entry
+            self.tokens = tokens
+            self.write(tokens)
+        return entry
+
+    def clear(self, apic, user):
+        with self.lock:
+            tokens = self.read()
+            tokens.pop(self.get_key(apic, user), None)
+            self.tokens = tokens
+            self.write(tokens)
+
+
+def parse_login_response(data):
+    """
+    Get the token and its timeout from an aaaLogin/aaaRefresh response
+
+    Returns:
+        (token, timeout): or (None, None) if there is no token
+
+    """
+    try:
+        attributes = data['imdata'][0]['aaaLogin']['attributes']
+        timeout = int(attributes.get('refreshTimeoutSeconds',
+                                     DEFAULT_TIMEOUT))
+        return attributes['token'], timeout
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None, None
+
+
+_cache = None
+
+
+def get_cache():
+    """
+    Get the token cache, shared by every AciHandler of the process
+    """
+    global _cache
+    if _cache is None:
+        _cache = TokenCache()
+    return _cache
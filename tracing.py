@@ -0,0 +1,156 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Every span of a push is written to this file when it is set, as json
+# lines, or as a Chrome trace (chrome://tracing) if it ends with .json
+TRACE_FILE = None
+
+# Stages of a push, in the order they are shown in the summary
+STAGES = ('query', 'render', 'post', 'write_back', 'flush')
+
+
+class Tracer(object):
+    """
+    Times each stage of a push (render, post and write-back) per row and
+    per command, and keeps counters such as retries and bytes sent. The
+    totals are always kept, the individual spans only if keep_spans is set,
+    so that they can be exported with export().
+    """
+    def __init__(self, keep_spans=False):
+        self.keep_spans = keep_spans
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.spans = []
+
+    @contextmanager
+    def span(self, stage, cmd=None, **fields):
+        """
+        Time the code run in the with block as a stage of a command, i.e.
+
+            with tracer.span('render', cmd='tenants', row=3):
+                ...
+
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(stage, cmd, start, time.perf_counter() - start,
+                          fields)
+
+    def add_span(self, stage, cmd, start, duration, fields=None):
+        with self.lock:
+            stats = self.stages.setdefault((cmd, stage), {'count': 0,
+                                                          'total': 0.0,
+                                                          'max': 0.0})
+            stats['count'] += 1
+            stats['total'] += duration
+            stats['max'] = max(stats['max'], duration)
+            if self.keep_spans:
+                span = OrderedDict([('stage', stage),
+                                    ('cmd', cmd),
+                                    ('start', start - self.origin),
+                                    ('duration', duration),
+                                    ('thread', threading.current_thread().name)])
+                span.update(fields or {})
+                self.spans.append(span)
+
+    def count(self, counter, cmd=None, value=1):
+        with self.lock:
+            key = (cmd, counter)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def get_summary(self, cmd=None):
+        """
+        Get the totals of a command, or of every command if cmd is None
+
+        Returns:
+            summary (dict): {'stages': [(stage, count, total_ms, mean_ms,
+            max_ms), ..], 'counters': {counter: value}}
+
+        """
+        with self.lock:
+            stages = OrderedDict()
+            for (span_cmd, stage), stats in sorted(
+                    self.stages.items(), key=lambda item: get_stage_order(
+                        item[0][1])):
+                if cmd is not None and span_cmd != cmd:
+                    continue
+                total = stages.setdefault(stage, {'count': 0, 'total': 0.0,
+                                                  'max': 0.0})
+                total['count'] += stats['count']
+                total['total'] += stats['total']
+                total['max'] = max(total['max'], stats['max'])
+            counters = {}
+            for (counter_cmd, counter), value in self.counters.items():
+                if cmd is None or counter_cmd == cmd:
+                    counters[counter] = counters.get(counter, 0) + value
+
+        rows = [(stage, stats['count'], stats['total'] * 1000,
+                 stats['total'] * 1000 / stats['count'], stats['max'] * 1000)
+                for stage, stats in stages.items()]
+        return {'stages': rows, 'counters': counters}
+
+    def export(self, fname):
+        """
+        Write the spans to a file, a Chrome trace if the file name ends
+        with .json, else json lines
+        """
+        # the file is written while the lock is held, the handlers of a
+        # push to several fabrics share the tracer and export it in turn
+        with self.lock:
+            spans = list(self.spans)
+            with open(fname, 'w') as f:
+                if fname.endswith('.json'):
+                    json.dump(get_chrome_trace(spans), f)
+                else:
+                    for span in spans:
+                        f.write(json.dumps(span) + '\n')
+
+
+def get_stage_order(stage):
+    return STAGES.index(stage) if stage in STAGES else len(STAGES)
+
+
+def get_chrome_trace(spans):
+    """
+    Convert spans to the Chrome trace event format, one complete event
+    ('X') per span, in microseconds
+    """
+    pid = os.getpid()
+    events = []
+    for span in spans:
+        args = dict((k, v) for k, v in span.items()
+                    if k not in ('stage', 'cmd', 'start', 'duration',
+                                 'thread'))
+        events.append({'name': span['stage'],
+                       'cat': span['cmd'] or '',
+                       'ph': 'X',
+                       'ts': round(span['start'] * 1e6, 1),
+                       'dur': round(span['duration'] * 1e6, 1),
+                       'pid': pid,
+                       'tid': span['thread'],
+                       'args': args})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def format_summary(summary):
+    """
+    Format a summary from Tracer.get_summary() as console lines
+    """
+    console_msg = '\n  -- Timings (ms):  count  total  mean  max'
+    for stage, count, total, mean, maximum in summary['stages']:
+        console_msg += '\n     {}: {}  {:.1f}  {:.2f}  {:.1f}'.format(
+            stage, count, total, mean, maximum)
+    counters = summary['counters']
+    if counters:
+        console_msg += '\n  -- Counters: {}'.format(', '.join(
+            '{} {}'.format(counter, counters[counter])
+            for counter in sorted(counters)))
+    return console_msg
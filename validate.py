@@ -0,0 +1,86 @@
+import string
+import jinja2
+
+# Columns that are not read from the table but set before a row is
+# rendered, see AciHandler.render_row()
+DERIVED_COLUMNS = {'bd_subnet': ['scope']}
+
+
+def get_uri_columns(json_uri):
+    """
+    Get the columns used by the placeholders of a json_uri, i.e.
+    'mo/uni/tn-{tn_name}/BD-{bd_name}' -> ['tn_name', 'bd_name']
+    """
+    columns = []
+    for _, field, _, _ in string.Formatter().parse(json_uri):
+        if field:
+            columns.append(field.split('.')[0].split('[')[0])
+    return columns
+
+
+def get_derived_columns(cmd):
+    columns = []
+    for key, derived in DERIVED_COLUMNS.items():
+        if key in cmd:
+            columns.extend(derived)
+    return columns
+
+
+def check_command(cmd, cmd_data, header, registry, launcher_data=None):
+    """
+    Check that every column used by the template and json_uri of a command
+    is in its table, so that typos are found before anything is posted
+
+    Args:
+        cmd(str): command name from launcher.json
+        cmd_data(dict): the command from launcher.json
+        header(list): column names of the table, or None if the table
+        could not be found
+        registry(TemplateRegistry): compiled templates, see templates.py
+        launcher_data(dict, optional): every command from launcher.json, to
+        check the commands its references point to
+
+    Returns:
+        problems (list): one msg per problem, empty if the command is valid
+
+    """
+    if header is None:
+        return ['{}: table {} not found'.format(cmd, cmd_data['table_name'])]
+    columns = set(header) | set(cmd_data.get('default_values', {})) | \
+        set(get_derived_columns(cmd)) | {'status_cell'}
+
+    problems = []
+    try:
+        variables = registry.get_variables(cmd_data['json_folder'],
+                                           cmd_data['json_file'])
+    except (OSError, jinja2.TemplateError) as e:
+        return ['{}: template {}/{} can not be read ({})'.format(
+            cmd, cmd_data['json_folder'], cmd_data['json_file'], e)]
+    for variable in sorted(variables - columns):
+        problems.append('{}: {{{{ {} }}}} in {} is not a column of '
+                        '{}'.format(cmd, variable, cmd_data['json_file'],
+                                    cmd_data['table_name']))
+
+    for column in get_uri_columns(cmd_data['json_uri']):
+        if column not in columns:
+            problems.append('{}: {{{}}} in json_uri is not a column of '
+                            '{}'.format(cmd, column, cmd_data['table_name']))
+
+    for column in cmd_data.get('expand_columns', []):
+        if column not in columns:
+            problems.append('{}: expand column {} is not a column of '
+                            '{}'.format(cmd, column, cmd_data['table_name']))
+
+    for key in cmd_data.get('mandatory_keys', []):
+        if key not in columns:
+            problems.append('{}: mandatory key {} is not a column of '
+                            '{}'.format(cmd, key, cmd_data['table_name']))
+
+    for column, target in cmd_data.get('references', {}).items():
+        if column not in columns:
+            problems.append('{}: reference column {} is not a column of '
+                            '{}'.format(cmd, column, cmd_data['table_name']))
+        if launcher_data is not None and target not in launcher_data:
+            problems.append('{}: reference {} points to unknown command '
+                            '{}'.format(cmd, column, target))
+    return problems
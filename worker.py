@@ -0,0 +1,369 @@
+"""
+Resident worker that runs the runsheet macros in a warm interpreter, i.e.
+
+    RunPython ("import worker; worker.call('aci.run_from_excel', 'tenants')")
+
+The macro only imports this module, which needs nothing but the standard
+library, and sends the call to the worker over a local socket. The worker
+keeps requests, jinja2, xlwings, the parsed launcher.json, the compiled
+templates and the APIC sessions between clicks. It is started by the first
+call and stops after IDLE_TIMEOUT seconds without one.
+"""
+import hmac
+import importlib
+import json
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import time
+
+# Address the worker listens on, port 0 lets the OS pick a free port
+WORKER_HOST = '127.0.0.1'
+WORKER_PORT = 0
+
+# Port, key and pid of the running worker, only readable by the current user
+WORKER_FILE = os.path.join(os.path.expanduser('~'), '.acixl_worker.json')
+
+# Seconds without a call before the worker stops, None to keep it running
+IDLE_TIMEOUT = 3600
+
+# Seconds a call waits for a new worker to be listening before it runs in
+# its own interpreter
+STARTUP_TIMEOUT = 15
+
+# Functions the worker runs, the macros can not call anything else
+CALLS = ('aci.run_from_excel',
+         'aci.run_worksheet_from_excel',
+         'aci.run_all_from_excel',
+         'aci.run_resume_from_excel',
+         'aci.run_rollback_from_excel',
+         'aci.run_export_from_excel',
+         'aci.run_compile_from_excel',
+         'aci.run_write_back_from_excel',
+         'aci.run_fabrics_from_excel',
+         'aci.refresh_excel_data',
+         'excel.reset_cp_console',
+         'excel.reset_table_status',
+         'excel.reset_all_status')
+
+# Modules imported when the worker starts, in this order
+WARM_MODULES = ('requests', 'jinja2', 'xlwings', 'aci')
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def read_worker_file(fname=WORKER_FILE):
+    try:
+        with open(fname, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_worker_file(info, fname=WORKER_FILE):
+    fd = os.open(fname, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(info, f)
+
+
+def remove_worker_file(pid, fname=WORKER_FILE):
+    # a newer worker may have replaced the file
+    info = read_worker_file(fname)
+    if info and info.get('pid') == pid:
+        os.remove(fname)
+
+
+def warm_up():
+    """
+    Import the modules of WARM_MODULES and read launcher.json and the
+    templates, timing each step
+
+    Returns:
+        timings (OrderedDict): seconds taken by each step
+
+    """
+    from collections import OrderedDict
+    timings = OrderedDict()
+    for name in WARM_MODULES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            # i.e. xlwings when the worker runs headless
+            continue
+        timings['import ' + name] = time.perf_counter() - start
+    aci = sys.modules.get('aci')
+    if not aci:
+        return timings
+    start = time.perf_counter()
+    try:
+        # errors are shown by the button that uses the launcher
+        launcher = aci.LaunchFileHandler(
+            backend=importlib.import_module('headless'))
+    except ImportError:
+        # headless needs openpyxl, the launcher is read by the first click
+        return timings
+    aci.templates.get_registry(aci.JSON_ROOT_FOLDER).precompile(
+        launcher.data)
+    timings['launcher and templates'] = time.perf_counter() - start
+    return timings
+
+
+def dispatch(name, args):
+    if name not in CALLS:
+        raise ValueError('{} can not be called from the worker'.format(name))
+    module, function = name.rsplit('.', 1)
+    return getattr(importlib.import_module(module), function)(*args)
+
+
+def handle(request, state):
+    """
+    Run a single request of a client
+
+    Returns:
+        response (dict): {'ok': True, 'result': ..} or {'ok': False,
+        'error': str}
+
+    """
+    call = request.get('call')
+    if call == 'status':
+        return {'ok': True, 'result': dict(state, uptime=time.time() -
+                                           state['started'])}
+    if call == 'stop':
+        state['running'] = False
+        return {'ok': True, 'result': None}
+    if request.get('workbook'):
+        importlib.import_module('excel').reset_workbook(request['workbook'])
+    start = time.perf_counter()
+    try:
+        result = dispatch(call, request.get('args', []))
+    except Exception as e:
+        return {'ok': False, 'error': '{}: {}'.format(type(e).__name__, e)}
+    finally:
+        state['calls'] += 1
+        state['last_call'] = {'call': call,
+                              'seconds': time.perf_counter() - start}
+    try:
+        json.dumps(result)
+    except (TypeError, ValueError):
+        result = None
+    return {'ok': True, 'result': result}
+
+
+def serve(host=WORKER_HOST, port=WORKER_PORT, idle_timeout=IDLE_TIMEOUT,
+          fname=WORKER_FILE):
+    """
+    Run the worker until it is stopped or idle for idle_timeout seconds.
+    The requests are served one at a time, each is a line of json:
+
+        {"key": "..", "call": "aci.run_from_excel", "args": ["tenants"],
+         "workbook": "C:\\acixl\\runsheet.xlsm"}
+
+    and gets a line of json back, see handle(). "status" and "stop" are
+    answered by the worker itself. Requests without the key of the worker
+    file are refused.
+    """
+    started = time.time()
+    if HERE not in sys.path:
+        sys.path.insert(0, HERE)
+    key = secrets.token_hex(16)
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind((host, port))
+    server.listen(4)
+    server.settimeout(idle_timeout)
+    state = {'pid': os.getpid(), 'started': started, 'calls': 0,
+             'last_call': None, 'running': True}
+    state['timings'] = warm_up()
+    state['startup'] = time.time() - started
+    write_worker_file({'host': host, 'port': server.getsockname()[1],
+                       'key': key, 'pid': os.getpid()}, fname)
+    try:
+        while state['running']:
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                break
+            with conn:
+                conn.settimeout(None)
+                f = conn.makefile('rw', encoding='utf-8')
+                try:
+                    request = json.loads(f.readline())
+                except ValueError:
+                    continue
+                if not hmac.compare_digest(str(request.get('key', '')), key):
+                    response = {'ok': False, 'error': 'invalid key'}
+                else:
+                    response = handle(request, state)
+                f.write(json.dumps(response) + '\n')
+                f.flush()
+    finally:
+        server.close()
+        remove_worker_file(os.getpid(), fname)
+
+
+def write_request(info, request):
+    """
+    Connect to the worker and send it a request
+
+    Returns:
+        conn (socket): to read the response from, see read_response()
+
+    Raises:
+        OSError: if the request could not be sent, the worker did not get it
+
+    """
+    request = dict(request, key=info['key'])
+    conn = socket.create_connection((info['host'], info['port']), timeout=5)
+    try:
+        conn.sendall((json.dumps(request) + '\n').encode('utf-8'))
+    except OSError:
+        conn.close()
+        raise
+    return conn
+
+
+def read_response(conn, timeout=None):
+    with conn:
+        conn.settimeout(timeout)
+        line = conn.makefile('r', encoding='utf-8').readline()
+    if not line:
+        raise ConnectionError('the worker closed the connection')
+    return json.loads(line)
+
+
+def send(info, request, timeout=None):
+    return read_response(write_request(info, request), timeout=timeout)
+
+
+def start_worker(fname=WORKER_FILE, timeout=STARTUP_TIMEOUT):
+    """
+    Start a worker in the background and wait for it to write the worker
+    file
+
+    Returns:
+        info (dict): the worker file, or None if the worker did not start
+
+    """
+    kwargs = {}
+    if sys.platform == 'win32':
+        kwargs['creationflags'] = (subprocess.DETACHED_PROCESS |
+                                   subprocess.CREATE_NEW_PROCESS_GROUP)
+    else:
+        kwargs['start_new_session'] = True
+    # pythonw has no console window on windows
+    executable = sys.executable
+    pythonw = os.path.join(os.path.dirname(executable), 'pythonw.exe')
+    if sys.platform == 'win32' and os.path.exists(pythonw):
+        executable = pythonw
+    subprocess.Popen([executable, os.path.join(HERE, 'worker.py')],
+                     cwd=HERE, stdin=subprocess.DEVNULL,
+                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     **kwargs)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        info = read_worker_file(fname)
+        if info and ping(info):
+            return info
+        time.sleep(0.1)
+    return None
+
+
+def ping(info):
+    try:
+        return send(info, {'call': 'status'}, timeout=5)['ok']
+    except (OSError, ValueError, KeyError):
+        return False
+
+
+def get_status(fname=WORKER_FILE):
+    """
+    Get the status of the running worker: pid, startup seconds and the
+    timings of its imports, number of calls served
+
+    Returns:
+        status (dict): or None if no worker is running
+
+    """
+    info = read_worker_file(fname)
+    if not info:
+        return None
+    try:
+        response = send(info, {'call': 'status'}, timeout=5)
+    except (OSError, ValueError):
+        return None
+    return response.get('result')
+
+
+def stop(fname=WORKER_FILE):
+    info = read_worker_file(fname)
+    if not info:
+        return False
+    try:
+        send(info, {'call': 'stop'}, timeout=5)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def run_cold(name, args):
+    # the worker could not be reached, run the call in this interpreter
+    if HERE not in sys.path:
+        sys.path.insert(0, HERE)
+    return dispatch(name, args)
+
+
+def call(name, *args, workbook=None, fname=WORKER_FILE):
+    """
+    Run a function of CALLS in the worker, starting the worker if it is not
+    running. The call runs in this interpreter if the worker can not be
+    started or reached. Once the request has been sent it is never sent
+    again, so that a push is not run twice.
+
+    Args:
+        name(str): function to run, i.e. 'aci.run_from_excel'
+        args: arguments of the function, they must be json serializable
+        workbook(str): full name of the workbook, so that the worker
+        connects to the workbook of the button
+
+    Returns:
+        result: what the function returned, None if it is not json
+        serializable
+
+    Raises:
+        RuntimeError: if the function raised an exception in the worker
+        OSError: if the worker got the request but did not answer
+
+    """
+    if name not in CALLS:
+        raise ValueError('{} can not be called from the worker'.format(name))
+    request = {'call': name, 'args': list(args), 'workbook': workbook}
+    info = read_worker_file(fname)
+    response = None
+    for attempt in range(2):
+        if not info:
+            info = start_worker(fname)
+            if not info:
+                break
+        try:
+            conn = write_request(info, request)
+        except OSError:
+            # the worker has stopped since it wrote the file
+            info = None
+            continue
+        # the worker has the request, it may be running it
+        try:
+            response = read_response(conn)
+        except ValueError as e:
+            raise OSError('invalid response from the worker: {}'.format(e))
+        break
+    if response is None:
+        return run_cold(name, args)
+    if not response['ok']:
+        raise RuntimeError(response['error'])
+    return response['result']
+
+
+if __name__ == '__main__':
+    serve()